@@ -0,0 +1,657 @@
+#!/usr/bin/env python3
+"""
+bench_epg.py
+Benchmark harness for clean_epg.py and filter_keep_channels.py.
+
+The real upstream guide is far too big to profile in CI, so this generates a
+deterministic synthetic XMLTV guide (same seed and sizes -> same bytes) and
+times each stage of both scripts on it:
+- clean_epg:            parse, filter, clean (build_clean_programme on records), sort, write
+- filter_keep_channels: parse, filter, clean, write (it doesn't sort)
+- clean_epg --filtered:  both outputs from one pass, end to end only
+- text cleaning:        fields per second of clean_epg's fused title stage
+                        (clean_title_fields) against the sequential passes it
+                        replaced, LRU caches off, on the guide's title/sub-title/desc
+- fetch pipeline:       the gzip guide served by a local HTTP stand-in for the
+                        upstream server (bandwidth cap, Range / If-Range, a
+                        redirect and a dropped connection on request): download
+                        then clean, against clean_epg.py streaming the URL, which
+                        should take about max(download, clean) instead of the sum
+
+Stages run one after another in this process, each on the previous stage's
+output held in memory, so the stage figures isolate where the time goes. Each
+script is also run end to end in a child process for the real streaming
+wall time and peak RSS.
+
+Results are appended as one JSON object per run to bench_epg.jsonl (-o), so
+runs can be compared over time. The XML parser backend that ran (lxml or the
+standard library's ElementTree, see epg_xml.py) is part of every record.
+
+Usage:
+    python3 bench_epg.py                          # defaults: 300 channels x 14 days x 24/day
+    python3 bench_epg.py --channels 1000 --kept-share 0.15 --mix 0.2,0.5,0.3
+    python3 bench_epg.py --only clean --tracemalloc --keep bench_data
+    python3 bench_epg.py --only text --repeat 5
+    python3 bench_epg.py --parser etree             # standard library parser even if lxml is installed
+    python3 bench_epg.py --only fetch --fetch-rate 4 --fetch-drop 0.5
+"""
+
+import argparse
+import gzip
+import json
+import os
+import platform
+import random
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import threading
+import tracemalloc
+from contextlib import contextmanager, redirect_stdout
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlsplit
+from xml.sax.saxutils import escape, quoteattr
+
+import clean_epg
+import filter_keep_channels
+from epg_engine import iter_guide
+from epg_io import open_guide
+from epg_prefilter import open_prefiltered
+from epg_report import peak_rss_mb, reset_peak_rss
+from epg_sort import ProgrammeSorter, DEFAULT_MEMORY_BUDGET
+from epg_record import ProgrammeRecord
+from epg_writer import GuideWriter
+from epg_xml import AUTO, BACKENDS, set_backend
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# -------------------------------
+# Synthetic guide
+# -------------------------------
+SPORTS = [
+    ("NFL Football", ["New England Patriots", "New York Jets", "Buffalo Bills", "Miami Dolphins"]),
+    ("MLB Baseball", ["Boston Red Sox", "New York Yankees", "Chicago Cubs", "Los Angeles Dodgers"]),
+    ("NBA Basketball", ["Boston Celtics", "New York Knicks", "Los Angeles Lakers", "Miami Heat"]),
+    ("NHL Hockey", ["Boston Bruins", "New York Rangers", "Toronto Maple Leafs", "Montreal Canadiens"]),
+    ("College Football", ["Alabama", "Georgia", "Ohio State", "Michigan"]),
+    ("Premier League Soccer", ["Arsenal", "Chelsea", "Liverpool", "Everton"]),
+]
+SHOWS = ["The Office", "Cheers", "Law & Order", "Diners, Drive-Ins and Dives", "House Hunters",
+         "Property Brothers", "NCIS", "Friends", "Seinfeld", "Forensic Files", "The Simpsons",
+         "Chopped", "Pawn Stars", "Deadliest Catch", "Tom & Jerry <Classic>", "News at 6"]
+EPISODES = ["Pilot", "The Return", "Part 2", "Finale", "Home Again", "The Big Day", "Aftermath"]
+MOVIES = ["The Long Road", "Midnight Express Lane", "A Quiet Harbor", "Star Crossing", "Iron Valley",
+          "Summer of '99", "Café Society", "The Last Signal", "Northern Lights", "Double Take"]
+MARKERS = ["", "", "", " Live", " New", " (HD)", " [CC]", " {Encore}"]
+GUIDE_START = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+def _xmltv_time(dt: datetime) -> str:
+    return dt.strftime("%Y%m%d%H%M%S +0000")
+
+def _sports_programme(rnd):
+    league, teams = rnd.choice(SPORTS)
+    home, away = rnd.sample(teams, 2)
+    sep = rnd.choice(["vs.", "at", "v"])
+    parts = [("title", league + rnd.choice(MARKERS))]
+    if rnd.random() < 0.6:
+        parts.append(("sub-title", f"{away} {sep} {home}"))
+    # filter_keep_channels.py expects a desc on every sports listing
+    parts.append(("desc", f"{away} - {home}" if rnd.random() < 0.5 else f"From {home}'s home stadium."))
+    return parts, []
+
+def _episodic_programme(rnd):
+    season, episode = rnd.randint(1, 20), rnd.randint(1, 24)
+    parts = [("title", rnd.choice(SHOWS) + rnd.choice(MARKERS))]
+    if rnd.random() < 0.8:
+        parts.append(("sub-title", rnd.choice(EPISODES)))
+    parts.append(("desc", f"Episode {episode} of season {season}."))
+    episodes = [("xmltv_ns", f"{season - 1}.{episode - 1}.")]
+    if rnd.random() < 0.7:
+        episodes.append(("onscreen", f"S{season:02d}E{episode:02d}"))
+    return parts, episodes
+
+def _movie_programme(rnd):
+    year = rnd.randint(1950, 2024)
+    parts = [("title", rnd.choice(MOVIES) + rnd.choice(["", f" ({year})", " [HD]"]))]
+    parts.append(("desc", "A feature film."))
+    return parts, [], str(year)
+
+# Write a synthetic guide to `path` (gzip if it ends in .gz); returns its stats.
+# `mix` is the (sports, episodic, movie) share of programmes.
+def generate_guide(path, channels=300, days=14, per_day=24, kept_share=0.4,
+                   mix=(0.2, 0.5, 0.3), seed=1):
+    rnd = random.Random(seed)
+    n_kept = min(len(clean_epg.keep_channels), round(channels * kept_share))
+    ids = clean_epg.keep_channels[:n_kept] + [f"Extra{i}(EXT{i}).us" for i in range(channels - n_kept)]
+    rnd.shuffle(ids)
+    slot = timedelta(minutes=24 * 60 // per_day)
+
+    out = gzip.GzipFile(path, "wb", mtime=0) if path.endswith(".gz") else open(path, "wb")
+    with out:
+        out.write(b'<?xml version="1.0" encoding="UTF-8"?>\n<!DOCTYPE tv SYSTEM "xmltv.dtd">\n'
+                  b'<tv generator-info-name="bench_epg" source-info-name="synthetic">\n')
+        for cid in ids:
+            out.write(f'  <channel id={quoteattr(cid)}>\n'
+                      f'    <display-name>{escape(cid)}</display-name>\n'
+                      f'    <icon src="http://example.invalid/{escape(cid)}.png" />\n'
+                      f'  </channel>\n'.encode("utf-8"))
+        programmes = 0
+        for cid in ids:
+            t = GUIDE_START
+            for _ in range(days * per_day):
+                kind = rnd.choices(("sports", "episodic", "movie"), weights=mix)[0]
+                date = None
+                if kind == "sports":
+                    parts, episodes = _sports_programme(rnd)
+                elif kind == "episodic":
+                    parts, episodes = _episodic_programme(rnd)
+                    date = (t - timedelta(days=rnd.randint(0, 3650))).strftime("%Y%m%d")
+                else:
+                    parts, episodes, date = _movie_programme(rnd)
+                lines = [f'  <programme start="{_xmltv_time(t)}" stop="{_xmltv_time(t + slot)}" channel={quoteattr(cid)}>\n']
+                for tag, text in parts:
+                    lines.append(f'    <{tag} lang="en">{escape(text)}</{tag}>\n')
+                for system, text in episodes:
+                    lines.append(f'    <episode-num system="{system}">{escape(text)}</episode-num>\n')
+                if date:
+                    lines.append(f'    <date>{date}</date>\n')
+                lines.append('  </programme>\n')
+                out.write("".join(lines).encode("utf-8"))
+                programmes += 1
+                t += slot
+        out.write(b"</tv>\n")
+    return {"path": path, "bytes": os.path.getsize(path), "channels": channels,
+            "kept_channels": n_kept, "programmes": programmes}
+
+# -------------------------------
+# Measurement
+# -------------------------------
+class StageTimer:
+    def __init__(self, trace_python=False):
+        self.trace_python = trace_python
+        self.stages = {}
+
+    @contextmanager
+    def stage(self, name):
+        reset_peak_rss()
+        if self.trace_python:
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        yield
+        result = {"wall_s": round(time.perf_counter() - start, 4)}
+        rss = peak_rss_mb()
+        result["peak_rss_mb"] = round(rss, 1) if rss is not None else None
+        if self.trace_python:
+            result["python_peak_mb"] = round(tracemalloc.get_traced_memory()[1] / (1024 * 1024), 1)
+        self.stages[name] = result
+
+# Keep the best wall time and the highest memory figures over repeated runs
+def merge_runs(runs):
+    merged = {}
+    for run in runs:
+        for name, result in run.items():
+            best = merged.setdefault(name, dict(result))
+            for key, value in result.items():
+                if value is None:
+                    continue
+                if key == "wall_s":
+                    best[key] = min(best[key], value)
+                else:
+                    best[key] = max(best[key] or 0, value)
+    return merged
+
+# -------------------------------
+# Stage benchmarks
+# -------------------------------
+def bench_clean_stages(path, workdir, timer):
+    channel_order = clean_epg.channel_order_map
+    with timer.stage("parse"):
+        # full streaming parse of every block, nothing kept
+        with open_guide(path) as source:
+            for _ in iter_guide(source):
+                pass
+
+    root = None
+    channels = []
+    programmes = []
+    with timer.stage("filter"):
+        with open_prefiltered(path, channel_order, channel_order) as source:
+            for elem in iter_guide(source):
+                if root is None:
+                    root = elem
+                elif elem.tag == "channel":
+                    if elem.attrib.get("id") in channel_order:
+                        clean_epg.apply_display_name(elem)
+                        channels.append(elem)
+                elif elem.tag == "programme" and elem.attrib.get("channel") in channel_order:
+                    programmes.append(ProgrammeRecord.from_element(elem))
+
+    cleaned = []
+    with timer.stage("clean"):
+        for prog in programmes:
+            try:
+                clean_epg.build_clean_programme(prog)
+            except Exception:
+                continue
+            cleaned.append((clean_epg.programme_sort_key(prog, channel_order), prog))
+    programmes = None
+
+    with timer.stage("sort"):
+        sorter = ProgrammeSorter(len(clean_epg.keep_channels), DEFAULT_MEMORY_BUDGET)
+        for (order, start_key), prog in cleaned:
+            sorter.add(order, start_key, prog)
+        channels.sort(key=lambda el: channel_order.get(el.attrib.get("id"), 9999))
+        ordered = list(sorter)
+        sorter.close()
+    cleaned = None
+
+    with timer.stage("write"):
+        with GuideWriter(os.path.join(workdir, "stage_clean_epg.xml")) as writer:
+            writer.start(root.tag, root.attrib)
+            for channel in channels:
+                writer.write_element(channel)
+            for prog in ordered:
+                writer.write_record(prog)
+    return {"channels": len(channels), "programmes": len(ordered)}
+
+def bench_filter_stages(path, workdir, timer):
+    channel_map = filter_keep_channels.channel_map
+    with timer.stage("parse"):
+        with open_guide(path) as source:
+            for _ in iter_guide(source):
+                pass
+
+    root = None
+    kept = []
+    with timer.stage("filter"):
+        with open_prefiltered(path, channel_map, channel_map) as source:
+            for elem in iter_guide(source):
+                if root is None:
+                    root = elem
+                elif elem.tag == "channel":
+                    if elem.get("id") in channel_map:
+                        kept.append(elem)
+                elif elem.tag != "programme" or elem.get("channel") in channel_map:
+                    kept.append(elem)
+
+    with timer.stage("clean"):
+        for elem in kept:
+            if elem.tag == "channel":
+                filter_keep_channels.rename_channel(elem)
+            elif elem.tag == "programme":
+                filter_keep_channels.clean_programme(elem)
+
+    with timer.stage("write"):
+        with GuideWriter(os.path.join(workdir, "stage_filtered_epg.xml"), xml_declaration=False) as writer:
+            writer.start(root.tag, root.attrib, root.text)
+            for elem in kept:
+                writer.write_element(elem)
+    return {"channels": sum(1 for elem in kept if elem.tag == "channel"),
+            "programmes": sum(1 for elem in kept if elem.tag == "programme")}
+
+# Run a script on the guide in a child process: (wall seconds, peak RSS MB or None)
+def run_end_to_end(script, path, output, extra_args=()):
+    cmd = [sys.executable, os.path.join(HERE, script), path, "-o", output, *extra_args]
+    start = time.perf_counter()
+    proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    if hasattr(os, "wait4"):
+        _, status, usage = os.wait4(proc.pid, 0)
+        proc.returncode = os.waitstatus_to_exitcode(status)
+        peak = usage.ru_maxrss / (1024 * 1024) if sys.platform == "darwin" else usage.ru_maxrss / 1024
+    else:
+        proc.wait()
+        peak = None
+    wall = time.perf_counter() - start
+    err = proc.stderr.read().decode("utf-8", "replace")
+    proc.stderr.close()
+    if proc.returncode:
+        raise RuntimeError(f"{script} failed ({proc.returncode}): {err.strip()}")
+    return {"wall_s": round(wall, 4), "peak_rss_mb": round(peak, 1) if peak is not None else None,
+            "output_bytes": os.path.getsize(output)}
+
+# -------------------------------
+# Fetch pipeline: local HTTP stand-in for the upstream guide server
+# -------------------------------
+RANGE_RE = re.compile(r"bytes=(\d+)-$")
+SERVE_PIECE = 16 * 1024
+
+class GuideHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        path = unquote(urlsplit(self.path).path)
+        if path.startswith("/redirect/"):
+            self.send_response(302)
+            self.send_header("Location", path[len("/redirect"):])
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        file = server.files.get(path.lstrip("/"))
+        if file is None:
+            self.send_error(404)
+            return
+        st = os.stat(file)
+        size = st.st_size
+        etag = f'"{size:x}-{st.st_mtime_ns:x}"'
+        start = 0
+        m = RANGE_RE.match(self.headers.get("Range", ""))
+        if m and self.headers.get("If-Range", etag) == etag:
+            start = int(m.group(1))
+            if start >= size:
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{size}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{size - 1}/{size}")
+        else:
+            self.send_response(200)
+        self.send_header("Content-Type", "application/gzip")
+        self.send_header("Content-Length", str(size - start))
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("ETag", etag)
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        server.requests += 1
+
+        # bandwidth cap and, while drops are left, a connection cut at `drop_at`
+        with server.lock:
+            drop_at = server.drop_at if server.drops > 0 and server.drop_at > start else None
+            if drop_at is not None:
+                server.drops -= 1
+        started = time.perf_counter()
+        sent = 0
+        with open(file, "rb") as f:
+            f.seek(start)
+            while True:
+                piece = f.read(SERVE_PIECE)
+                if not piece:
+                    return
+                if drop_at is not None and start + sent + len(piece) >= drop_at:
+                    self.wfile.write(piece[: drop_at - start - sent])
+                    return
+                try:
+                    self.wfile.write(piece)
+                except OSError:
+                    return
+                sent += len(piece)
+                if server.rate:
+                    ahead = sent / server.rate - (time.perf_counter() - started)
+                    if ahead > 0:
+                        time.sleep(ahead)
+
+class GuideServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    # `files`: {url name: path}; `rate`: bytes per second (0: as fast as it goes);
+    # the first `drops` responses that reach byte `drop_at` are cut off there
+    def __init__(self, files, rate=0, drop_at=0, drops=0):
+        super().__init__(("127.0.0.1", 0), GuideHandler)
+        self.files = files
+        self.rate = rate
+        self.drop_at = drop_at
+        self.drops = drops
+        self.requests = 0
+        self.lock = threading.Lock()
+        self.thread = threading.Thread(target=self.serve_forever, name="guide-server", daemon=True)
+
+    def url(self, name, redirect=False):
+        return f"http://127.0.0.1:{self.server_address[1]}/{'redirect/' if redirect else ''}{name}"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        self.server_close()
+
+# Download then clean (what the workflow did with curl + gunzip), against
+# clean_epg.py reading the URL; every variant has to give the same output
+def bench_fetch(path, workdir, rate_mb, drop_share, extra_args=()):
+    served = path
+    if not path.endswith(".gz"):
+        served = os.path.join(workdir, "served_epg.xml.gz")
+        with open(path, "rb") as f_in, gzip.GzipFile(served, "wb", mtime=0) as f_out:
+            shutil.copyfileobj(f_in, f_out)
+    size = os.path.getsize(served)
+    rate = rate_mb * 1e6
+    results = {"served_bytes": size, "rate_mb_s": rate_mb}
+    outputs = {}
+    with GuideServer({"epg.xml.gz": served}, rate) as server:
+        url = server.url("epg.xml.gz")
+        downloaded = os.path.join(workdir, "downloaded_epg.xml")
+        start = time.perf_counter()
+        subprocess.run([sys.executable, os.path.join(HERE, "epg_fetch.py"), url, "-o", downloaded],
+                       stdout=subprocess.DEVNULL, check=True)
+        results["download_s"] = round(time.perf_counter() - start, 4)
+        outputs["sequential"] = os.path.join(workdir, "fetch_sequential.xml")
+        results["clean_s"] = run_end_to_end("clean_epg.py", downloaded, outputs["sequential"], extra_args)["wall_s"]
+        results["sequential_s"] = round(results["download_s"] + results["clean_s"], 4)
+
+        outputs["streamed"] = os.path.join(workdir, "fetch_streamed.xml")
+        results["streamed"] = run_end_to_end("clean_epg.py", url, outputs["streamed"], extra_args)
+        if drop_share > 0:
+            # through a redirect, with the connection cut once partway
+            server.drop_at = int(size * drop_share)
+            server.drops = 1
+            requests = server.requests
+            outputs["resumed"] = os.path.join(workdir, "fetch_resumed.xml")
+            results["resumed"] = run_end_to_end("clean_epg.py", server.url("epg.xml.gz", redirect=True),
+                                                outputs["resumed"], extra_args)
+            results["resumed"]["requests"] = server.requests - requests
+    with open(outputs["sequential"], "rb") as f:
+        expected = f.read()
+    for name, output in outputs.items():
+        with open(output, "rb") as f:
+            if f.read() != expected:
+                raise RuntimeError(f"fetch pipeline: {name} output differs from download-then-clean")
+    results["ideal_s"] = max(results["download_s"], results["clean_s"])
+    results["saved_s"] = round(results["sequential_s"] - results["streamed"]["wall_s"], 4)
+    return results
+
+# -------------------------------
+# Text cleaning micro-benchmark
+# -------------------------------
+# The title stage as it was before clean_title_fields: a keyword scan per
+# field, the matchup, then three passes over the title
+def _sequential_remove_brackets_and_markers(text):
+    if not text:
+        return ""
+    t = clean_epg.BRACKET_REMOVE_RE.sub("", text)
+    t = clean_epg.LIVE_WORD_RE.sub("", t)
+    t = re.sub(r"\s+", " ", t).strip()
+    return t
+
+def _looks_like_sports(*texts):
+    for t in texts:
+        if not t:
+            continue
+        if clean_epg.SPORT_KEY_RE.search(t):
+            return True
+    return False
+
+def sequential_title_fields(raw_title, raw_sub, raw_desc):
+    sports_flag = _looks_like_sports(raw_title, raw_sub, raw_desc)
+    matchup = clean_epg.extract_matchup(raw_sub, raw_desc, raw_title) if sports_flag else None
+    if sports_flag and matchup:
+        return sports_flag, matchup, matchup
+    return sports_flag, matchup, _sequential_remove_brackets_and_markers(raw_title)
+
+def bench_text_cleaning(path, repeat=1):
+    fields = []
+    with open_guide(path) as source:
+        for elem in iter_guide(source):
+            if elem.tag == "programme":
+                fields.append(tuple((elem.findtext(tag) or "").strip() for tag in ("title", "sub-title", "desc")))
+    clean_epg.configure_text_caches(0)
+    try:
+        results = {}
+        for name, func in (("sequential", sequential_title_fields), ("fused", clean_epg.clean_title_fields)):
+            best = None
+            for _ in range(max(1, repeat)):
+                start = time.perf_counter()
+                out = [func(*f) for f in fields]
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            results[name] = {"wall_s": round(best, 4), "fields_per_s": round(3 * len(fields) / best)}
+            if name == "sequential":
+                expected = out
+            elif [(bool(a), b, c) for a, b, c in expected] != out:
+                raise RuntimeError("fused title stage disagrees with the sequential one")
+    finally:
+        clean_epg.configure_text_caches()
+    results["fields"] = 3 * len(fields)
+    results["speedup"] = round(results["sequential"]["wall_s"] / results["fused"]["wall_s"], 2)
+    return results
+
+# -------------------------------
+# Main
+# -------------------------------
+def git_revision():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=HERE,
+                             capture_output=True, text=True, check=True)
+        return out.stdout.strip() or None
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def parse_mix(text):
+    shares = [float(x) for x in text.split(",")]
+    if len(shares) != 3 or min(shares) < 0 or sum(shares) <= 0:
+        raise argparse.ArgumentTypeError("expected three non-negative shares: sports,episodic,movie")
+    return tuple(shares)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark clean_epg.py and filter_keep_channels.py on a synthetic guide.")
+    parser.add_argument("--channels", type=int, default=300, help="channels in the guide (default: 300)")
+    parser.add_argument("--days", type=int, default=14, help="days of listings (default: 14)")
+    parser.add_argument("--per-day", type=int, default=24, help="programmes per channel per day (default: 24)")
+    parser.add_argument("--kept-share", type=float, default=0.4,
+                        help="share of channels taken from keep_channels (default: 0.4)")
+    parser.add_argument("--mix", type=parse_mix, default=(0.2, 0.5, 0.3),
+                        help="sports,episodic,movie share of programmes (default: 0.2,0.5,0.3)")
+    parser.add_argument("--seed", type=int, default=1, help="generator seed (default: 1)")
+    parser.add_argument("--gzip", action="store_true", help="generate a gzip-compressed guide")
+    parser.add_argument("--repeat", type=int, default=1,
+                        help="repeat the stage benchmarks, keeping the best time (default: 1)")
+    parser.add_argument("--only", choices=("clean", "filter", "text", "fetch"), default=None,
+                        help="benchmark one script (or the text cleaning / fetch pipeline benchmark) only")
+    parser.add_argument("--fetch-rate", type=float, default=2.0, metavar="MB/S",
+                        help="bandwidth of the local guide server in the fetch benchmark (default: 2)")
+    parser.add_argument("--fetch-drop", type=float, default=0.5, metavar="SHARE",
+                        help="cut the connection once this far into the download to test resuming, "
+                             "0 to skip (default: 0.5)")
+    parser.add_argument("--parser", choices=(AUTO,) + BACKENDS, default=AUTO,
+                        help="XML parser backend: lxml, etree or auto, lxml if installed (default)")
+    parser.add_argument("--no-end-to-end", action="store_true", help="skip the end-to-end child process runs")
+    parser.add_argument("--tracemalloc", action="store_true",
+                        help="also record the Python-heap peak per stage (slows everything down)")
+    parser.add_argument("--keep", metavar="DIR", default=None,
+                        help="generate into DIR and keep the files (default: a temp dir, removed afterwards)")
+    parser.add_argument("-o", "--output", default="bench_epg.jsonl",
+                        help="JSON lines file the results are appended to (default: bench_epg.jsonl)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    backend = set_backend(args.parser)
+    workdir = args.keep or tempfile.mkdtemp(prefix="bench_epg_")
+    os.makedirs(workdir, exist_ok=True)
+    try:
+        path = os.path.join(workdir, "epg.xml.gz" if args.gzip else "epg.xml")
+        start = time.perf_counter()
+        guide = generate_guide(path, args.channels, args.days, args.per_day, args.kept_share, args.mix, args.seed)
+        guide["generate_s"] = round(time.perf_counter() - start, 4)
+        print(f"Generated {guide['programmes']} programmes on {guide['channels']} channels "
+              f"({guide['kept_channels']} kept), {guide['bytes'] / 1e6:.1f} MB, in {guide['generate_s']:.1f}s")
+
+        if args.tracemalloc:
+            tracemalloc.start()
+        benches = [("clean_epg", "clean_epg.py", "clean_epg.xml", bench_clean_stages),
+                   ("filter_keep_channels", "filter_keep_channels.py", "filtered_epg.xml", bench_filter_stages)]
+        benches = [b for b in benches if not args.only or b[0].startswith(args.only)]
+        results = {name: {} for name, _, _, _ in benches}
+        if not args.no_end_to_end:
+            # before the stage runs grow this process: on Linux a child's peak RSS
+            # starts out at its parent's size when it was forked
+            for name, script, output, _ in benches:
+                results[name]["end_to_end"] = run_end_to_end(script, path, os.path.join(workdir, output),
+                                                             ("--parser", backend))
+        for name, _, _, bench in benches:
+            result = results[name]
+            runs = []
+            for _ in range(max(1, args.repeat)):
+                timer = StageTimer(args.tracemalloc)
+                with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+                    result["output"] = bench(path, workdir, timer)
+                runs.append(timer.stages)
+            result["stages"] = merge_runs(runs)
+        if args.tracemalloc:
+            tracemalloc.stop()
+        text_cleaning = None
+        if not args.only or args.only == "text":
+            text_cleaning = bench_text_cleaning(path, args.repeat)
+        fetch = None
+        if args.only == "fetch" or (not args.only and not args.no_end_to_end):
+            fetch = bench_fetch(path, workdir, args.fetch_rate, args.fetch_drop, ("--parser", backend))
+
+        record = {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "parser": backend,
+            "params": {"channels": args.channels, "days": args.days, "per_day": args.per_day,
+                       "kept_share": args.kept_share, "mix": list(args.mix), "seed": args.seed,
+                       "gzip": args.gzip, "repeat": args.repeat},
+            "guide": {k: v for k, v in guide.items() if k != "path"},
+            "results": results,
+            "text_cleaning": text_cleaning,
+            "fetch": fetch,
+        }
+        with open(args.output, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, sort_keys=True) + "\n")
+
+        print(f"\nParser backend: {backend}")
+        for name, result in results.items():
+            print(f"\n{name}:")
+            for stage, st in result["stages"].items():
+                mem = f"{st['peak_rss_mb']:.0f} MB" if st["peak_rss_mb"] is not None else "n/a"
+                print(f"  {stage:<10} {st['wall_s']:8.3f}s  peak {mem}")
+            if "end_to_end" in result:
+                e2e = result["end_to_end"]
+                mem = f"{e2e['peak_rss_mb']:.0f} MB" if e2e["peak_rss_mb"] is not None else "n/a"
+                print(f"  {'end-to-end':<10} {e2e['wall_s']:8.3f}s  peak {mem}")
+        if text_cleaning is not None:
+            print(f"\ntext cleaning ({text_cleaning['fields']} fields, caches off):")
+            for name in ("sequential", "fused"):
+                st = text_cleaning[name]
+                print(f"  {name:<10} {st['wall_s']:8.3f}s  {st['fields_per_s']:>10,} fields/s")
+            print(f"  speedup    {text_cleaning['speedup']:.2f}x")
+        if fetch is not None:
+            print(f"\nfetch pipeline ({fetch['served_bytes'] / 1e6:.1f} MB gzip at {fetch['rate_mb_s']:g} MB/s):")
+            print(f"  {'download':<10} {fetch['download_s']:8.3f}s")
+            print(f"  {'clean':<10} {fetch['clean_s']:8.3f}s")
+            print(f"  {'one by one':<10} {fetch['sequential_s']:8.3f}s")
+            print(f"  {'streamed':<10} {fetch['streamed']['wall_s']:8.3f}s  (max of the two: {fetch['ideal_s']:.3f}s)")
+            if "resumed" in fetch:
+                print(f"  {'resumed':<10} {fetch['resumed']['wall_s']:8.3f}s  "
+                      f"({fetch['resumed']['requests']} requests, redirected, cut once)")
+        print(f"\nResults appended to '{args.output}'.")
+    finally:
+        if args.keep is None:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
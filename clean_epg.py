@@ -12,328 +12,76 @@ Single-file script to:
     Sports    -> "<Team A vs Team B>. <desc> (MM/DD/YYYY)"
 - Remove all extra tags except <title> and <desc> (date used to build description then removed)
 - Sort channels in the order specified and programmes by channel order + start time
-- Input file MUST be named `epg.xml` and output will be `clean_epg.xml`
+  (per-channel buckets with integer start keys, spilled to temp files past --sort-memory)
+- Input defaults to `epg.xml` (or `epg.xml.gz` / `epg.xml.xz`) and output to `clean_epg.xml`
+- Compressed inputs (gzip / xz) are read directly, no unzip step needed
+- The input (and `--merge` feeds) can be an http(s) URL: the download is decompressed and
+  cleaned as it arrives, with retries and resumed ranges (see epg_fetch.py)
+- A byte-level prefilter drops unwanted channels' programmes before the XML parser sees them
+- Input is streamed with iterparse, so memory doesn't grow with the size of `epg.xml`;
+  lxml's parser is used when it is installed (`--parser` picks one), same output either way
+- Optional multi-process cleaning (--workers N), output identical to a single-process run
+- Kept programmes are held as compact records until written; repeated strings (channel
+  ids, start/stop times, rerun titles and descriptions) are stored once, and the run
+  output shows the dedup ratios
+- Output is written incrementally; `-z` (or an output name ending in .gz) writes gzip directly,
+  compressed in blocks on all cores (`--gzip-level`, `--gzip-threads`)
+- `--state DIR` re-runs incrementally: channels whose raw programmes are unchanged since
+  the last run are copied from the cached cleaned output instead of being cleaned again
+- Every run writes a JSON report next to the output (`clean_epg.report.json`): time per
+  stage, counters (channels/programmes kept and dropped, sports detections, episode and
+  date parsing, errors) and peak memory; `--profile` / `--tracemalloc` add deep-dive data
+- Optional time window (`--keep-past HOURS`, `--keep-future DAYS`): programmes outside
+  now-past .. now+future are dropped while streaming, before they are cleaned or sorted
+- `--merge FILE` (repeatable) merges further feeds into the input in the same pass:
+  channel ids resolved through the display-name mapping, duplicate programmes dropped
+  (see epg_merge.py)
+- `--shards DIR` also writes per-channel and per-day shards of the output plus a
+  manifest.json with sizes and sha256 hashes, on a writer thread pool; shards that are
+  unchanged since the last run are left untouched (see epg_shards.py)
+- `--sidecar [FILE]` also writes the schedule as a binary file (`clean_epg.bin`) that
+  readers open with mmap instead of parsing the XML (see epg_sidecar.py)
+- `--checkpoint DIR` saves progress while streaming (input offset, cleaned programmes
+  so far, kept channels); a rerun on the same input resumes from there instead of byte
+  zero, and a checkpoint for other input or options is discarded (see epg_checkpoint.py)
+- `--filtered [FILE]` also writes filter_keep_channels.py's output from the same single
+  parse (both scripts share the channel list in epg_channels.py)
 - Won't overwrite the input file
 """
 
 import xml.etree.ElementTree as ET
+import argparse
+import cProfile
+import functools
 import re
 import os
-from datetime import datetime
+import time
+import tracemalloc
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
 
-# -------------------------------
-# Config: channel list (one per line; order matters)
-# -------------------------------
-keep_channels = [
-    "Comet(COMET).us",
-    "Laff(LAFF).us",
-    "ABC(WMTW).us",
-    "FOX(WFXT).us",
-    "FOX(WPFO).us",
-    "NBC(WBTSCD).us",
-    "NBC(WCSH).us",
-    "ABC(WCVB).us",
-    "NewEnglandCableNews(NECN).us",
-    "PBS(HD01).us",
-    "CW(WLVI).us",
-    "CBS(WBZ).us",
-    "WSBK.us",
-    "CBS(WGME).us",
-    "ION.us",
-    "MeTVNetwork(METVN).us",
-    "INSPHD(INSPHD).us",
-    "GameShowNetwork(GSN).us",
-    "FamilyEntertainmentTelevision(FETV).us",
-    "Heroes&IconsNetwork(HEROICN).us",
-    "TurnerClassicMoviesHD(TCMHD).us",
-    "OprahWinfreyNetwork(OWN).us",
-    "BET.us",
-    "DiscoveryChannel(DSC).us",
-    "Freeform(FREEFRM).us",
-    "USANetwork(USA).us",
-    "NewEnglandSportsNetwork(NESN).us",
-    "NewEnglandSportsNetworkPlus(NESNPL).us",
-    "NBCSportsBoston(NBCSB).us",
-    "ESPN.us",
-    "ESPN2.us",
-    "ESPNEWS.us",
-    "AWealthofEntertainmentHD(AWEHD).us",
-    "WEtv(WE).us",
-    "OxygenTrueCrime(OXYGEN).us",
-    "DisneyChannel(DISN).us",
-    "DisneyJunior(DJCH).us",
-    "DisneyXD(DXD).us",
-    "CartoonNetwork(TOONLSH).us",
-    "Nickelodeon(NIK).us",
-    "MSNBC.us",
-    "CableNewsNetwork(CNN).us",
-    "HLN.us",
-    "CNBC.us",
-    "FoxNewsChannel(FNC).us",
-    "LifetimeRealWomen(LRW).us",
-    "TNT.us",
-    "Lifetime(LIFE).us",
-    "LMN.us",
-    "TLC.us",
-    "AMC.us",
-    "Home&GardenTelevisionHD(HGTVD).us",
-    "TheTravelChannel(TRAV).us",
-    "A&E(AETV).us",
-    "FoodNetwork(FOOD).us",
-    "Bravo(BRAVO).us",
-    "truTV(TRUTV).us",
-    "NationalGeographicHD(NGCHD).us",
-    "HallmarkChannel(HALL).us",
-    "HallmarkFamily(HFM).us",
-    "HallmarkMystery(HMYS).us",
-    "SYFY.us",
-    "AnimalPlanet(APL).us",
-    "History(HISTORY).us",
-    "TheWeatherChannel(WEATH).us",
-    "ParamountNetwork(PAR).us",
-    "ComedyCentral(COMEDY).us",
-    "FXM.us",
-    "FXX.us",
-    "FX.us",
-    "E!EntertainmentTelevisionHD(EHD).us",
-    "AXSTV(AXSTV).us",
-    "TVLand(TVLAND).us",
-    "TBS.us",
-    "VH1.us",
-    "MTV-MusicTelevision(MTV).us",
-    "CMT(CMTV).us",
-    "DestinationAmerica(DEST).us",
-    "MagnoliaNetwork(MAGN).us",
-    "MagnoliaNetworkHD(Pacific)(MAGNPHD).us",
-    "DiscoveryLifeChannel(DLC).us",
-    "NationalGeographicWild(NGWILD).us",
-    "SmithsonianChannelHD(SMTSN).us",
-    "BBCAmerica(BBCA).us",
-    "POP(POPSD).us",
-    "Crime&InvestigationNetworkHD(CINHD).us",
-    "Vice(VICE).us",
-    "InvestigationDiscoveryHD(IDHD).us",
-    "ReelzChannel(REELZ).us",
-    "DiscoveryFamilyChannel(DFC).us",
-    "Science(SCIENCE).us",
-    "AmericanHeroesChannel(AHC).us",
-    "AMC+(AMCPLUS).us",
-    "Fuse(FUSE).us",
-    "MusicTelevisionHD(MTV2HD).us",
-    "IFC.us",
-    "FYI(FYISD).us",
-    "CookingChannel(COOK).us",
-    "Logo(LOGO).us",
-    "AdultSwim(ADSM).ca",
-    "ANTENNA(KGBTDT).us",
-    "CHARGE!(CHARGE).us",
-    "FS1.us",
-    "FS2.us",
-    "NFLNetwork(NFLNET).us",
-    "NHLNetwork(NHLNET).us",
-    "MLBNetwork(MLBN).us",
-    "NBATV(NBATV).us",
-    "CBSSportsNetwork(CBSSN).us",
-    "Ovation(OVATION).us",
-    "UPTV.us",
-    "COZITV(COZITV).us",
-    "OutdoorChannel(OUTD).us",
-    "ASPiRE(ASPRE).us",
-    "HBO.us",
-    "HBO2(HBOHIT).us",
-    "HBOComedy(HBOC).us",
-    "HBOSignature(HBODRAM).us",
-    "HBOWest(HBOHDP).us",
-    "HBOZone(HBOMOV).us",
-    "CinemaxHD(MAXHD).us",
-    "MoreMAX(MAXHIT).us",
-    "ActionMAX(MAXACT).us",
-    "5StarMAX(MAXCLAS).us",
-    "Paramount+withShowtimeOnDemand(SHOWDM).us",
-    "ShowtimeExtreme(SHOWX).us",
-    "ShowtimeNext(NEXT).us",
-    "ShowtimeShowcase(SHOCSE).us",
-    "ShowtimeFamilyzone(FAMZ).us",
-    "ShowtimeWomen(WOMEN).us",
-    "Starz(STARZ).us",
-    "StarzEdge(STZE).us",
-    "StarzCinema(STZCI).us",
-    "StarzComedy(STZC).us",
-    "StarzEncore(STZENC).us",
-    "StarzEncoreBlack(STZENBK).us",
-    "StarzEncoreClassic(STZENCL).us",
-    "StarzEncoreFamily(STZENFM).us",
-    "StarzEncoreWesterns(STZENWS).us",
-    "StarzKids(STZK).us",
-    "StarzEncoreAction(STZENAC).us",
-    "ScreenPix(SCRNPIX).us",
-    "ScreenPixAction(SCRNACT).us",
-    "ScreenPixVoices(SCRNVOI).us",
-    "ScreenPixWesterns(SCRNWST).us",
-    "MoviePlex(MPLEX).us",
-    "MGM+Drive-In(MGMDRV).us",
-    "MGM+HD(MGMHD).us",
-    "MGM+Hits(MGMHIT).us",
-    "SonyMovieChannel(SONY).us",
-    "TheMovieChannel(TMC).us",
-]
-
-# -------------------------------
-# Display name mapping (complete)
-# -------------------------------
-channel_display_map = {
-    "Comet(COMET).us": "Comet",
-    "Laff(LAFF).us": "Laff",
-    "ABC(WMTW).us": "WMTW",
-    "FOX(WFXT).us": "WFXT",
-    "FOX(WPFO).us": "WPFO",
-    "NBC(WBTSCD).us": "WBTSCD",
-    "NBC(WCSH).us": "WCSH",
-    "ABC(WCVB).us": "WCVB",
-    "NewEnglandCableNews(NECN).us": "NECN",
-    "PBS(HD01).us": "PBS",
-    "CW(WLVI).us": "WLVI",
-    "CBS(WBZ).us": "WBZ",
-    "WSBK.us": "WSBK",
-    "CBS(WGME).us": "WGME",
-    "ION.us": "ION",
-    "MeTVNetwork(METVN).us": "MeTV",
-    "INSPHD(INSPHD).us": "INSP",
-    "GameShowNetwork(GSN).us": "GSN",
-    "FamilyEntertainmentTelevision(FETV).us": "FETV",
-    "Heroes&IconsNetwork(HEROICN).us": "H&I",
-    "TurnerClassicMoviesHD(TCMHD).us": "TCM",
-    "OprahWinfreyNetwork(OWN).us": "OWN",
-    "BET.us": "BET",
-    "DiscoveryChannel(DSC).us": "Discovery",
-    "Freeform(FREEFRM).us": "Freeform",
-    "USANetwork(USA).us": "USA",
-    "NewEnglandSportsNetwork(NESN).us": "NESN",
-    "NewEnglandSportsNetworkPlus(NESNPL).us": "NESN+",
-    "NBCSportsBoston(NBCSB).us": "NBC Sports Boston",
-    "ESPN.us": "ESPN",
-    "ESPN2.us": "ESPN2",
-    "ESPNEWS.us": "ESPNews",
-    "AWealthofEntertainmentHD(AWEHD).us": "AWE",
-    "WEtv(WE).us": "WE TV",
-    "OxygenTrueCrime(OXYGEN).us": "Oxygen",
-    "DisneyChannel(DISN).us": "Disney Channel",
-    "DisneyJunior(DJCH).us": "Disney Junior",
-    "DisneyXD(DXD).us": "Disney XD",
-    "CartoonNetwork(TOONLSH).us": "Cartoon Network",
-    "Nickelodeon(NIK).us": "Nickelodeon",
-    "MSNBC.us": "MSNBC",
-    "CableNewsNetwork(CNN).us": "CNN",
-    "HLN.us": "HLN",
-    "CNBC.us": "CNBC",
-    "FoxNewsChannel(FNC).us": "Fox News",
-    "LifetimeRealWomen(LRW).us": "LRW",
-    "TNT.us": "TNT",
-    "Lifetime(LIFE).us": "Lifetime",
-    "LMN.us": "LMN",
-    "TLC.us": "TLC",
-    "AMC.us": "AMC",
-    "Home&GardenTelevisionHD(HGTVD).us": "HGTV",
-    "TheTravelChannel(TRAV).us": "Travel Channel",
-    "A&E(AETV).us": "A&E",
-    "FoodNetwork(FOOD).us": "Food Network",
-    "Bravo(BRAVO).us": "Bravo",
-    "truTV(TRUTV).us": "truTV",
-    "NationalGeographicHD(NGCHD).us": "Nat Geo",
-    "HallmarkChannel(HALL).us": "Hallmark",
-    "HallmarkFamily(HFM).us": "Hallmark Family",
-    "HallmarkMystery(HMYS).us": "Hallmark Mystery",
-    "SYFY.us": "SYFY",
-    "AnimalPlanet(APL).us": "Animal Planet",
-    "History(HISTORY).us": "History",
-    "TheWeatherChannel(WEATH).us": "Weather Channel",
-    "ParamountNetwork(PAR).us": "Paramount",
-    "ComedyCentral(COMEDY).us": "Comedy Central",
-    "FXM.us": "FXM",
-    "FXX.us": "FXX",
-    "FX.us": "FX",
-    "E!EntertainmentTelevisionHD(EHD).us": "E!",
-    "AXSTV(AXSTV).us": "AXS TV",
-    "TVLand(TVLAND).us": "TV Land",
-    "TBS.us": "TBS",
-    "VH1.us": "VH1",
-    "MTV-MusicTelevision(MTV).us": "MTV",
-    "CMT(CMTV).us": "CMT",
-    "DestinationAmerica(DEST).us": "Destination America",
-    "MagnoliaNetwork(MAGN).us": "Magnolia",
-    "MagnoliaNetworkHD(Pacific)(MAGNPHD).us": "Magnolia Pacific",
-    "DiscoveryLifeChannel(DLC).us": "Discovery Life",
-    "NationalGeographicWild(NGWILD).us": "Nat Geo Wild",
-    "SmithsonianChannelHD(SMTSN).us": "Smithsonian",
-    "BBCAmerica(BBCA).us": "BBC America",
-    "POP(POPSD).us": "POP",
-    "Crime&InvestigationNetworkHD(CINHD).us": "CI",
-    "Vice(VICE).us": "VICE",
-    "InvestigationDiscoveryHD(IDHD).us": "ID",
-    "ReelzChannel(REELZ).us": "Reelz",
-    "DiscoveryFamilyChannel(DFC).us": "Discovery Family",
-    "Science(SCIENCE).us": "Science",
-    "AmericanHeroesChannel(AHC).us": "AHC",
-    "AMC+(AMCPLUS).us": "AMC+",
-    "Fuse(FUSE).us": "Fuse",
-    "MusicTelevisionHD(MTV2HD).us": "MTV2",
-    "IFC.us": "IFC",
-    "FYI(FYISD).us": "FYI",
-    "CookingChannel(COOK).us": "Cooking Channel",
-    "Logo(LOGO).us": "Logo",
-    "AdultSwim(ADSM).ca": "Adult Swim",
-    "ANTENNA(KGBTDT).us": "ANTENNA",
-    "CHARGE!(CHARGE).us": "CHARGE!",
-    "FS1.us": "FS1",
-    "FS2.us": "FS2",
-    "NFLNetwork(NFLNET).us": "NFL Network",
-    "NHLNetwork(NHLNET).us": "NHL Network",
-    "MLBNetwork(MLBN).us": "MLB Network",
-    "NBATV(NBATV).us": "NBA TV",
-    "CBSSportsNetwork(CBSSN).us": "CBS Sports",
-    "Ovation(OVATION).us": "Ovation",
-    "UPTV.us": "UPTV",
-    "COZITV(COZITV).us": "COZI TV",
-    "OutdoorChannel(OUTD).us": "Outdoor Channel",
-    "ASPiRE(ASPRE).us": "ASPiRE",
-    "HBO.us": "HBO",
-    "HBO2(HBOHIT).us": "HBO2",
-    "HBOComedy(HBOC).us": "HBO Comedy",
-    "HBOSignature(HBODRAM).us": "HBO Signature",
-    "HBOWest(HBOHDP).us": "HBO West",
-    "HBOZone(HBOMOV).us": "HBO Zone",
-    "CinemaxHD(MAXHD).us": "Cinemax",
-    "MoreMAX(MAXHIT).us": "MoreMAX",
-    "ActionMAX(MAXACT).us": "ActionMAX",
-    "5StarMAX(MAXCLAS).us": "5StarMAX",
-    "Paramount+withShowtimeOnDemand(SHOWDM).us": "Showtime OnDemand",
-    "ShowtimeExtreme(SHOWX).us": "Showtime Extreme",
-    "ShowtimeNext(NEXT).us": "Showtime Next",
-    "ShowtimeShowcase(SHOCSE).us": "Showtime Showcase",
-    "ShowtimeFamilyzone(FAMZ).us": "Showtime Family",
-    "ShowtimeWomen(WOMEN).us": "Showtime Women",
-    "Starz(STARZ).us": "Starz",
-    "StarzEdge(STZE).us": "Starz Edge",
-    "StarzCinema(STZCI).us": "Starz Cinema",
-    "StarzComedy(STZC).us": "Starz Comedy",
-    "StarzEncore(STZENC).us": "Starz Encore",
-    "StarzEncoreBlack(STZENBK).us": "Starz Encore Black",
-    "StarzEncoreClassic(STZENCL).us": "Starz Encore Classic",
-    "StarzEncoreFamily(STZENFM).us": "Starz Encore Family",
-    "StarzEncoreWesterns(STZENWS).us": "Starz Encore Westerns",
-    "StarzKids(STZK).us": "Starz Kids",
-    "StarzEncoreAction(STZENAC).us": "Starz Encore Action",
-    "ScreenPix(SCRNPIX).us": "ScreenPix",
-    "ScreenPixAction(SCRNACT).us": "ScreenPix Action",
-    "ScreenPixVoices(SCRNVOI).us": "ScreenPix Voices",
-    "ScreenPixWesterns(SCRNWST).us": "ScreenPix Westerns",
-    "MoviePlex(MPLEX).us": "MoviePlex",
-    "MGM+Drive-In(MGMDRV).us": "MGM+ Drive-In",
-    "MGM+HD(MGMHD).us": "MGM+",
-    "MGM+Hits(MGMHIT).us": "MGM+ Hits",
-    "SonyMovieChannel(SONY).us": "Sony Movies",
-    "TheMovieChannel(TMC).us": "TMC",
-}
+from epg_io import find_input, is_url, same_file
+from epg_writer import GuideWriter
+from epg_gzip import DEFAULT_LEVEL
+from epg_shards import ShardWriter, DEFAULT_SHARD_WORKERS
+from epg_sidecar import SidecarWriter, default_sidecar_path
+from epg_sort import ProgrammeSorter, DEFAULT_MEMORY_BUDGET, payload_text
+from epg_intern import InternTable, format_intern_stats
+from epg_record import (ProgrammeRecord, TAG, ATTRIB, TEXT, TITLE_TEXT, DESC_TEXT,
+                        pack_element, unpack_element)
+from epg_state import GuideState, channel_fingerprints, code_fingerprint
+from epg_checkpoint import Checkpoint, DEFAULT_INTERVAL_MB, file_hash, job_key
+from epg_dates import TimeWindow, xmltv_epoch, start_sort_key, format_date_text, format_yyyymmdd
+from epg_report import RunReport, default_report_path, children_peak_rss_mb, tracemalloc_summary
+from epg_channels import keep_channels, channel_display_map, channel_order_map
+from epg_engine import GuideProfile, stream_guide
+from epg_xml import AUTO, BACKENDS, set_backend
+from filter_keep_channels import FilterProfile
+import epg_channels
+import epg_dates
+import epg_prefilter
+import epg_record
+import epg_writer
 
 # -------------------------------
 # Utility functions
@@ -342,28 +90,36 @@ channel_display_map = {
 # Remove bracketed annotations and words like Live/New/Repeat anywhere
 BRACKET_REMOVE_RE = re.compile(r"[\(\[\{].*?[\)\]\}]", flags=re.DOTALL)
 LIVE_WORD_RE = re.compile(r"\b(Live|New|Repeat|Encore|Premiere)\b", flags=re.IGNORECASE)
+WHITESPACE_RE = re.compile(r"\s+")
+# Anything the three passes below would change: an opening bracket, a marker
+# word, whitespace other than single inner spaces. One scan; most titles have none.
+TITLE_DIRTY_RE = re.compile(r"[\(\[\{]|\b(?:Live|New|Repeat|Encore|Premiere)\b|[^\S ]|\s\s|^\s|\s$",
+                            flags=re.IGNORECASE)
 
 def remove_brackets_and_markers(text: str) -> str:
     if not text:
         return ""
+    if TITLE_DIRTY_RE.search(text) is None:
+        return text
     t = BRACKET_REMOVE_RE.sub("", text)
     t = LIVE_WORD_RE.sub("", t)
-    t = re.sub(r"\s+", " ", t).strip()
+    t = WHITESPACE_RE.sub(" ", t).strip()
     return t
 
 # Detect sports by title/subtitle/desc keywords
 SPORT_KEY_RE = re.compile(r"(NFL|MLB|NBA|NHL|NCAA|Soccer|Football|Baseball|Basketball|Hockey|MLS|WNBA|NASCAR|UFC|Boxing|Golf|Tennis|Rugby|Cricket)", re.IGNORECASE)
+# Same keywords for ascii text lowered first: much faster than IGNORECASE, for
+# the scan that runs on every programme
+SPORT_KEY_LOWER_RE = re.compile(SPORT_KEY_RE.pattern.lower())
 
-def looks_like_sports(*texts) -> bool:
-    for t in texts:
-        if not t:
-            continue
-        if SPORT_KEY_RE.search(t):
-            return True
-    return False
+def has_sports_keyword(text: str) -> bool:
+    if text.isascii():
+        return SPORT_KEY_LOWER_RE.search(text.lower()) is not None
+    return SPORT_KEY_RE.search(text) is not None
 
 # Extract matchup using sub-title or description (preserve "at" if present, else "vs")
 VS_RE = re.compile(r"(.+?)\s+(vs\.?|v\.?|at)\s+(.+)", re.IGNORECASE)
+CAPITALIZED_RE = re.compile(r"[A-Z][\w&\.'\-\s]+")
 def extract_matchup(subtitle: str, desc: str, title: str) -> str:
     # Try subtitle first
     for src in (subtitle, desc, title):
@@ -379,174 +135,291 @@ def extract_matchup(subtitle: str, desc: str, title: str) -> str:
             # produce "Team A at Team B" or "Team A vs Team B"
             return f"{left} {connector_out} {right}"
     # fallback: try to pick two capitalized name groups
-    tokens = re.findall(r"[A-Z][\w&\.'\-\s]+", title or "")
+    tokens = CAPITALIZED_RE.findall(title or "")
     if len(tokens) >= 2:
         return f"{tokens[0].strip()} vs {tokens[1].strip()}"
     return remove_brackets_and_markers(title or "")
 
-# Parse episode-num elements (onscreen / xmltv_ns / other)
-def parse_episode_number(prog_elem: ET.Element):
-    # Look for any episode-num elements
-    for ep in prog_elem.findall("episode-num"):
-        txt = (ep.text or "").strip()
-        system = ep.attrib.get("system", "").lower()
+# Fused title stage: the sports flag, the matchup (sports only, else None) and
+# the cleaned title of a programme's raw title / sub-title / desc, together
+def clean_title_fields(raw_title: str, raw_sub: str, raw_desc: str):
+    # no keyword contains a newline, so one scan of the joined fields finds a
+    # match exactly when one of the fields has one
+    sports_flag = has_sports_keyword(f"{raw_title}\n{raw_sub}\n{raw_desc}")
+    matchup = extract_matchup(raw_sub, raw_desc, raw_title) if sports_flag else None
+    if matchup:
+        return sports_flag, matchup, matchup
+    return sports_flag, matchup, remove_brackets_and_markers(raw_title)
+
+# Episode numbers: S01E09 / S1E9 / 1x09, xmltv_ns "0.8.", onscreen S01 E09
+EPISODE_RE = re.compile(r"[sS]?0*?(\d+)[eE|xX|×]0*?(\d+)")
+XMLTV_NS_SPLIT_RE = re.compile(r"[.\-]")
+ONSCREEN_RE = re.compile(r"[sS](\d+)[^\d]*[eE](\d+)")
+SEASON_EPISODE_RE = re.compile(r"[sS](\d+)[eE](\d+)")
+
+# Parse one episode-num string (onscreen / xmltv_ns / other) into "S#E#", or None
+def parse_episode_text(txt: str, system: str):
+    # common onscreen format S01E09 or S1E9 or 1x09
+    m = EPISODE_RE.search(txt)
+    if m:
+        season = int(m.group(1))
+        episode = int(m.group(2))
+        return f"S{season}E{episode}"
+    # xmltv_ns: "0.8." or "1.8."
+    if system == "xmltv_ns" or "." in txt:
+        parts = [p for p in XMLTV_NS_SPLIT_RE.split(txt) if p != ""]
+        if len(parts) >= 2 and parts[0].isdigit() and parts[1].isdigit():
+            # xmltv_ns is zero-based
+            season = int(parts[0]) + 1
+            episode = int(parts[1]) + 1
+            return f"S{season}E{episode}"
+    # onscreen might already be S01E09
+    m2 = ONSCREEN_RE.search(txt)
+    if m2:
+        season = int(m2.group(1))
+        episode = int(m2.group(2))
+        return f"S{season}E{episode}"
+    return None
+
+# Parse episode-num children (packed, in order): first one that yields S#E# wins
+def parse_episode_number(episodes):
+    for ep in episodes:
+        txt = (ep[TEXT] or "").strip()
+        system = dict(ep[ATTRIB]).get("system", "").lower()
         if not txt:
             continue
-        # common onscreen format S01E09 or S1E9 or 1x09
-        m = re.search(r"[sS]?0*?(\d+)[eE|xX|×]0*?(\d+)", txt)
-        if m:
-            season = int(m.group(1))
-            episode = int(m.group(2))
-            return f"S{season}E{episode}"
-        # xmltv_ns: "0.8." or "1.8."
-        if system == "xmltv_ns" or "." in txt:
-            parts = [p for p in re.split(r"[.\-]", txt) if p != ""]
-            if len(parts) >= 2 and parts[0].isdigit() and parts[1].isdigit():
-                # xmltv_ns is zero-based
-                season = int(parts[0]) + 1
-                episode = int(parts[1]) + 1
-                return f"S{season}E{episode}"
-        # onscreen might already be S01E09
-        m2 = re.search(r"[sS](\d+)[^\d]*[eE](\d+)", txt)
-        if m2:
-            season = int(m2.group(1))
-            episode = int(m2.group(2))
-            return f"S{season}E{episode}"
+        parsed = parse_episode_text(txt, system)
+        if parsed:
+            return parsed
     return None
 
 # Format date (accept multiple input formats), return MM/DD/YYYY or None
+START_DIGITS_RE = re.compile(r"(\d{8,14})")
+START_DATE_RE = re.compile(r"(\d{8})")
+
 def format_date_any(date_text: str, start_text: str=None) -> str:
     if not date_text and start_text:
         # try parse from start attribute e.g. "20250910120000 +0000" or "20250910"
-        st = start_text.strip()
         # take leading digits (8 or 14)
-        digits = re.match(r"(\d{8,14})", st)
+        digits = START_DIGITS_RE.match(start_text.strip())
         if digits:
             date_text = digits.group(1)
     if not date_text:
         return None
-    s = date_text.strip()
-    # possible formats to try
-    fmts = ["%Y%m%d", "%Y-%m-%d", "%Y%m%d%H%M%S", "%Y-%m-%dT%H:%M:%S", "%Y"]
-    for f in fmts:
-        try:
-            dt = datetime.strptime(s[: len(f.replace("%","").replace("Y","").replace("m","").replace("d","")) + 0], f) if False else None
-        except Exception:
-            dt = None
-        # simpler: try parsing progressively with try/except
-    # Real parsing attempts:
-    for fmt in ("%Y%m%d%H%M%S", "%Y%m%d", "%Y-%m-%d", "%Y"):
-        try:
-            dt = datetime.strptime(s[: len(datetime.strftime(datetime.now(), fmt))], fmt) if False else datetime.strptime(s, fmt)
-            return dt.strftime("%m/%d/%Y")
-        except Exception:
-            pass
-    # try to extract 8-digit date anywhere
-    m = re.search(r"(\d{4})[-]?(\d{2})[-]?(\d{2})", s)
-    if m:
-        try:
-            dt = datetime(int(m.group(1)), int(m.group(2)), int(m.group(3)))
-            return dt.strftime("%m/%d/%Y")
-        except Exception:
-            pass
-    # try start attribute first 8 digits
-    if start_text:
-        m2 = re.match(r"(\d{8})", start_text)
+    # parsing (and the strptime fallback for unusual values) is cached per value
+    formatted = format_date_text(date_text.strip())
+    if formatted is None and start_text:
+        # try start attribute first 8 digits
+        m2 = START_DATE_RE.match(start_text)
         if m2:
-            s2 = m2.group(1)
-            try:
-                dt = datetime.strptime(s2, "%Y%m%d")
-                return dt.strftime("%m/%d/%Y")
-            except:
-                pass
-    return None
+            formatted = format_yyyymmdd(m2.group(1))
+    return formatted
 
-# Helper to keep only title+desc and remove other children (we use date/episode/subtitle before removing)
-def keep_only_title_and_desc(prog: ET.Element):
-    for child in list(prog):
-        if child.tag not in ("title", "desc"):
-            prog.remove(child)
+# -------------------------------
+# Field extraction: one walk over a programme's children fills the
+# ProgrammeFields every cleaning step reads, instead of a find() per field
+# -------------------------------
+TITLE_FIELD, SUBTITLE_FIELD, DESC_FIELD, DATE_FIELD = range(4)
+# child tag -> (field, preference): of several spellings the most preferred
+# one fills the field (its first occurrence), wherever it sits
+FIELD_TAGS = {
+    "title": (TITLE_FIELD, 0),
+    "sub-title": (SUBTITLE_FIELD, 0), "subtitle": (SUBTITLE_FIELD, 1), "sub_title": (SUBTITLE_FIELD, 2),
+    "desc": (DESC_FIELD, 0), "description": (DESC_FIELD, 1),
+    "date": (DATE_FIELD, 0),
+}
+UNSET = len(FIELD_TAGS)
+# children that can survive cleaning (a <description> only as the programme's desc)
+KEPT_TAGS = frozenset(("title", "desc", "description"))
+
+class ProgrammeFields:
+    __slots__ = ("title", "subtitle", "desc", "date", "episodes", "kept")
+
+    def __init__(self, title, subtitle, desc, date, episodes, kept):
+        self.title = title          # packed children (see epg_record), or None
+        self.subtitle = subtitle
+        self.desc = desc
+        self.date = date
+        self.episodes = episodes    # every episode-num child, in order
+        self.kept = kept            # title / desc / description children, in order
+
+def extract_fields(prog: ProgrammeRecord) -> ProgrammeFields:
+    found = [None, None, None, None]
+    ranks = [UNSET, UNSET, UNSET, UNSET]
+    episodes = []
+    kept = []
+    for child in prog.children:
+        tag = child[TAG]
+        if tag == "episode-num":
+            episodes.append(child)
+            continue
+        entry = FIELD_TAGS.get(tag)
+        if entry is None:
+            continue
+        if tag in KEPT_TAGS:
+            kept.append(child)
+        field, rank = entry
+        if rank < ranks[field]:
+            found[field] = child
+            ranks[field] = rank
+    return ProgrammeFields(found[TITLE_FIELD], found[SUBTITLE_FIELD], found[DESC_FIELD], found[DATE_FIELD],
+                           episodes, kept)
+
+# Stripped text of a packed child ("" if missing or empty)
+def child_text(child) -> str:
+    return child[TEXT].strip() if child is not None and child[TEXT] else ""
+
+# start / stop attribute values read back from a serialized programme's start tag
+START_ATTR_RE = re.compile(r'\sstart="([^"]*)"')
+STOP_ATTR_RE = re.compile(r'\sstop="([^"]*)"')
+
+def serialized_times(text: str):
+    head = text[: text.find(">")]
+    start = START_ATTR_RE.search(head)
+    stop = STOP_ATTR_RE.search(head)
+    return (start.group(1) if start else None), (stop.group(1) if stop else None)
+
+# start / stop of a sorted programme: a record, or serialized xml
+def programme_times(payload):
+    if isinstance(payload, str):
+        return serialized_times(payload)
+    return payload.start, payload.stop
+
+# title / desc of a sorted programme as written out: a record, or serialized xml
+def programme_texts(payload):
+    if isinstance(payload, str):
+        payload = ET.fromstring(payload)
+    return payload.findtext("title"), payload.findtext("desc")
 
 # Sort key for programmes: by channel order then by start time (if present)
 def programme_sort_key(prog, channel_order_map):
-    channel = prog.attrib.get("channel", "")
+    channel = prog.get("channel", "")
     order = channel_order_map.get(channel, 9999)
-    start = prog.attrib.get("start", "")
-    # try parse start as datetime for correct sorting
-    try:
-        m = re.match(r"(\d{14})", start)
-        if m:
-            dt = datetime.strptime(m.group(1), "%Y%m%d%H%M%S")
-            start_key = dt
+    return (order, start_sort_key(prog.get("start", "")))
+
+# -------------------------------
+# Memoized text normalization: reruns, marathons and daily news repeat the same
+# titles / sub-titles / episode strings thousands of times in a 14-day guide,
+# so the pure string transformations above sit behind bounded LRU caches keyed
+# on their raw input strings. Callers look the names up at call time, so
+# configure_text_caches() can resize or disable them (size 0) for a run.
+# -------------------------------
+DEFAULT_CACHE_SIZE = 65536
+MEMOIZED_FUNCTIONS = ("remove_brackets_and_markers", "extract_matchup", "parse_episode_text")
+_uncached = {name: globals()[name] for name in MEMOIZED_FUNCTIONS}
+
+def configure_text_caches(maxsize: int = DEFAULT_CACHE_SIZE):
+    for name, func in _uncached.items():
+        globals()[name] = functools.lru_cache(maxsize=maxsize)(func) if maxsize > 0 else func
+
+# {function name: {"hits", "misses", "currsize", "maxsize"}} for the caches in this process
+def text_cache_stats():
+    stats = {}
+    for name in MEMOIZED_FUNCTIONS:
+        info = getattr(globals()[name], "cache_info", None)
+        if info is not None:
+            stats[name] = info()._asdict()
+    return stats
+
+# Add up cache stats from several processes
+def sum_cache_stats(stats_list):
+    total = {}
+    for stats in stats_list:
+        for name, st in stats.items():
+            acc = total.setdefault(name, {"hits": 0, "misses": 0, "currsize": 0, "maxsize": st["maxsize"]})
+            for key in ("hits", "misses", "currsize"):
+                acc[key] += st[key]
+    return total
+
+# One-line summary of (possibly summed) cache stats
+def format_cache_stats(stats) -> str:
+    parts = []
+    for name, st in stats.items():
+        lookups = st["hits"] + st["misses"]
+        rate = 100.0 * st["hits"] / lookups if lookups else 0.0
+        parts.append(f"{name} {rate:.1f}% ({st['hits']}/{lookups}, size {st['currsize']}/{st['maxsize']})")
+    return "; ".join(parts)
+
+configure_text_caches()
+
+# Replace a kept channel's display-name(s) if a mapping exists
+def apply_display_name(channel: ET.Element):
+    mapped = channel_display_map.get(channel.attrib.get("id"))
+    if mapped:
+        # update all display-name tags (there could be multiple language versions)
+        dns = channel.findall("display-name")
+        if dns:
+            for dn in dns:
+                dn.text = mapped
         else:
-            m2 = re.match(r"(\d{8})", start)
-            if m2:
-                start_key = datetime.strptime(m2.group(1), "%Y%m%d")
-            else:
-                start_key = start
-    except Exception:
-        start_key = start
-    return (order, start_key)
+            # if no display-name exists, add one
+            dn = channel.makeelement("display-name", {})
+            dn.text = mapped
+            channel.insert(0, dn)
 
 # -------------------------------
 # Core cleaning for a programme element
 # -------------------------------
-def build_clean_programme(prog: ET.Element):
-    # find elements
-    title_el = prog.find("title")
-    subtitle_el = prog.find("sub-title") or prog.find("subtitle") or prog.find("sub_title")
-    desc_el = prog.find("desc") or prog.find("description")
-    episode_elems = prog.findall("episode-num")
-    date_el = prog.find("date")
-
-    raw_title = (title_el.text or "").strip() if title_el is not None and title_el.text else ""
-    raw_sub = (subtitle_el.text or "").strip() if subtitle_el is not None and subtitle_el.text else ""
-    raw_desc = (desc_el.text or "").strip() if desc_el is not None and desc_el.text else ""
-
-    # detect sports (check title/sub/title/desc)
-    sports_flag = looks_like_sports(raw_title) or looks_like_sports(raw_sub) or looks_like_sports(raw_desc)
-
-    # extract matchup for sports
-    matchup = None
+# What build_clean_programme saw, for the run report (per process)
+clean_counters = Counter()
+# Counters every run report carries, even when zero. programmes_filtered_out
+# counts programmes not cleaned this run: other channels' and, with --state,
+# those of unchanged channels (see programmes_reused).
+REPORT_COUNTERS = ("channels_kept", "channels_dropped", "channels_reused", "programmes_kept",
+                   "programmes_cleaned", "programmes_reused", "programmes_skipped", "programmes_filtered_out",
+                   "programmes_out_of_window",
+                   "sports_detected", "episodes_parsed", "date_fallbacks", "dates_missing", "exceptions")
+
+def build_clean_programme(prog: ProgrammeRecord):
+    # every child this needs, in one walk (packed children, see epg_record)
+    fields = extract_fields(prog)
+    title_el = fields.title
+    desc_el = fields.desc
+    date_el = fields.date
+
+    raw_title = child_text(title_el)
+    raw_sub = child_text(fields.subtitle)
+    raw_desc = child_text(desc_el)
+
+    # detect sports (check title/sub/desc), extract the matchup for sports and
+    # clean the title, in one go
+    sports_flag, matchup, new_title = clean_title_fields(raw_title, raw_sub, raw_desc)
     if sports_flag:
-        matchup = extract_matchup(raw_sub, raw_desc, raw_title)
-
-    # determine episode info (S#E#) if present
-    episode_tag_value = None
-    # prefer onscreen or xmltv_ns episode-num
-    if episode_elems:
-        # parse any found episode-num
-        for ep in episode_elems:
-            parsed = parse_episode_number(prog)
-            if parsed:
-                episode_tag_value = parsed
-                break
+        clean_counters["sports_detected"] += 1
+
+    # determine episode info (S#E#) if present: the first parseable episode-num
+    episode_tag_value = parse_episode_number(fields.episodes) if fields.episodes else None
+    if episode_tag_value:
+        clean_counters["episodes_parsed"] += 1
 
     # determine date string (MM/DD/YYYY)
     date_str = None
     # try <date> element first
-    if date_el is not None and date_el.text:
-        date_str = format_date_any(date_el.text.strip(), prog.attrib.get("start", ""))
+    if date_el is not None and date_el[TEXT]:
+        date_str = format_date_any(date_el[TEXT].strip(), prog.get("start", ""))
     else:
-        date_str = format_date_any(None, prog.attrib.get("start", ""))
+        # no <date>: fall back to the start time
+        clean_counters["date_fallbacks"] += 1
+        date_str = format_date_any(None, prog.get("start", ""))
+    if not date_str:
+        clean_counters["dates_missing"] += 1
 
     # build new title and description text
     if sports_flag and matchup:
-        new_title = matchup
+        # new_title is the matchup
         # description content: keep existing description as body; if empty, use matchup as body
         body = raw_desc if raw_desc else ""
         desc_text = f"{new_title}. {body}".strip()
     else:
-        # not sports: clean the title to remove bracketed/markers
-        new_title = remove_brackets_and_markers(raw_title)
+        # not sports: new_title is the title without brackets/markers
         # decide if TV show (episode present) else movie
         if episode_tag_value:
             # ensure "S1E9" formatting without leading zeros
             # some parsed may be "S01E09" from earlier; normalize
-            se_m = re.search(r"[sS]?0*?(\d+)[eE|xX|×]0*?(\d+)", episode_tag_value)
+            se_m = EPISODE_RE.search(episode_tag_value)
             if not se_m:
                 # already S#E#
-                m2 = re.search(r"[sS](\d+)[eE](\d+)", episode_tag_value)
+                m2 = SEASON_EPISODE_RE.search(episode_tag_value)
                 if m2:
                     season_n = int(m2.group(1))
                     episode_n = int(m2.group(2))
@@ -575,108 +448,580 @@ def build_clean_programme(prog: ET.Element):
     if date_str:
         desc_text = f"{desc_text} ({date_str})"
 
-    # ensure title and desc elements exist in the programme element
+    # keep only title and desc children, making sure both exist; their text
+    # stays on the record, the children only mark where it goes
+    children = []
+    for child in fields.kept:
+        if child is title_el:
+            child = child[:TEXT] + (TITLE_TEXT,) + child[TEXT + 1:]
+        elif child is desc_el:
+            # a <description> standing in for <desc> is written as one
+            child = ("desc",) + child[ATTRIB:TEXT] + (DESC_TEXT,) + child[TEXT + 1:]
+        elif child[TAG] == "description":
+            continue
+        children.append(child)
     if title_el is None:
-        title_el = ET.Element("title")
-        prog.insert(0, title_el)
-    title_el.text = new_title
-
+        children.insert(0, ("title", (), TITLE_TEXT, None, ()))
     if desc_el is None:
-        desc_el = ET.Element("desc")
-        # place after title
-        # remove existing children and append in order
-        prog.append(desc_el)
-    desc_el.text = desc_text
+        children.append(("desc", (), DESC_TEXT, None, ()))
 
-    # remove all other elements except title and desc
-    keep_only_title_and_desc(prog)
+    prog.set_cleaned(new_title, desc_text, children)
+
+# -------------------------------
+# Parallel cleaning: programme records travel to worker processes and back as
+# plain tuples (see epg_record)
+# -------------------------------
+# Worker entry point: clean one chunk, returning ((sort key, cleaned record), None)
+# or (None, error) per programme, plus this worker's pid, text cache stats and
+# the chunk's clean_counters
+def clean_programme_chunk(records):
+    clean_counters.clear()
+    results = []
+    for prog in records:
+        try:
+            build_clean_programme(prog)
+            results.append(((programme_sort_key(prog, channel_order_map), prog), None))
+        except Exception as e:
+            results.append((None, str(e)))
+    return results, os.getpid(), text_cache_stats(), dict(clean_counters)
+
+# -------------------------------
+# Clean output profile: kept channels and cleaned, sorted programmes
+# -------------------------------
+class CleanProfile(GuideProfile):
+    name = "clean"
+
+    # `clean_ids`: channels whose programmes are cleaned this run (all kept
+    # channels unless --state found unchanged ones); `window`: time window
+    # applied while streaming, or None
+    def __init__(self, args, clean_ids, window, report):
+        super().__init__()
+        self.channel_ids = set(channel_order_map)
+        self.programme_ids = set(clean_ids)
+        self.window = window
+        self.report = report
+        self.root = None
+        # kept programmes go into the sorter as compact records (epg_record),
+        # bucketed by channel index with an integer start key, so no Element
+        # tree is held for the output and memory stays within --sort-memory
+        self.kept_channels = []
+        self.sorter = ProgrammeSorter(len(keep_channels), args.sort_memory * 1024 * 1024)
+        # channel ids, start / stop times and reruns' titles / descs repeat all
+        # over the guide; kept records share one copy of each distinct string
+        self.strings = InternTable()
+
+        # Parallel mode: chunks are submitted in document order and their results
+        # collected in the same order, so the output matches a single-process run.
+        # Only a few chunks per worker are in flight at once to keep memory bounded.
+        self.workers = args.workers
+        self.chunk_size = args.chunk_size
+        self.pool = None
+        if args.workers > 1:
+            self.pool = ProcessPoolExecutor(max_workers=args.workers, initializer=configure_text_caches,
+                                            initargs=(args.cache_size,))
+        self.in_flight = deque()
+        self.chunk = []
+        self.worker_cache_stats = {}
+
+    def keep_programme(self, key, prog):
+        order, start_key = key
+        self.report.enter("sort")
+        self.strings.intern_record(prog)
+        spills = len(self.sorter.spills)
+        self.sorter.add(order, start_key, prog)
+        if len(self.sorter.spills) != spills:
+            # spilled records are text on disk now; don't keep their strings alive
+            self.strings.clear()
+        self.report.exit()
+
+    def collect(self, future):
+        # time spent waiting on the workers counts as cleaning
+        with self.report.stage("clean"):
+            results, pid, stats, counters = future.result()
+        self.worker_cache_stats[pid] = stats
+        self.report.counters.update(counters)
+        for result, error in results:
+            if error is not None:
+                print(f"WARNING: Skipping programme due to error: {error}")
+                self.report.count("programmes_skipped")
+                self.report.exception(error)
+            else:
+                self.keep_programme(*result)
+
+    # Wait for every chunk handed to the workers and keep their results
+    def drain(self):
+        if self.pool is not None:
+            if self.chunk:
+                self.submit_chunk()
+            while self.in_flight:
+                self.collect(self.in_flight.popleft())
+
+    # Everything kept so far, for a checkpoint: the sorter's runs go to `directory`
+    def checkpoint_state(self, directory):
+        self.drain()
+        with self.report.stage("sort"):
+            sorter = self.sorter.persist(directory)
+        # spilled records are text on disk now
+        self.strings.clear()
+        return {"channels": [pack_element(c) for c in self.kept_channels], "sorter": sorter}
+
+    def restore(self, state):
+        self.kept_channels = [unpack_element(packed) for packed in state["channels"]]
+        self.sorter.restore(state["sorter"])
+
+    def submit_chunk(self):
+        with self.report.stage("clean"):
+            self.in_flight.append(self.pool.submit(clean_programme_chunk, self.chunk[:]))
+        self.chunk.clear()
+        while len(self.in_flight) > 2 * self.workers:
+            self.collect(self.in_flight.popleft())
+
+    def start(self, root):
+        self.root = root
+
+    def channel(self, elem):
+        if elem.attrib.get("id") in channel_order_map:
+            apply_display_name(elem)
+            self.kept_channels.append(elem)
+        else:
+            self.report.count("channels_dropped")
+
+    def programme(self, elem):
+        report = self.report
+        chan = elem.attrib.get("channel")
+        if chan not in self.programme_ids:
+            report.count("programmes_filtered_out")
+            return
+        if self.window is not None and not self.window.contains(elem.attrib.get("start"), elem.attrib.get("stop")):
+            report.count("programmes_out_of_window")
+            return
+        # from here on the programme is a compact record, not an Element
+        with report.stage("clean"):
+            prog = ProgrammeRecord.from_element(elem)
+        if self.pool is not None:
+            self.chunk.append(prog)
+            if len(self.chunk) >= self.chunk_size:
+                self.submit_chunk()
+            return
+        # perform cleaning in place (we'll keep the record)
+        report.enter("clean")
+        try:
+            build_clean_programme(prog)
+            key = programme_sort_key(prog, channel_order_map)
+        except Exception as e:
+            # skip if some programme cannot be processed, but continue
+            print(f"WARNING: Skipping programme due to error: {e}")
+            report.count("programmes_skipped")
+            report.exception(str(e))
+            return
+        finally:
+            report.exit()
+        self.keep_programme(key, prog)
+
+    def finish(self):
+        if self.pool is not None:
+            self.drain()
+            self.shutdown()
+
+    def abort(self):
+        self.shutdown()
+
+    def shutdown(self):
+        if self.pool is not None:
+            self.pool.shutdown(cancel_futures=True)
+            self.pool = None
+            self.report.info["workers_peak_rss_mb"] = children_peak_rss_mb()
 
 # -------------------------------
 # Main: read epg.xml -> write clean_epg.xml
 # -------------------------------
-def main():
-    input_name = "epg.xml"
-    output_name = "clean_epg.xml"
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Clean an XMLTV guide down to the configured channel list.")
+    parser.add_argument("input", nargs="?", default=None,
+                        help="input guide, plain or gzip/xz compressed, or its http(s) URL "
+                             "(default: epg.xml, epg.xml.gz or epg.xml.xz)")
+    parser.add_argument("-o", "--output", default="clean_epg.xml",
+                        help="output file (default: clean_epg.xml); a .gz name writes gzip")
+    parser.add_argument("-z", "--gzip", action="store_true",
+                        help="write gzip-compressed output (appends .gz to the output name)")
+    parser.add_argument("--gzip-level", type=int, choices=range(1, 10), default=DEFAULT_LEVEL, metavar="1-9",
+                        help=f"gzip compression level (default: {DEFAULT_LEVEL})")
+    parser.add_argument("--gzip-threads", type=int, default=None, metavar="N",
+                        help="threads compressing gzip output (default: one per CPU)")
+    parser.add_argument("--no-prefilter", action="store_true",
+                        help="parse every block of the input instead of prefiltering by channel id")
+    parser.add_argument("--parser", choices=(AUTO,) + BACKENDS, default=AUTO,
+                        help="XML parser: lxml, etree (standard library) or auto, lxml if installed (default)")
+    parser.add_argument("--sort-memory", type=int, default=DEFAULT_MEMORY_BUDGET // (1024 * 1024),
+                        help="MB of cleaned programmes held in memory before spilling to temp files (default: 256)")
+    parser.add_argument("--state", metavar="DIR", default=None,
+                        help="keep per-channel fingerprints + cleaned output in DIR and only re-clean changed channels")
+    parser.add_argument("--cache-size", type=int, default=DEFAULT_CACHE_SIZE,
+                        help="entries per text-normalization LRU cache, 0 disables (default: 65536)")
+    parser.add_argument("-j", "--workers", type=int, default=1,
+                        help="worker processes for programme cleaning (default: 1, in-process)")
+    parser.add_argument("--chunk-size", type=int, default=500,
+                        help="programmes per chunk sent to a worker (default: 500)")
+    parser.add_argument("--merge", metavar="FILE", action="append", default=[],
+                        help="merge another feed into the input (repeatable; the input wins on duplicates)")
+    parser.add_argument("--shards", metavar="DIR", default=None,
+                        help="also write per-channel / per-day shards and a manifest.json to DIR")
+    parser.add_argument("--shard-workers", type=int, default=DEFAULT_SHARD_WORKERS,
+                        help=f"threads writing shards (default: {DEFAULT_SHARD_WORKERS})")
+    parser.add_argument("--sidecar", nargs="?", const="", metavar="FILE", default=None,
+                        help="also write a binary, mmap-able copy of the schedule "
+                             "(default FILE: output name with .bin, e.g. clean_epg.bin)")
+    parser.add_argument("--checkpoint", metavar="DIR", default=None,
+                        help="save progress to DIR while streaming and resume from it after a failed run")
+    parser.add_argument("--checkpoint-every", type=int, metavar="MB", default=DEFAULT_INTERVAL_MB,
+                        help=f"MB of input between checkpoints (default: {DEFAULT_INTERVAL_MB})")
+    parser.add_argument("--filtered", nargs="?", const="filtered_epg.xml", metavar="FILE", default=None,
+                        help="also write filter_keep_channels.py's output (default name: filtered_epg.xml) from the same pass")
+    parser.add_argument("--keep-past", type=float, metavar="HOURS", default=None,
+                        help="drop programmes that ended more than HOURS before now (e.g. 2)")
+    parser.add_argument("--keep-future", type=float, metavar="DAYS", default=None,
+                        help="drop programmes starting more than DAYS after now (e.g. 14)")
+    parser.add_argument("--now", metavar="TIME", default=None,
+                        help='reference time for the window as an XMLTV time, e.g. "20250910120000 +0000" (default: current time)')
+    parser.add_argument("--report", metavar="FILE", default=None,
+                        help="run report path (default: next to the output, e.g. clean_epg.report.json)")
+    parser.add_argument("--no-report", action="store_true", help="don't write the run report")
+    parser.add_argument("--profile", metavar="FILE", default=None,
+                        help="profile the run with cProfile and dump the stats to FILE")
+    parser.add_argument("--tracemalloc", action="store_true",
+                        help="trace Python allocations and add the top sites to the report (slow)")
+    return parser.parse_args(argv)
+
+# Report entry for an input: local path and size, or a URL (see the "fetch" entry)
+def input_info(name):
+    if is_url(name):
+        return {"url": name}
+    return {"path": name, "bytes": os.path.getsize(name)}
+
+def main(argv=None):
+    args = parse_args(argv)
+    input_name = args.input or find_input("epg.xml") or "epg.xml"
+    output_name = args.output
+    if args.gzip and not output_name.endswith(".gz"):
+        output_name += ".gz"
+
+    try:
+        backend = set_backend(args.parser)
+    except ValueError as e:
+        print(f"ERROR: {e}")
+        return
 
     # Safety checks
-    if not os.path.exists(input_name):
+    if not is_url(input_name) and not os.path.exists(input_name):
         print(f"ERROR: Input file '{input_name}' not found in this folder. Place your original EPG file named '{input_name}' here and re-run.")
         return
 
-    if os.path.abspath(input_name) == os.path.abspath(output_name):
-        print("ERROR: Output filename would overwrite input. Aborting for safety.")
+    for path in args.merge:
+        if not is_url(path) and not os.path.exists(path):
+            print(f"ERROR: Feed to merge '{path}' not found.")
+            return
+    if args.merge and args.state:
+        print("ERROR: --merge can't be combined with --state (channel fingerprints cover one input).")
         return
+    if is_url(input_name) and (args.state or args.checkpoint):
+        print("ERROR: --state and --checkpoint need a local input file, not a URL.")
+        return
+    if args.checkpoint and (args.merge or args.filtered or args.no_prefilter):
+        print("ERROR: --checkpoint can't be combined with --merge, --filtered or --no-prefilter "
+              "(resuming needs one prefiltered input and output written at the end).")
+        return
+
+    for path in [input_name] + args.merge:
+        if same_file(path, output_name) or (args.filtered and same_file(path, args.filtered)):
+            print("ERROR: Output filename would overwrite input. Aborting for safety.")
+            return
+    if args.filtered and same_file(output_name, args.filtered):
+        print("ERROR: --filtered output would overwrite the cleaned output.")
+        return
+    if args.sidecar is not None:
+        sidecar_name = args.sidecar or default_sidecar_path(output_name)
+        if any(same_file(path, sidecar_name) for path in [input_name, output_name, args.filtered or ""] + args.merge):
+            print("ERROR: --sidecar file would overwrite the input or an output.")
+            return
+
+    # Time window around now; None keeps every programme
+    window = None
+    if args.keep_past is not None or args.keep_future is not None:
+        now = int(time.time())
+        if args.now:
+            now = xmltv_epoch(args.now)
+            if now is None:
+                print(f"ERROR: Can't read --now time '{args.now}'. Expected e.g. \"20250910120000 +0000\".")
+                return
+        window = TimeWindow(now - round(args.keep_past * 3600) if args.keep_past is not None else None,
+                            now + round(args.keep_future * 86400) if args.keep_future is not None else None)
+
+    # Instrumentation: stage timings and counters go to a JSON report next to
+    # the output; --profile / --tracemalloc add deep-dive data on request
+    report = RunReport()
+    report.info["input"] = input_info(input_name)
+    if args.merge:
+        report.info["merged"] = [input_info(path) for path in args.merge]
+    report.info["options"] = {"prefilter": not args.no_prefilter, "parser": backend, "workers": args.workers,
+                              "chunk_size": args.chunk_size, "sort_memory_mb": args.sort_memory,
+                              "cache_size": args.cache_size, "state": args.state is not None,
+                              "shards": args.shards, "sidecar": args.sidecar is not None,
+                              "gzip_level": args.gzip_level,
+                              "checkpoint": args.checkpoint,
+                              "window": [window.start, window.end] if window is not None else None}
+    profiler = None
+    if args.profile:
+        profiler = cProfile.Profile()
+        profiler.enable()
+    if args.tracemalloc:
+        tracemalloc.start()
+    try:
+        clean_guide(args, input_name, output_name, window, report)
+    except Exception as e:
+        report.fail(str(e))
+        raise
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(args.profile)
+            report.info["profile"] = args.profile
+        if args.tracemalloc:
+            report.info["tracemalloc"] = tracemalloc_summary()
+            tracemalloc.stop()
+        if os.path.exists(output_name):
+            report.info["output"] = {"path": output_name, "bytes": os.path.getsize(output_name)}
+        if args.filtered and os.path.exists(args.filtered):
+            report.info["filtered_output"] = {"path": args.filtered, "bytes": os.path.getsize(args.filtered)}
+        if not args.no_report:
+            report_name = args.report or default_report_path(output_name)
+            try:
+                report.write(report_name)
+                print(f"Run report written to '{report_name}'.")
+            except OSError as e:
+                print(f"WARNING: Failed to write run report: {e}")
 
-    # Parse
+def clean_guide(args, input_name, output_name, window, report):
+    for name in REPORT_COUNTERS:
+        report.count(name, 0)
+
+    channel_order = channel_order_map
+
+    # Incremental mode: fingerprint every kept channel's raw programme blocks and
+    # take unchanged channels from the state directory instead of re-cleaning them
+    state = None
+    fingerprints = {}
+    cached_channels = {}
+    clean_ids = channel_order
+    code = None
+    if args.state or args.checkpoint:
+        code = code_fingerprint(__file__, epg_channels.__file__, epg_dates.__file__, epg_prefilter.__file__,
+                                epg_record.__file__, epg_writer.__file__)
+    if args.state:
+        state = GuideState(args.state, code).load()
+        try:
+            with report.stage("fingerprint"):
+                fingerprints, complete = channel_fingerprints(input_name, channel_order)
+        except Exception as e:
+            print(f"ERROR: Failed to parse '{input_name}': {e}")
+            report.fail(f"Failed to parse '{input_name}': {e}")
+            return
+        if not complete:
+            print("WARNING: Some programmes couldn't be fingerprinted; re-cleaning every channel.")
+            state = None
+        else:
+            for cid, fingerprint in fingerprints.items():
+                entries = state.cached(cid, fingerprint)
+                if entries is not None:
+                    cached_channels[cid] = entries
+            clean_ids = {cid for cid in channel_order if cid not in cached_channels}
+            report.count("channels_reused", len(cached_channels))
+            print(f"Incremental: {len(cached_channels)} unchanged channel(s) reused, {len(clean_ids)} to clean.")
+
+    # Checkpoints: a saved run of this same job (input bytes, code, channels to
+    # clean, window options) picks up where it stopped, with the window it used
+    checkpoint = None
+    if args.checkpoint:
+        with report.stage("fingerprint"):
+            key = job_key(file_hash(input_name), code, sorted(clean_ids),
+                          args.keep_past, args.keep_future, args.now)
+        checkpoint = Checkpoint(args.checkpoint, key, args.checkpoint_every * 1024 * 1024)
+        if checkpoint.load() is not None:
+            window = checkpoint.state["window"]
+            print(f"Resuming from checkpoint at byte {checkpoint.offset:,} of the input.")
+            report.info["checkpoint_resumed_at"] = checkpoint.offset
+
+    # The time window is applied while streaming, right after the channel check.
+    # Stored channel output has to stay complete (the window moves from run to
+    # run), so in incremental mode it is applied when writing instead.
+    stream_window = window if state is None else None
+    write_window = window if state is not None else None
+
+    # One streaming pass over the input drives the clean profile and, with
+    # --filtered, the filter_keep_channels.py profile too. Each channel /
+    # programme is handled as soon as it closes and everything nobody keeps is
+    # dropped straight away, so memory stays bounded by the cleaned output
+    # instead of the whole source document. The clean profile changes elements
+    # in place, so it goes last.
+    configure_text_caches(args.cache_size)
+    clean_counters.clear()
+    clean = CleanProfile(args, clean_ids, stream_window, report)
+    if checkpoint is not None:
+        # counters the stream adds up, carried over between resumed runs
+        baseline = Counter(report.counters)
+        def collect():
+            profile = clean.checkpoint_state(checkpoint.directory)
+            counters = Counter(report.counters)
+            counters.subtract(baseline)
+            return dict(profile, window=window, counters=dict(+counters), clean_counters=dict(clean_counters),
+                        dropped=checkpoint.dropped)
+        checkpoint.collect = collect
+        if checkpoint.state is not None:
+            saved = checkpoint.state
+            clean.restore(saved)
+            report.counters.update(saved["counters"])
+            clean_counters.update(saved["clean_counters"])
+    profiles = [clean]
+    filtered = None
+    if args.filtered:
+        filtered = FilterProfile(args.filtered)
+        profiles.insert(0, filtered)
     try:
-        tree = ET.parse(input_name)
-        root = tree.getroot()
+        prefiltered = stream_guide(input_name, profiles, report, prefilter=not args.no_prefilter,
+                                   merge_inputs=args.merge, checkpoint=checkpoint)
+        if clean.error is not None:
+            raise clean.error
     except Exception as e:
         print(f"ERROR: Failed to parse '{input_name}': {e}")
+        report.fail(f"Failed to parse '{input_name}': {e}")
+        clean.sorter.close()
         return
+    if filtered is not None:
+        if filtered.error is not None:
+            print(f"ERROR: Failed to write filtered output '{args.filtered}': {filtered.error}")
+            report.fail(f"Failed to write filtered output '{args.filtered}': {filtered.error}")
+        else:
+            print(f"Filtered EPG saved to {args.filtered}")
+    if prefiltered is not None:
+        dropped = Counter(prefiltered.dropped)
+        if checkpoint is not None and checkpoint.state is not None:
+            dropped.update(checkpoint.state["dropped"])
+        report.count("channels_dropped", dropped["channel"])
+        report.count("programmes_filtered_out", dropped["programme"])
+    report.counters.update(clean_counters)
+    root = clean.root
+    kept_channels = clean.kept_channels
+    sorter = clean.sorter
+    worker_cache_stats = clean.worker_cache_stats
+    # nothing else gets added; the records hold their shared strings themselves
+    clean.strings.clear()
+    report.count("programmes_cleaned", sorter.count)
 
-    # Build order map
-    channel_order = {cid: i for i, cid in enumerate(keep_channels)}
-
-    # Collect kept channels and programmes
-    kept_channels = []
-    kept_programmes = []
-
-    # iterate channels (do not remove from root while iterating)
-    for ch in root.findall("channel"):
-        cid = ch.attrib.get("id")
-        if cid in keep_channels:
-            # replace display-name(s) if mapping exists
-            mapped = channel_display_map.get(cid)
-            if mapped:
-                # update all display-name tags (there could be multiple language versions)
-                dns = ch.findall("display-name")
-                if dns:
-                    for dn in dns:
-                        dn.text = mapped
-                else:
-                    # if no display-name exists, add one
-                    dn = ET.Element("display-name")
-                    dn.text = mapped
-                    ch.insert(0, dn)
-            kept_channels.append(ch)
-
-    # iterate programmes
-    for prog in root.findall("programme"):
-        chan = prog.attrib.get("channel")
-        if chan in keep_channels:
-            # perform cleaning in place (we'll keep the element)
-            try:
-                build_clean_programme(prog)
-                kept_programmes.append(prog)
-            except Exception as e:
-                # skip if some programme cannot be processed, but continue
-                print(f"WARNING: Skipping programme due to error: {e}")
-                continue
-
-    # Sort channels by channel_order and keep the same element objects
-    kept_channels.sort(key=lambda el: channel_order.get(el.attrib.get("id"), 9999))
-
-    # Sort programmes by (channel order, start time)
-    kept_programmes.sort(key=lambda p: programme_sort_key(p, channel_order))
-
-    # Rebuild root: preserve root tag + attributes, but replace children
-    new_root = ET.Element(root.tag, root.attrib)
-
-    # Add channels then programmes
-    for c in kept_channels:
-        new_root.append(c)
-    for p in kept_programmes:
-        new_root.append(p)
-
-    # Write out
-    new_tree = ET.ElementTree(new_root)
+    # Unchanged channels: their cached output is already cleaned and sorted
+    with report.stage("sort"):
+        for cid, entries in cached_channels.items():
+            report.count("programmes_reused", len(entries))
+            for start_key, text in entries:
+                sorter.add(channel_order[cid], start_key, text)
+        cached_channels = None
+
+        # Sort channels by channel_order and keep the same element objects
+        kept_channels.sort(key=lambda el: channel_order.get(el.attrib.get("id"), 9999))
+    report.count("channels_kept", len(kept_channels))
+
+    # Write out: declaration and root (original attributes), then channels and
+    # programmes one at a time; no output tree is built
+    shards = None
+    sidecar = None
+    sidecar_name = None
+    if args.sidecar is not None:
+        sidecar_name = args.sidecar or default_sidecar_path(output_name)
     try:
-        new_tree.write(output_name, encoding="utf-8", xml_declaration=True)
+        with report.stage("write"), GuideWriter(output_name, level=args.gzip_level,
+                                                           threads=args.gzip_threads) as writer:
+            writer.start(root.tag, root.attrib)
+            for c in kept_channels:
+                writer.write_element(c)
+            if args.shards:
+                shards = ShardWriter(args.shards, (root.tag, root.attrib), kept_channels, keep_channels,
+                                     args.shard_workers)
+            if sidecar_name is not None:
+                sidecar = SidecarWriter(sidecar_name)
+                for c in kept_channels:
+                    sidecar.channel(c.attrib.get("id"), c.findtext("display-name"))
+            # programmes come out of the sorter by (channel order, start time);
+            # in incremental mode each channel's run is also stored for next time
+            channel_entries = []
+            current = None
+            written = 0
+            # (records from this run, serialized xml if spilled or cached)
+            for index, start_key, payload in report.timed_iter(sorter.items(), "sort"):
+                if state is not None:
+                    if index != current:
+                        if current is not None:
+                            state.update(keep_channels[current], fingerprints[keep_channels[current]], channel_entries)
+                        current = index
+                        channel_entries = []
+                    channel_entries.append((start_key, payload_text(payload)))
+                if write_window is not None and not write_window.contains(*programme_times(payload)):
+                    report.count("programmes_out_of_window")
+                    continue
+                if sidecar is not None:
+                    start, stop = programme_times(payload)
+                    sidecar.programme(keep_channels[index], xmltv_epoch(start) if start else None,
+                                      xmltv_epoch(stop) if stop else None, *programme_texts(payload))
+                if shards is not None:
+                    # serialized once for the output and the shards
+                    text = payload_text(payload)
+                    shards.add(keep_channels[index], programme_times(payload)[0], text)
+                    writer.write_serialized(text)
+                elif isinstance(payload, str):
+                    writer.write_serialized(payload)
+                else:
+                    writer.write_record(payload)
+                written += 1
+            if shards is not None:
+                report.info["shards"] = dict(shards.close(), dir=args.shards)
+                shards = None
+        report.count("programmes_kept", written)
+        if sidecar is not None:
+            # only once the output itself is complete
+            with report.stage("write"):
+                report.info["sidecar"] = dict(sidecar.close(), path=sidecar_name)
+        if state is not None:
+            with report.stage("write"):
+                if current is not None:
+                    state.update(keep_channels[current], fingerprints[keep_channels[current]], channel_entries)
+                state.save(fingerprints)
+        if checkpoint is not None:
+            # the output is complete; nothing to resume any more
+            report.info["checkpoints_saved"] = checkpoint.saved
+            checkpoint.clear()
         print(f"✅ Done. Cleaned guide written to '{output_name}'.")
-        print(f"Original file preserved as '{input_name}'.")
+        if not is_url(input_name):
+            print(f"Original file preserved as '{input_name}'.")
+        if "shards" in report.info:
+            counts = report.info["shards"]
+            print(f"Shards in '{args.shards}': {counts['written']} written, {counts['unchanged']} unchanged, "
+                  f"{counts['removed']} removed.")
+        if "sidecar" in report.info:
+            counts = report.info["sidecar"]
+            print(f"Sidecar written to '{sidecar_name}': {counts['programmes']:,} programmes, "
+                  f"{counts['strings']:,} distinct strings, {counts['bytes']:,} bytes.")
+        cache_stats = sum_cache_stats([text_cache_stats()] + list(worker_cache_stats.values()))
+        if cache_stats:
+            print(f"Text cache: {format_cache_stats(cache_stats)}")
+            report.info["text_cache"] = cache_stats
+        if clean.strings.used():
+            intern_stats = clean.strings.stats()
+            print(f"Interned strings: {format_intern_stats(intern_stats)}")
+            report.info["interned_strings"] = intern_stats
     except Exception as e:
         print(f"ERROR: Failed to write output file: {e}")
+        report.fail(f"Failed to write output file: {e}")
+    finally:
+        if shards is not None:
+            shards.abort()
+        sorter.close()
 
 if __name__ == "__main__":
     main()
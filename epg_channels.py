@@ -0,0 +1,483 @@
+#!/usr/bin/env python3
+"""
+epg_channels.py
+The one channel list shared by clean_epg.py and filter_keep_channels.py:
+- keep_channels: channel ids to keep, in output order
+- channel_display_map: display names written by clean_epg.py
+- filter_display_map: display names written by filter_keep_channels.py
+"""
+
+# -------------------------------
+# Config: channel list (one per line; order matters)
+# -------------------------------
+keep_channels = [
+    "Comet(COMET).us",
+    "Laff(LAFF).us",
+    "ABC(WMTW).us",
+    "FOX(WFXT).us",
+    "FOX(WPFO).us",
+    "NBC(WBTSCD).us",
+    "NBC(WCSH).us",
+    "ABC(WCVB).us",
+    "NewEnglandCableNews(NECN).us",
+    "PBS(HD01).us",
+    "CW(WLVI).us",
+    "CBS(WBZ).us",
+    "WSBK.us",
+    "CBS(WGME).us",
+    "ION.us",
+    "MeTVNetwork(METVN).us",
+    "INSPHD(INSPHD).us",
+    "GameShowNetwork(GSN).us",
+    "FamilyEntertainmentTelevision(FETV).us",
+    "Heroes&IconsNetwork(HEROICN).us",
+    "TurnerClassicMoviesHD(TCMHD).us",
+    "OprahWinfreyNetwork(OWN).us",
+    "BET.us",
+    "DiscoveryChannel(DSC).us",
+    "Freeform(FREEFRM).us",
+    "USANetwork(USA).us",
+    "NewEnglandSportsNetwork(NESN).us",
+    "NewEnglandSportsNetworkPlus(NESNPL).us",
+    "NBCSportsBoston(NBCSB).us",
+    "ESPN.us",
+    "ESPN2.us",
+    "ESPNEWS.us",
+    "AWealthofEntertainmentHD(AWEHD).us",
+    "WEtv(WE).us",
+    "OxygenTrueCrime(OXYGEN).us",
+    "DisneyChannel(DISN).us",
+    "DisneyJunior(DJCH).us",
+    "DisneyXD(DXD).us",
+    "CartoonNetwork(TOONLSH).us",
+    "Nickelodeon(NIK).us",
+    "MSNBC.us",
+    "CableNewsNetwork(CNN).us",
+    "HLN.us",
+    "CNBC.us",
+    "FoxNewsChannel(FNC).us",
+    "LifetimeRealWomen(LRW).us",
+    "TNT.us",
+    "Lifetime(LIFE).us",
+    "LMN.us",
+    "TLC.us",
+    "AMC.us",
+    "Home&GardenTelevisionHD(HGTVD).us",
+    "TheTravelChannel(TRAV).us",
+    "A&E(AETV).us",
+    "FoodNetwork(FOOD).us",
+    "Bravo(BRAVO).us",
+    "truTV(TRUTV).us",
+    "NationalGeographicHD(NGCHD).us",
+    "HallmarkChannel(HALL).us",
+    "HallmarkFamily(HFM).us",
+    "HallmarkMystery(HMYS).us",
+    "SYFY.us",
+    "AnimalPlanet(APL).us",
+    "History(HISTORY).us",
+    "TheWeatherChannel(WEATH).us",
+    "ParamountNetwork(PAR).us",
+    "ComedyCentral(COMEDY).us",
+    "FXM.us",
+    "FXX.us",
+    "FX.us",
+    "E!EntertainmentTelevisionHD(EHD).us",
+    "AXSTV(AXSTV).us",
+    "TVLand(TVLAND).us",
+    "TBS.us",
+    "VH1.us",
+    "MTV-MusicTelevision(MTV).us",
+    "CMT(CMTV).us",
+    "DestinationAmerica(DEST).us",
+    "MagnoliaNetwork(MAGN).us",
+    "MagnoliaNetworkHD(Pacific)(MAGNPHD).us",
+    "DiscoveryLifeChannel(DLC).us",
+    "NationalGeographicWild(NGWILD).us",
+    "SmithsonianChannelHD(SMTSN).us",
+    "BBCAmerica(BBCA).us",
+    "POP(POPSD).us",
+    "Crime&InvestigationNetworkHD(CINHD).us",
+    "Vice(VICE).us",
+    "InvestigationDiscoveryHD(IDHD).us",
+    "ReelzChannel(REELZ).us",
+    "DiscoveryFamilyChannel(DFC).us",
+    "Science(SCIENCE).us",
+    "AmericanHeroesChannel(AHC).us",
+    "AMC+(AMCPLUS).us",
+    "Fuse(FUSE).us",
+    "MusicTelevisionHD(MTV2HD).us",
+    "IFC.us",
+    "FYI(FYISD).us",
+    "CookingChannel(COOK).us",
+    "Logo(LOGO).us",
+    "AdultSwim(ADSM).ca",
+    "ANTENNA(KGBTDT).us",
+    "CHARGE!(CHARGE).us",
+    "FS1.us",
+    "FS2.us",
+    "NFLNetwork(NFLNET).us",
+    "NHLNetwork(NHLNET).us",
+    "MLBNetwork(MLBN).us",
+    "NBATV(NBATV).us",
+    "CBSSportsNetwork(CBSSN).us",
+    "Ovation(OVATION).us",
+    "UPTV.us",
+    "COZITV(COZITV).us",
+    "OutdoorChannel(OUTD).us",
+    "ASPiRE(ASPRE).us",
+    "HBO.us",
+    "HBO2(HBOHIT).us",
+    "HBOComedy(HBOC).us",
+    "HBOSignature(HBODRAM).us",
+    "HBOWest(HBOHDP).us",
+    "HBOZone(HBOMOV).us",
+    "CinemaxHD(MAXHD).us",
+    "MoreMAX(MAXHIT).us",
+    "ActionMAX(MAXACT).us",
+    "5StarMAX(MAXCLAS).us",
+    "Paramount+withShowtimeOnDemand(SHOWDM).us",
+    "ShowtimeExtreme(SHOWX).us",
+    "ShowtimeNext(NEXT).us",
+    "ShowtimeShowcase(SHOCSE).us",
+    "ShowtimeFamilyzone(FAMZ).us",
+    "ShowtimeWomen(WOMEN).us",
+    "Starz(STARZ).us",
+    "StarzEdge(STZE).us",
+    "StarzCinema(STZCI).us",
+    "StarzComedy(STZC).us",
+    "StarzEncore(STZENC).us",
+    "StarzEncoreBlack(STZENBK).us",
+    "StarzEncoreClassic(STZENCL).us",
+    "StarzEncoreFamily(STZENFM).us",
+    "StarzEncoreWesterns(STZENWS).us",
+    "StarzKids(STZK).us",
+    "StarzEncoreAction(STZENAC).us",
+    "ScreenPix(SCRNPIX).us",
+    "ScreenPixAction(SCRNACT).us",
+    "ScreenPixVoices(SCRNVOI).us",
+    "ScreenPixWesterns(SCRNWST).us",
+    "MoviePlex(MPLEX).us",
+    "MGM+Drive-In(MGMDRV).us",
+    "MGM+HD(MGMHD).us",
+    "MGM+Hits(MGMHIT).us",
+    "SonyMovieChannel(SONY).us",
+    "TheMovieChannel(TMC).us",
+]
+
+# -------------------------------
+# Display name mapping (complete)
+# -------------------------------
+channel_display_map = {
+    "Comet(COMET).us": "Comet",
+    "Laff(LAFF).us": "Laff",
+    "ABC(WMTW).us": "WMTW",
+    "FOX(WFXT).us": "WFXT",
+    "FOX(WPFO).us": "WPFO",
+    "NBC(WBTSCD).us": "WBTSCD",
+    "NBC(WCSH).us": "WCSH",
+    "ABC(WCVB).us": "WCVB",
+    "NewEnglandCableNews(NECN).us": "NECN",
+    "PBS(HD01).us": "PBS",
+    "CW(WLVI).us": "WLVI",
+    "CBS(WBZ).us": "WBZ",
+    "WSBK.us": "WSBK",
+    "CBS(WGME).us": "WGME",
+    "ION.us": "ION",
+    "MeTVNetwork(METVN).us": "MeTV",
+    "INSPHD(INSPHD).us": "INSP",
+    "GameShowNetwork(GSN).us": "GSN",
+    "FamilyEntertainmentTelevision(FETV).us": "FETV",
+    "Heroes&IconsNetwork(HEROICN).us": "H&I",
+    "TurnerClassicMoviesHD(TCMHD).us": "TCM",
+    "OprahWinfreyNetwork(OWN).us": "OWN",
+    "BET.us": "BET",
+    "DiscoveryChannel(DSC).us": "Discovery",
+    "Freeform(FREEFRM).us": "Freeform",
+    "USANetwork(USA).us": "USA",
+    "NewEnglandSportsNetwork(NESN).us": "NESN",
+    "NewEnglandSportsNetworkPlus(NESNPL).us": "NESN+",
+    "NBCSportsBoston(NBCSB).us": "NBC Sports Boston",
+    "ESPN.us": "ESPN",
+    "ESPN2.us": "ESPN2",
+    "ESPNEWS.us": "ESPNews",
+    "AWealthofEntertainmentHD(AWEHD).us": "AWE",
+    "WEtv(WE).us": "WE TV",
+    "OxygenTrueCrime(OXYGEN).us": "Oxygen",
+    "DisneyChannel(DISN).us": "Disney Channel",
+    "DisneyJunior(DJCH).us": "Disney Junior",
+    "DisneyXD(DXD).us": "Disney XD",
+    "CartoonNetwork(TOONLSH).us": "Cartoon Network",
+    "Nickelodeon(NIK).us": "Nickelodeon",
+    "MSNBC.us": "MSNBC",
+    "CableNewsNetwork(CNN).us": "CNN",
+    "HLN.us": "HLN",
+    "CNBC.us": "CNBC",
+    "FoxNewsChannel(FNC).us": "Fox News",
+    "LifetimeRealWomen(LRW).us": "LRW",
+    "TNT.us": "TNT",
+    "Lifetime(LIFE).us": "Lifetime",
+    "LMN.us": "LMN",
+    "TLC.us": "TLC",
+    "AMC.us": "AMC",
+    "Home&GardenTelevisionHD(HGTVD).us": "HGTV",
+    "TheTravelChannel(TRAV).us": "Travel Channel",
+    "A&E(AETV).us": "A&E",
+    "FoodNetwork(FOOD).us": "Food Network",
+    "Bravo(BRAVO).us": "Bravo",
+    "truTV(TRUTV).us": "truTV",
+    "NationalGeographicHD(NGCHD).us": "Nat Geo",
+    "HallmarkChannel(HALL).us": "Hallmark",
+    "HallmarkFamily(HFM).us": "Hallmark Family",
+    "HallmarkMystery(HMYS).us": "Hallmark Mystery",
+    "SYFY.us": "SYFY",
+    "AnimalPlanet(APL).us": "Animal Planet",
+    "History(HISTORY).us": "History",
+    "TheWeatherChannel(WEATH).us": "Weather Channel",
+    "ParamountNetwork(PAR).us": "Paramount",
+    "ComedyCentral(COMEDY).us": "Comedy Central",
+    "FXM.us": "FXM",
+    "FXX.us": "FXX",
+    "FX.us": "FX",
+    "E!EntertainmentTelevisionHD(EHD).us": "E!",
+    "AXSTV(AXSTV).us": "AXS TV",
+    "TVLand(TVLAND).us": "TV Land",
+    "TBS.us": "TBS",
+    "VH1.us": "VH1",
+    "MTV-MusicTelevision(MTV).us": "MTV",
+    "CMT(CMTV).us": "CMT",
+    "DestinationAmerica(DEST).us": "Destination America",
+    "MagnoliaNetwork(MAGN).us": "Magnolia",
+    "MagnoliaNetworkHD(Pacific)(MAGNPHD).us": "Magnolia Pacific",
+    "DiscoveryLifeChannel(DLC).us": "Discovery Life",
+    "NationalGeographicWild(NGWILD).us": "Nat Geo Wild",
+    "SmithsonianChannelHD(SMTSN).us": "Smithsonian",
+    "BBCAmerica(BBCA).us": "BBC America",
+    "POP(POPSD).us": "POP",
+    "Crime&InvestigationNetworkHD(CINHD).us": "CI",
+    "Vice(VICE).us": "VICE",
+    "InvestigationDiscoveryHD(IDHD).us": "ID",
+    "ReelzChannel(REELZ).us": "Reelz",
+    "DiscoveryFamilyChannel(DFC).us": "Discovery Family",
+    "Science(SCIENCE).us": "Science",
+    "AmericanHeroesChannel(AHC).us": "AHC",
+    "AMC+(AMCPLUS).us": "AMC+",
+    "Fuse(FUSE).us": "Fuse",
+    "MusicTelevisionHD(MTV2HD).us": "MTV2",
+    "IFC.us": "IFC",
+    "FYI(FYISD).us": "FYI",
+    "CookingChannel(COOK).us": "Cooking Channel",
+    "Logo(LOGO).us": "Logo",
+    "AdultSwim(ADSM).ca": "Adult Swim",
+    "ANTENNA(KGBTDT).us": "ANTENNA",
+    "CHARGE!(CHARGE).us": "CHARGE!",
+    "FS1.us": "FS1",
+    "FS2.us": "FS2",
+    "NFLNetwork(NFLNET).us": "NFL Network",
+    "NHLNetwork(NHLNET).us": "NHL Network",
+    "MLBNetwork(MLBN).us": "MLB Network",
+    "NBATV(NBATV).us": "NBA TV",
+    "CBSSportsNetwork(CBSSN).us": "CBS Sports",
+    "Ovation(OVATION).us": "Ovation",
+    "UPTV.us": "UPTV",
+    "COZITV(COZITV).us": "COZI TV",
+    "OutdoorChannel(OUTD).us": "Outdoor Channel",
+    "ASPiRE(ASPRE).us": "ASPiRE",
+    "HBO.us": "HBO",
+    "HBO2(HBOHIT).us": "HBO2",
+    "HBOComedy(HBOC).us": "HBO Comedy",
+    "HBOSignature(HBODRAM).us": "HBO Signature",
+    "HBOWest(HBOHDP).us": "HBO West",
+    "HBOZone(HBOMOV).us": "HBO Zone",
+    "CinemaxHD(MAXHD).us": "Cinemax",
+    "MoreMAX(MAXHIT).us": "MoreMAX",
+    "ActionMAX(MAXACT).us": "ActionMAX",
+    "5StarMAX(MAXCLAS).us": "5StarMAX",
+    "Paramount+withShowtimeOnDemand(SHOWDM).us": "Showtime OnDemand",
+    "ShowtimeExtreme(SHOWX).us": "Showtime Extreme",
+    "ShowtimeNext(NEXT).us": "Showtime Next",
+    "ShowtimeShowcase(SHOCSE).us": "Showtime Showcase",
+    "ShowtimeFamilyzone(FAMZ).us": "Showtime Family",
+    "ShowtimeWomen(WOMEN).us": "Showtime Women",
+    "Starz(STARZ).us": "Starz",
+    "StarzEdge(STZE).us": "Starz Edge",
+    "StarzCinema(STZCI).us": "Starz Cinema",
+    "StarzComedy(STZC).us": "Starz Comedy",
+    "StarzEncore(STZENC).us": "Starz Encore",
+    "StarzEncoreBlack(STZENBK).us": "Starz Encore Black",
+    "StarzEncoreClassic(STZENCL).us": "Starz Encore Classic",
+    "StarzEncoreFamily(STZENFM).us": "Starz Encore Family",
+    "StarzEncoreWesterns(STZENWS).us": "Starz Encore Westerns",
+    "StarzKids(STZK).us": "Starz Kids",
+    "StarzEncoreAction(STZENAC).us": "Starz Encore Action",
+    "ScreenPix(SCRNPIX).us": "ScreenPix",
+    "ScreenPixAction(SCRNACT).us": "ScreenPix Action",
+    "ScreenPixVoices(SCRNVOI).us": "ScreenPix Voices",
+    "ScreenPixWesterns(SCRNWST).us": "ScreenPix Westerns",
+    "MoviePlex(MPLEX).us": "MoviePlex",
+    "MGM+Drive-In(MGMDRV).us": "MGM+ Drive-In",
+    "MGM+HD(MGMHD).us": "MGM+",
+    "MGM+Hits(MGMHIT).us": "MGM+ Hits",
+    "SonyMovieChannel(SONY).us": "Sony Movies",
+    "TheMovieChannel(TMC).us": "TMC",
+}
+
+# Channel order lookup (also used as the keep set)
+channel_order_map = {cid: i for i, cid in enumerate(keep_channels)}
+
+# -------------------------------
+# Display names used by filter_keep_channels.py (the first display-name of each
+# kept channel is replaced; same channels as keep_channels)
+# -------------------------------
+filter_display_map = {
+    "Comet(COMET).us": "Comet",
+    "Laff(LAFF).us": "Laff",
+    "ABC(WMTW).us": "ABC",
+    "FOX(WFXT).us": "FOX",
+    "FOX(WPFO).us": "FOX",
+    "NBC(WBTSCD).us": "NBC",
+    "NBC(WCSH).us": "NBC",
+    "ABC(WCVB).us": "ABC",
+    "NewEnglandCableNews(NECN).us": "NewEnglandCableNews",
+    "PBS(HD01).us": "PBS",
+    "CW(WLVI).us": "CW",
+    "CBS(WBZ).us": "CBS",
+    "WSBK.us": "WSBK",
+    "CBS(WGME).us": "CBS",
+    "ION.us": "ION",
+    "MeTVNetwork(METVN).us": "MeTVNetwork",
+    "INSPHD(INSPHD).us": "INSPHD",
+    "GameShowNetwork(GSN).us": "GameShowNetwork",
+    "FamilyEntertainmentTelevision(FETV).us": "FamilyEntertainmentTelevision",
+    "Heroes&IconsNetwork(HEROICN).us": "Heroes&IconsNetwork",
+    "TurnerClassicMoviesHD(TCMHD).us": "TurnerClassicMoviesHD",
+    "OprahWinfreyNetwork(OWN).us": "OprahWinfreyNetwork",
+    "BET.us": "BET",
+    "DiscoveryChannel(DSC).us": "DiscoveryChannel",
+    "Freeform(FREEFRM).us": "Freeform",
+    "USANetwork(USA).us": "USANetwork",
+    "NewEnglandSportsNetwork(NESN).us": "NewEnglandSportsNetwork",
+    "NewEnglandSportsNetworkPlus(NESNPL).us": "NewEnglandSportsNetworkPlus",
+    "NBCSportsBoston(NBCSB).us": "NBCSportsBoston",
+    "ESPN.us": "ESPN",
+    "ESPN2.us": "ESPN2",
+    "ESPNEWS.us": "ESPNEWS",
+    "AWealthofEntertainmentHD(AWEHD).us": "AWealthofEntertainmentHD",
+    "WEtv(WE).us": "WEtv",
+    "OxygenTrueCrime(OXYGEN).us": "OxygenTrueCrime",
+    "DisneyChannel(DISN).us": "DisneyChannel",
+    "DisneyJunior(DJCH).us": "DisneyJunior",
+    "DisneyXD(DXD).us": "DisneyXD",
+    "CartoonNetwork(TOONLSH).us": "CartoonNetwork",
+    "Nickelodeon(NIK).us": "Nickelodeon",
+    "MSNBC.us": "MSNBC",
+    "CableNewsNetwork(CNN).us": "CableNewsNetwork",
+    "HLN.us": "HLN",
+    "CNBC.us": "CNBC",
+    "FoxNewsChannel(FNC).us": "FoxNewsChannel",
+    "LifetimeRealWomen(LRW).us": "LifetimeRealWomen",
+    "TNT.us": "TNT",
+    "Lifetime(LIFE).us": "Lifetime",
+    "LMN.us": "LMN",
+    "TLC.us": "TLC",
+    "AMC.us": "AMC",
+    "Home&GardenTelevisionHD(HGTVD).us": "Home&GardenTelevisionHD",
+    "TheTravelChannel(TRAV).us": "TheTravelChannel",
+    "A&E(AETV).us": "A&E",
+    "FoodNetwork(FOOD).us": "FoodNetwork",
+    "Bravo(BRAVO).us": "Bravo",
+    "truTV(TRUTV).us": "truTV",
+    "NationalGeographicHD(NGCHD).us": "NationalGeographicHD",
+    "HallmarkChannel(HALL).us": "HallmarkChannel",
+    "HallmarkFamily(HFM).us": "HallmarkFamily",
+    "HallmarkMystery(HMYS).us": "HallmarkMystery",
+    "SYFY.us": "SYFY",
+    "AnimalPlanet(APL).us": "AnimalPlanet",
+    "History(HISTORY).us": "History",
+    "TheWeatherChannel(WEATH).us": "TheWeatherChannel",
+    "ParamountNetwork(PAR).us": "ParamountNetwork",
+    "ComedyCentral(COMEDY).us": "ComedyCentral",
+    "FXM.us": "FXM",
+    "FXX.us": "FXX",
+    "FX.us": "FX",
+    "E!EntertainmentTelevisionHD(EHD).us": "E!EntertainmentTelevisionHD",
+    "AXSTV(AXSTV).us": "AXSTV",
+    "TVLand(TVLAND).us": "TVLand",
+    "TBS.us": "TBS",
+    "VH1.us": "VH1",
+    "MTV-MusicTelevision(MTV).us": "MTV-MusicTelevision",
+    "CMT(CMTV).us": "CMT",
+    "DestinationAmerica(DEST).us": "DestinationAmerica",
+    "MagnoliaNetwork(MAGN).us": "MagnoliaNetwork",
+    "MagnoliaNetworkHD(Pacific)(MAGNPHD).us": "MagnoliaNetworkHD(Pacific)",
+    "DiscoveryLifeChannel(DLC).us": "DiscoveryLifeChannel",
+    "NationalGeographicWild(NGWILD).us": "NationalGeographicWild",
+    "SmithsonianChannelHD(SMTSN).us": "SmithsonianChannelHD",
+    "BBCAmerica(BBCA).us": "BBCAmerica",
+    "POP(POPSD).us": "POP",
+    "Crime&InvestigationNetworkHD(CINHD).us": "Crime&InvestigationNetworkHD",
+    "Vice(VICE).us": "Vice",
+    "InvestigationDiscoveryHD(IDHD).us": "InvestigationDiscoveryHD",
+    "ReelzChannel(REELZ).us": "ReelzChannel",
+    "DiscoveryFamilyChannel(DFC).us": "DiscoveryFamilyChannel",
+    "Science(SCIENCE).us": "Science",
+    "AmericanHeroesChannel(AHC).us": "AmericanHeroesChannel",
+    "AMC+(AMCPLUS).us": "AMC+",
+    "Fuse(FUSE).us": "Fuse",
+    "MusicTelevisionHD(MTV2HD).us": "MusicTelevisionHD",
+    "IFC.us": "IFC",
+    "FYI(FYISD).us": "FYI",
+    "CookingChannel(COOK).us": "CookingChannel",
+    "Logo(LOGO).us": "Logo",
+    "AdultSwim(ADSM).ca": "AdultSwim",
+    "ANTENNA(KGBTDT).us": "ANTENNA",
+    "CHARGE!(CHARGE).us": "CHARGE!",
+    "FS1.us": "FS1",
+    "FS2.us": "FS2",
+    "NFLNetwork(NFLNET).us": "NFLNetwork",
+    "NHLNetwork(NHLNET).us": "NHLNetwork",
+    "MLBNetwork(MLBN).us": "MLBNetwork",
+    "NBATV(NBATV).us": "NBATV",
+    "CBSSportsNetwork(CBSSN).us": "CBSSportsNetwork",
+    "Ovation(OVATION).us": "Ovation",
+    "UPTV.us": "UPTV",
+    "COZITV(COZITV).us": "COZITV",
+    "OutdoorChannel(OUTD).us": "OutdoorChannel",
+    "ASPiRE(ASPRE).us": "ASPiRE",
+    "HBO.us": "HBO",
+    "HBO2(HBOHIT).us": "HBO2",
+    "HBOComedy(HBOC).us": "HBOComedy",
+    "HBOSignature(HBODRAM).us": "HBOSignature",
+    "HBOWest(HBOHDP).us": "HBOWest",
+    "HBOZone(HBOMOV).us": "HBOZone",
+    "CinemaxHD(MAXHD).us": "CinemaxHD",
+    "MoreMAX(MAXHIT).us": "MoreMAX",
+    "ActionMAX(MAXACT).us": "ActionMAX",
+    "5StarMAX(MAXCLAS).us": "5StarMAX",
+    "Paramount+withShowtimeOnDemand(SHOWDM).us": "Paramount+withShowtimeOnDemand",
+    "ShowtimeExtreme(SHOWX).us": "ShowtimeExtreme",
+    "ShowtimeNext(NEXT).us": "ShowtimeNext",
+    "ShowtimeShowcase(SHOCSE).us": "ShowtimeShowcase",
+    "ShowtimeFamilyzone(FAMZ).us": "ShowtimeFamilyzone",
+    "ShowtimeWomen(WOMEN).us": "ShowtimeWomen",
+    "Starz(STARZ).us": "Starz",
+    "StarzEdge(STZE).us": "StarzEdge",
+    "StarzCinema(STZCI).us": "StarzCinema",
+    "StarzComedy(STZC).us": "StarzComedy",
+    "StarzEncore(STZENC).us": "StarzEncore",
+    "StarzEncoreBlack(STZENBK).us": "StarzEncoreBlack",
+    "StarzEncoreClassic(STZENCL).us": "StarzEncoreClassic",
+    "StarzEncoreFamily(STZENFM).us": "StarzEncoreFamily",
+    "StarzEncoreWesterns(STZENWS).us": "StarzEncoreWesterns",
+    "StarzKids(STZK).us": "StarzKids",
+    "StarzEncoreAction(STZENAC).us": "StarzEncoreAction",
+    "ScreenPix(SCRNPIX).us": "ScreenPix",
+    "ScreenPixAction(SCRNACT).us": "ScreenPixAction",
+    "ScreenPixVoices(SCRNVOI).us": "ScreenPixVoices",
+    "ScreenPixWesterns(SCRNWST).us": "ScreenPixWesterns",
+    "MoviePlex(MPLEX).us": "MoviePlex",
+    "MGM+Drive-In(MGMDRV).us": "MGM+Drive-In",
+    "MGM+HD(MGMHD).us": "MGM+HD",
+    "MGM+Hits(MGMHIT).us": "MGM+Hits",
+    "SonyMovieChannel(SONY).us": "SonyMovieChannel",
+    "TheMovieChannel(TMC).us": "TheMovieChannel",
+}
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+epg_checkpoint.py
+Checkpoint / resume for long clean_epg.py runs (--checkpoint DIR).
+
+A run that dies partway (preempted runner, timeout, OOM kill) would otherwise
+start over from byte zero of the input. With a checkpoint directory the
+streaming pass saves its progress every --checkpoint-every MB of input:
+
+- the input offset: the end of the last channel / programme block handed to
+  the profiles (a block boundary, from the byte-level prefilter), plus the
+  document header bytes that stand in for everything before it on resume
+- the sorter's state: cleaned programmes so far, spilled to run files that are
+  moved into the checkpoint directory
+- the kept <channel> elements, counters and the time window in use
+
+A restarted run whose job key matches (hash of the input file, the cleaning
+code and the options that decide the output) restores that state and carries
+on from the saved offset; the output is the same as an uninterrupted run. A
+checkpoint with another key is thrown away. The directory is emptied once the
+output has been written.
+
+Layout:
+    checkpoint.pkl   job key, input offset, header bytes, profile state
+    runNNNN.bin      sorter run files (epg_sort spill format)
+"""
+
+import hashlib
+import os
+import pickle
+import re
+
+CHECKPOINT_VERSION = 1
+STATE_NAME = "checkpoint.pkl"
+DEFAULT_INTERVAL_MB = 64
+HASH_CHUNK = 1024 * 1024
+RUN_NAME = re.compile(r"run\d{4,}\.bin")
+
+# Hash of a file's bytes
+def file_hash(path: str) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        while True:
+            data = f.read(HASH_CHUNK)
+            if not data:
+                break
+            h.update(data)
+    return h.hexdigest()
+
+# Key of a job: input hash plus anything else (code, options) the output depends on
+def job_key(input_hash: str, *parts) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    h.update(input_hash.encode("ascii"))
+    for part in parts:
+        h.update(b"\0" + repr(part).encode("utf-8"))
+    return h.hexdigest()
+
+class Checkpoint:
+    # `collect()` drains the profiles and returns their picklable state; it is
+    # called at a block boundary, with every element so far fully handled
+    def __init__(self, directory: str, key: str, interval: int = DEFAULT_INTERVAL_MB * 1024 * 1024, collect=None):
+        self.directory = directory
+        self.key = key
+        self.interval = interval
+        self.collect = collect
+        self.resume = None     # (header bytes, offset) to restart the input from
+        self.state = None      # profile state of the loaded checkpoint
+        self.saved = 0
+        self.offset = 0
+        self.dropped = {"channel": 0, "programme": 0}   # blocks the prefilter dropped before `offset`
+        self._last = 0
+        self.source = None
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    # Load a checkpoint for this job; anything else in the directory is discarded
+    def load(self):
+        data = None
+        try:
+            with open(self._path(STATE_NAME), "rb") as f:
+                data = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ValueError):
+            pass
+        if (not isinstance(data, dict) or data.get("version") != CHECKPOINT_VERSION
+                or data.get("key") != self.key):
+            self.clear()
+            return None
+        sorter = data["state"]["sorter"]
+        # run files are wherever this directory is now
+        sorter["spills"] = [(self._path(os.path.basename(path)), counts) for path, counts in sorter["spills"]]
+        live = {os.path.basename(path) for path, _ in sorter["spills"]}
+        for name in os.listdir(self.directory):
+            if _is_run_file(name) and name not in live:
+                os.remove(self._path(name))
+        self.resume = (data["header"], data["offset"])
+        self.state = data["state"]
+        self.offset = self._last = data["offset"]
+        return self.state
+
+    # The prefiltered input the stream reads (epg_prefilter.PrefilteredGuide, offsets tracked)
+    def attach(self, source):
+        self.source = source
+
+    # Called after each top-level element has been handed to every profile
+    def step(self, tag: str):
+        source = self.source
+        if source is None or not source.offsets_exact:
+            return
+        if tag != "channel" and tag != "programme":
+            # not a block the prefilter knows: offsets no longer line up
+            source.offsets_exact = False
+            return
+        kind, end, channels_dropped, programmes_dropped = source.block_ends.popleft()
+        if kind != tag:
+            source.offsets_exact = False
+            return
+        self.offset = end
+        self.dropped = {"channel": channels_dropped, "programme": programmes_dropped}
+        if end - self._last >= self.interval:
+            self.save()
+
+    def save(self):
+        header = self.source.header
+        if header is None:
+            return
+        data = {"version": CHECKPOINT_VERSION, "key": self.key, "offset": self.offset, "header": header,
+                "state": self.collect()}
+        tmp = self._path(STATE_NAME + ".tmp")
+        with open(tmp, "wb") as f:
+            pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self._path(STATE_NAME))
+        self._last = self.offset
+        self.saved += 1
+
+    # Remove the checkpoint and its run files (job finished, or not this job's)
+    def clear(self):
+        for name in os.listdir(self.directory):
+            if name == STATE_NAME or name == STATE_NAME + ".tmp" or _is_run_file(name):
+                os.remove(self._path(name))
+        self.resume = None
+        self.state = None
+
+# Sorter run file names (epg_sort: run0000.bin, ...); anything else is left alone
+def _is_run_file(name):
+    return RUN_NAME.fullmatch(name) is not None
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+epg_dates.py
+XMLTV date / time handling without datetime / strptime on the normal path.
+
+XMLTV times are fixed width ("YYYYMMDDhhmmss +zzzz", trailing fields may be
+left off, the offset defaults to UTC), so they are read straight into integers
+by length and character class; no datetime objects and no exceptions on the way.
+
+- xmltv_epoch(): epoch seconds of an XMLTV time, offset applied; None if unreadable
+- start_sort_key(): integer sort key of a start time
+- format_date_text(): "MM/DD/YYYY" for a <date> / start value, cached per distinct value
+- format_yyyymmdd(): the same for the strict YYYYMMDD form only
+- TimeWindow: keep programmes that overlap a [start, end) window of epoch seconds
+
+format_date_text() only takes the fast path for the plain forms (YYYYMMDD,
+YYYYMMDDhhmmss, YYYY-MM-DD, YYYY with in-range fields) where strptime is known
+to give the same answer; anything else goes through the original strptime /
+regex chain, so results never change.
+"""
+
+import functools
+import re
+from datetime import datetime
+
+DATE_CACHE_SIZE = 65536
+DAYS_IN_MONTH = (31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+
+# Slow path: any digit prefix (YYYY[MM[DD[hh[mm[ss]]]]]) plus an optional zone
+TIME_RE = re.compile(r"(\d{4})(\d\d)?(\d\d)?(\d\d)?(\d\d)?(\d\d)?\s*(?:([+-])(\d\d)(\d\d)|Z|UTC|GMT)?\s*$")
+
+def is_leap_year(year: int) -> bool:
+    return year % 4 == 0 and (year % 100 != 0 or year % 400 == 0)
+
+def is_valid_date(year: int, month: int, day: int) -> bool:
+    if not 1 <= month <= 12 or day < 1:
+        return False
+    if month == 2 and is_leap_year(year):
+        return day <= 29
+    return day <= DAYS_IN_MONTH[month - 1]
+
+# Days since 1970-01-01 of a proleptic Gregorian date
+def days_from_civil(year: int, month: int, day: int) -> int:
+    year -= month <= 2
+    era = year // 400
+    yoe = year - era * 400
+    doy = (153 * (month + (-3 if month > 2 else 9)) + 2) // 5 + day - 1
+    doe = yoe * 365 + yoe // 4 - yoe // 100 + doy
+    return era * 146097 + doe - 719468
+
+def _epoch(year, month, day, hour, minute, second, offset_minutes):
+    if not (1 <= month <= 12 and 1 <= day <= 31 and hour <= 23 and minute <= 59 and second <= 60):
+        return None
+    return (days_from_civil(year, month, day) * 86400 + hour * 3600 + minute * 60 + second
+            - offset_minutes * 60)
+
+# Epoch seconds of an XMLTV time such as "20250910120000 +0000"
+@functools.lru_cache(maxsize=65536)
+def xmltv_epoch(value: str):
+    # fast path: the full fixed-width form, with or without the offset
+    if len(value) in (14, 20) and value[:14].isdecimal():
+        if len(value) == 14:
+            offset = 0
+        elif value[14] == " " and value[15] in "+-" and value[16:].isdecimal():
+            offset = int(value[16:18]) * 60 + int(value[18:20])
+            if value[15] == "-":
+                offset = -offset
+        else:
+            return _xmltv_epoch_slow(value)
+        return _epoch(int(value[0:4]), int(value[4:6]), int(value[6:8]),
+                      int(value[8:10]), int(value[10:12]), int(value[12:14]), offset)
+    return _xmltv_epoch_slow(value)
+
+def _xmltv_epoch_slow(value: str):
+    m = TIME_RE.match(value.strip())
+    if m is None:
+        return None
+    year, month, day, hour, minute, second = (int(g) if g else d for g, d in zip(m.groups()[:6], (0, 1, 1, 0, 0, 0)))
+    offset = 0
+    if m.group(7):
+        offset = int(m.group(8)) * 60 + int(m.group(9))
+        if m.group(7) == "-":
+            offset = -offset
+    return _epoch(year, month, day, hour, minute, second, offset)
+
+# Integer sort key for an XMLTV start time. The format is fixed width
+# ("YYYYMMDDhhmmss +zzzz"), so the leading digits compare as one integer in the
+# same order as the datetimes they spell; like before, the offset is ignored.
+def start_sort_key(start: str) -> int:
+    head = start[:14]
+    if len(head) == 14 and head.isdecimal():
+        return int(head)
+    head = start[:8]
+    if len(head) == 8 and head.isdecimal():
+        return int(head) * 1000000
+    # no usable digits: sorts ahead of timed programmes, in source order
+    return -1
+
+# -------------------------------
+# Display dates (MM/DD/YYYY)
+# -------------------------------
+def _is_digits(text: str) -> bool:
+    return text.isascii() and text.isdigit()
+
+# Fast path: (year, month, day) of a plain XMLTV date, or None when the value
+# isn't one of the forms below with in-range fields
+def _plain_date(s: str):
+    n = len(s)
+    if n == 8 or n == 14:
+        # YYYYMMDD / YYYYMMDDhhmmss
+        if not _is_digits(s):
+            return None
+        if n == 14 and (int(s[8:10]) > 23 or int(s[10:12]) > 59 or int(s[12:14]) > 59):
+            return None
+        year, month, day = int(s[:4]), int(s[4:6]), int(s[6:8])
+    elif n == 10:
+        # YYYY-MM-DD
+        if s[4] != "-" or s[7] != "-" or not _is_digits(s[:4] + s[5:7] + s[8:]):
+            return None
+        year, month, day = int(s[:4]), int(s[5:7]), int(s[8:])
+    elif n == 4:
+        # YYYY
+        if not _is_digits(s):
+            return None
+        year, month, day = int(s), 1, 1
+    else:
+        return None
+    # strftime doesn't pad years below 1000 the same way everywhere
+    if year < 1000 or not is_valid_date(year, month, day):
+        return None
+    return year, month, day
+
+# The original chain: strptime with each format in turn, then any
+# YYYY[-]MM[-]DD inside the text
+def _legacy_date(s: str):
+    for fmt in ("%Y%m%d%H%M%S", "%Y%m%d", "%Y-%m-%d", "%Y"):
+        try:
+            dt = datetime.strptime(s, fmt)
+            return dt.strftime("%m/%d/%Y")
+        except Exception:
+            pass
+    m = re.search(r"(\d{4})[-]?(\d{2})[-]?(\d{2})", s)
+    if m:
+        try:
+            dt = datetime(int(m.group(1)), int(m.group(2)), int(m.group(3)))
+            return dt.strftime("%m/%d/%Y")
+        except Exception:
+            pass
+    return None
+
+# "MM/DD/YYYY" for a (stripped) date value, None if nothing in it reads as a date
+@functools.lru_cache(maxsize=DATE_CACHE_SIZE)
+def format_date_text(s: str):
+    date = _plain_date(s)
+    if date is None:
+        return _legacy_date(s)
+    year, month, day = date
+    return f"{month:02d}/{day:02d}/{year}"
+
+# "MM/DD/YYYY" for a value in exactly the YYYYMMDD form, None otherwise
+@functools.lru_cache(maxsize=DATE_CACHE_SIZE)
+def format_yyyymmdd(s: str):
+    date = _plain_date(s) if len(s) == 8 else None
+    if date is None:
+        try:
+            return datetime.strptime(s, "%Y%m%d").strftime("%m/%d/%Y")
+        except Exception:
+            return None
+    year, month, day = date
+    return f"{month:02d}/{day:02d}/{year}"
+
+# -------------------------------
+# Time window
+# -------------------------------
+# A window of epoch seconds, either end open (None). A programme is kept when it
+# overlaps the window; a missing or unreadable time never drops anything.
+class TimeWindow:
+    def __init__(self, start: int = None, end: int = None):
+        self.start = start
+        self.end = end
+
+    def contains(self, start_text: str, stop_text: str = None) -> bool:
+        begins = xmltv_epoch(start_text) if start_text else None
+        if self.end is not None and begins is not None and begins >= self.end:
+            return False
+        if self.start is not None:
+            ends = xmltv_epoch(stop_text) if stop_text else None
+            if ends is None:
+                ends = begins
+            if ends is not None and ends <= self.start:
+                return False
+        return True
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+epg_engine.py
+One streaming pass over an XMLTV guide feeding any number of output profiles.
+
+clean_epg.py (full clean + sort) and filter_keep_channels.py (filter + rename)
+used to parse the whole source separately. Here the source is read, prefiltered
+and parsed once, and every top-level element is handed to each profile in turn:
+- The byte-level prefilter keeps the union of what the profiles want
+- Profiles are called in the order given. A profile may only change an element
+  for good if it comes last; the others put back whatever they touch
+- A profile that raises is dropped (its error kept on `profile.error`, its
+  partial output discarded) and the rest carry on
+- Further feeds can be merged into the input on the way (see epg_merge)
+- Parsing goes through epg_xml: lxml when installed, else ElementTree
+- Inputs can be URLs (epg_io.open_guide streams them through epg_fetch); the
+  download statistics end up in the report's "fetch" entry
+- An epg_checkpoint.Checkpoint can save progress at block boundaries and a
+  later run resume from there
+"""
+
+from epg_io import open_guide
+from epg_xml import iterparse
+from epg_prefilter import open_prefiltered
+
+# -------------------------------
+# Streaming parse: hand out top-level elements one at a time
+# -------------------------------
+def iter_guide(source):
+    # First item yielded is the root element (its children are detached as we go).
+    # Every following item is one complete top-level child (channel, programme, ...).
+    # An element's tail text is only complete once the next sibling starts (or the
+    # root ends), so children are handed out one step behind the parser. They are
+    # detached from the root at that point too: lxml keeps text in the tree, and
+    # text parsed after an early detach would land on another element.
+    context = iterparse(source, events=("start", "end"))
+    root = None
+    pending = None
+    depth = 0
+    for event, elem in context:
+        if event == "start":
+            if root is None:
+                root = elem
+                yield root
+            elif depth == 1 and pending is not None:
+                root.remove(pending)
+                yield pending
+                pending = None
+            depth += 1
+            continue
+        depth -= 1
+        if depth == 1:
+            pending = elem
+    if pending is not None:
+        root.remove(pending)
+        yield pending
+
+# -------------------------------
+# Profiles
+# -------------------------------
+class GuideProfile:
+    name = "profile"
+    # report stage the profile's calls are timed under; None if it times itself
+    stage = None
+
+    def __init__(self):
+        # ids this profile wants to see; blocks nobody wants are dropped unparsed
+        self.channel_ids = set()
+        self.programme_ids = set()
+        self.error = None
+
+    # Root element at its start tag; its text is only final once children arrive
+    def start(self, root):
+        pass
+
+    def channel(self, elem):
+        pass
+
+    def programme(self, elem):
+        pass
+
+    # Any other top-level element
+    def other(self, elem):
+        pass
+
+    # End of the document (root text and children complete)
+    def finish(self):
+        pass
+
+    # Stream failed or this profile raised: drop partial output
+    def abort(self):
+        pass
+
+# -------------------------------
+# Engine
+# -------------------------------
+# Stream `input_name` through `profiles`. Reads of the raw input are timed as
+# "decompress" (for a URL that includes waiting on the download), the
+# byte-level prefilter and the profiles' channel checks as "filter" and the
+# XML parser itself as "parse" (see epg_report). Parse errors abort every
+# profile and propagate; returns the prefilter (None if disabled) so callers
+# can read its drop counts.
+#
+# `merge_inputs`: further feeds merged into the input (channel aliases
+# resolved, duplicate and unwanted programmes dropped). Every feed is then
+# read on its own thread, so reading, decompressing and parsing all count as
+# "parse", and only the input itself is prefiltered: the other feeds' ids are
+# only known once their channels have been resolved.
+#
+# `checkpoint`: epg_checkpoint.Checkpoint; the input then starts at its resume
+# point (if any) and it sees every element once all profiles have handled it.
+# Needs the prefilter, which knows where each element's bytes end.
+def stream_guide(input_name, profiles, report, prefilter=True, merge_inputs=(), checkpoint=None):
+    if merge_inputs:
+        timed = lambda f, name: f
+    else:
+        timed = report.timed_reader
+    opened = []
+
+    def open_input(path):
+        f = open_guide(path)
+        opened.append(f)
+        return f
+
+    decompress = lambda path: timed(open_input(path), "decompress")
+    prefiltered = None
+    programme_ids = set().union(*(p.programme_ids for p in profiles))
+    if prefilter:
+        channel_ids = set().union(*(p.channel_ids for p in profiles))
+        prefiltered = open_prefiltered(input_name, programme_ids, channel_ids, opener=decompress,
+                                       resume=checkpoint.resume if checkpoint is not None else None,
+                                       track_offsets=checkpoint is not None)
+        source = timed(prefiltered, "filter")
+        if checkpoint is not None:
+            checkpoint.attach(prefiltered)
+    else:
+        if checkpoint is not None:
+            raise ValueError("checkpoints need the prefilter")
+        source = decompress(input_name)
+    merger = None
+    if merge_inputs:
+        from epg_merge import GuideMerger
+        merger = GuideMerger([(source, input_name)] + [(open_input(path), path) for path in merge_inputs],
+                             programme_ids=programme_ids)
+
+    active = list(profiles)
+    root = None
+
+    def dispatch(method, *args):
+        for profile in list(active):
+            if profile.stage is not None:
+                report.enter(profile.stage)
+            try:
+                getattr(profile, method)(*args)
+            except Exception as e:
+                profile.error = e
+                active.remove(profile)
+                profile.abort()
+            finally:
+                if profile.stage is not None:
+                    report.exit()
+
+    try:
+        with merger or source, report.stage("filter"):
+            for elem in report.timed_iter(merger or iter_guide(source), "parse"):
+                if root is None:
+                    root = elem
+                    dispatch("start", root)
+                elif elem.tag == "programme":
+                    dispatch("programme", elem)
+                elif elem.tag == "channel":
+                    dispatch("channel", elem)
+                else:
+                    dispatch("other", elem)
+                if checkpoint is not None and elem is not root:
+                    checkpoint.step(elem.tag)
+    except BaseException:
+        for profile in active:
+            profile.abort()
+        raise
+    finally:
+        downloads = [dict(f.stats, url=f.url) for f in opened if hasattr(f, "stats")]
+        if downloads:
+            report.info["fetch"] = downloads
+    if merger is not None:
+        report.counters.update(merger.counts)
+    dispatch("finish")
+    return prefiltered
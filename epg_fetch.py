@@ -0,0 +1,466 @@
+#!/usr/bin/env python3
+"""
+epg_fetch.py
+Stream a guide straight from its URL into the cleaner: download, decompress
+and parse overlap instead of running one after the other.
+
+The download runs on an asyncio event loop in a background thread:
+- HTTP/1.1 GET over asyncio streams (http / https), redirects followed
+- Failed or cut-off transfers are retried with backoff and resumed with a
+  Range request from the byte they stopped at; If-Range (ETag /
+  Last-Modified) makes sure the rest still belongs to the same file. A
+  server that sends neither gets the whole file asked for again, and the
+  part already passed on must come back unchanged (compared by hash)
+- The body is decompressed as it arrives (gzip or zlib through one
+  zlib.decompressobj with wbits 47, also gzip files of several members; xz;
+  plain XML), picked from the first bytes like epg_io.open_guide does
+- Decompressed pieces go through a bounded queue to a file-like reader, so
+  the parser starts on the first kilobytes and a slow parser holds the
+  download back instead of piling up memory
+
+clean_epg.py takes a URL wherever it takes an input file (epg_io.open_guide
+hands URLs to open_url), so the run takes about max(download, clean) rather
+than their sum.
+
+Usage:
+    python3 epg_fetch.py https://example.com/epg.xml.gz -o epg.xml    # download + decompress
+    python3 clean_epg.py https://example.com/epg.xml.gz              # download + clean, overlapped
+"""
+
+import argparse
+import asyncio
+import hashlib
+import lzma
+import os
+import ssl
+import threading
+import time
+import zlib
+from urllib.parse import urljoin, urlsplit
+
+from epg_io import GZIP_MAGIC, XZ_MAGIC, URL_SCHEMES
+
+DEFAULT_RETRIES = 5
+DEFAULT_TIMEOUT = 60.0
+# decompressed pieces buffered between the download and the parser
+DEFAULT_QUEUE_SIZE = 64
+READ_SIZE = 64 * 1024
+MAX_REDIRECTS = 10
+MAX_HEADER_BYTES = 64 * 1024
+BACKOFF = 1.0
+MAX_BACKOFF = 30.0
+# gzip or zlib header, detected automatically (32 + 15)
+ZLIB_AUTO_WBITS = 47
+USER_AGENT = "epg_fetch"
+REDIRECT_STATUSES = (301, 302, 303, 307, 308)
+CHANGED = "the file changed on the server while it was being downloaded"
+
+_DONE = object()
+
+class FetchError(Exception):
+    pass
+
+# Worth another attempt: connection trouble, cut-off body, 5xx / 429
+class _Retry(Exception):
+    pass
+
+class _Failure:
+    def __init__(self, error):
+        self.error = error
+
+# -------------------------------
+# HTTP
+# -------------------------------
+async def _read_head(reader, timeout):
+    try:
+        head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), timeout)
+    except asyncio.IncompleteReadError as e:
+        raise _Retry("connection closed before the response headers") from e
+    except asyncio.LimitOverrunError as e:
+        raise FetchError("response headers too long") from e
+    lines = head.decode("iso-8859-1").split("\r\n")
+    parts = lines[0].split(" ", 2)
+    if len(parts) < 2 or not parts[0].startswith("HTTP/") or not parts[1].isdigit():
+        raise FetchError(f"bad status line: {lines[0]!r}")
+    headers = {}
+    for line in lines[1:]:
+        if ":" in line:
+            name, value = line.split(":", 1)
+            headers[name.strip().lower()] = value.strip()
+    return int(parts[1]), headers
+
+async def _read_exactly(reader, size, timeout):
+    try:
+        return await asyncio.wait_for(reader.readexactly(size), timeout)
+    except asyncio.IncompleteReadError as e:
+        raise _Retry("connection closed mid-body") from e
+
+# Body bytes of a response, as they arrive
+async def _iter_body(reader, headers, timeout):
+    if "chunked" in headers.get("transfer-encoding", "").lower():
+        while True:
+            line = await asyncio.wait_for(reader.readline(), timeout)
+            if not line.endswith(b"\n"):
+                raise _Retry("connection closed mid-body")
+            size = int(line.split(b";", 1)[0].strip() or b"0", 16)
+            if size == 0:
+                return
+            while size > 0:
+                data = await _read_exactly(reader, min(size, READ_SIZE), timeout)
+                size -= len(data)
+                yield data
+            await _read_exactly(reader, 2, timeout)
+    length = headers.get("content-length")
+    if length is not None:
+        remaining = int(length)
+        while remaining > 0:
+            data = await asyncio.wait_for(reader.read(min(remaining, READ_SIZE)), timeout)
+            if not data:
+                raise _Retry(f"connection closed with {remaining:,} bytes of the body missing")
+            remaining -= len(data)
+            yield data
+        return
+    # no length: the body runs until the server closes the connection
+    while True:
+        data = await asyncio.wait_for(reader.read(READ_SIZE), timeout)
+        if not data:
+            return
+        yield data
+
+# Open a GET request, following redirects: (status, headers, reader, writer, final url)
+async def _open(url, offset, validator, timeout, stats):
+    for _ in range(MAX_REDIRECTS + 1):
+        parts = urlsplit(url)
+        if parts.scheme not in URL_SCHEMES or not parts.hostname:
+            raise FetchError(f"unsupported URL '{url}'")
+        secure = parts.scheme == "https"
+        port = parts.port or (443 if secure else 80)
+        try:
+            reader, writer = await asyncio.wait_for(
+                asyncio.open_connection(parts.hostname, port, ssl=ssl.create_default_context() if secure else None,
+                                        limit=MAX_HEADER_BYTES), timeout)
+        except (OSError, asyncio.TimeoutError) as e:
+            raise _Retry(f"can't connect to {parts.hostname}:{port}: {e}") from e
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+        lines = [f"GET {path} HTTP/1.1", f"Host: {parts.netloc.rsplit('@', 1)[-1]}", f"User-Agent: {USER_AGENT}",
+                 "Accept-Encoding: identity", "Connection: close"]
+        if offset:
+            lines.append(f"Range: bytes={offset}-")
+            if validator:
+                lines.append(f"If-Range: {validator}")
+        try:
+            writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("iso-8859-1"))
+            await asyncio.wait_for(writer.drain(), timeout)
+            status, headers = await _read_head(reader, timeout)
+        except BaseException:
+            writer.close()
+            raise
+        if status in REDIRECT_STATUSES and "location" in headers:
+            writer.close()
+            url = urljoin(url, headers["location"])
+            stats["redirects"] += 1
+            continue
+        return status, headers, reader, writer, url
+    raise FetchError(f"more than {MAX_REDIRECTS} redirects")
+
+# ETag (strong ones only) or Last-Modified of a response, for If-Range
+def _validator(headers):
+    etag = headers.get("etag")
+    if etag and not etag.startswith("W/"):
+        return etag
+    return headers.get("last-modified")
+
+# One attempt: body bytes from `offset` on. `state` carries the first
+# response's validator over to the resumed ones, or without one a hash of
+# everything passed on so far.
+async def _request(url, offset, state, timeout, stats):
+    validator = state.get("validator")
+    # only resume with a range If-Range can tie to the same file; otherwise
+    # start over and check the part already passed on
+    ranged = offset if validator else 0
+    status, headers, reader, writer, final_url = await _open(url, ranged, validator, timeout, stats)
+    try:
+        if status == 206:
+            content_range = headers.get("content-range", "")
+            if not content_range.startswith(f"bytes {ranged}-"):
+                raise FetchError(f"server sent the wrong range ({content_range!r}, wanted bytes {ranged}-)")
+        elif status == 200:
+            if ranged and _validator(headers) != validator:
+                # If-Range didn't match: the file changed under us
+                raise FetchError(CHANGED)
+        elif status == 416 and ranged and headers.get("content-range", "") == f"bytes */{ranged}":
+            return
+        elif status >= 500 or status == 429:
+            raise _Retry(f"HTTP {status}")
+        else:
+            raise FetchError(f"HTTP {status} from {final_url}")
+        if not offset:
+            state["validator"] = _validator(headers)
+            state["digest"] = hashlib.sha1() if state["validator"] is None else None
+        digest = state["digest"]
+        # what we already have: read past it (no range support, or starting over)
+        skip = offset - ranged if status == 206 else offset
+        check = hashlib.sha1() if skip and digest is not None else None
+        async for data in _iter_body(reader, headers, timeout):
+            if skip:
+                part = data[:skip]
+                skip -= len(part)
+                if check is not None:
+                    check.update(part)
+                    if not skip and check.digest() != digest.digest():
+                        raise FetchError(CHANGED)
+                data = data[len(part):]
+                if not data:
+                    continue
+            if digest is not None:
+                digest.update(data)
+            yield data
+        if skip and check is not None:
+            # shorter than what was passed on already
+            raise FetchError(CHANGED)
+    finally:
+        writer.close()
+
+# Body of `url`, retried and resumed until complete (raw bytes, still compressed)
+async def stream_url(url, retries=DEFAULT_RETRIES, timeout=DEFAULT_TIMEOUT, stats=None):
+    stats = stats if stats is not None else new_stats()
+    received = 0
+    failures = 0
+    state = {}
+    while True:
+        before = received
+        try:
+            async for data in _request(url, received, state, timeout, stats):
+                received += len(data)
+                stats["downloaded"] = received
+                yield data
+            return
+        except (_Retry, OSError, asyncio.TimeoutError) as e:
+            # attempts that got somewhere don't count against the limit
+            failures = 0 if received > before else failures + 1
+            if failures > retries:
+                raise FetchError(f"giving up on {url} after {retries} retries: {e}") from e
+            stats["retries"] += 1
+            if received:
+                stats["resumed_at"].append(received)
+            await asyncio.sleep(min(MAX_BACKOFF, BACKOFF * 2 ** max(0, failures - 1)))
+
+def new_stats():
+    return {"downloaded": 0, "decompressed": 0, "retries": 0, "redirects": 0, "resumed_at": [],
+            "format": None, "seconds": None}
+
+# -------------------------------
+# Incremental decompression
+# -------------------------------
+class StreamDecoder:
+    def __init__(self):
+        self.format = None
+        self._head = b""
+        self._d = None
+
+    # Decompressed bytes for the next piece of input (may be empty)
+    def feed(self, data: bytes) -> bytes:
+        if self.format is None:
+            self._head += data
+            if len(self._head) < len(XZ_MAGIC):
+                return b""
+            data, self._head = self._head, b""
+            self._pick(data)
+        if self.format == "plain":
+            return data
+        if self.format == "xz":
+            return self._d.decompress(data)
+        out = []
+        while data:
+            if self._d.eof:
+                # next gzip member
+                self._d = zlib.decompressobj(ZLIB_AUTO_WBITS)
+            out.append(self._d.decompress(data))
+            data = self._d.unused_data
+            if self.format == "gzip":
+                # zero padding after the last member, as gzip allows
+                data = data.lstrip(b"\0")
+        return b"".join(out)
+
+    # End of input: whatever is still buffered; a cut-off compressed stream is an error
+    def finish(self) -> bytes:
+        if self.format is None:
+            data, self._head = self._head, b""
+            if not data:
+                return b""
+            self._pick(data)
+            return self.feed(data)
+        if self.format == "plain":
+            return b""
+        if not self._d.eof:
+            raise FetchError(f"{self.format} stream ended early")
+        return b""
+
+    def _pick(self, head):
+        if head.startswith(GZIP_MAGIC) or (len(head) >= 2 and head[0] & 0x0F == 8
+                                            and (head[0] << 8 | head[1]) % 31 == 0):
+            self.format = "gzip" if head.startswith(GZIP_MAGIC) else "zlib"
+            self._d = zlib.decompressobj(ZLIB_AUTO_WBITS)
+        elif head.startswith(XZ_MAGIC):
+            self.format = "xz"
+            self._d = lzma.LZMADecompressor()
+        else:
+            self.format = "plain"
+
+# -------------------------------
+# File-like reader fed by the download thread
+# -------------------------------
+class FetchedGuide:
+    def __init__(self, url, retries=DEFAULT_RETRIES, timeout=DEFAULT_TIMEOUT, queue_size=DEFAULT_QUEUE_SIZE):
+        self.url = url
+        self.retries = retries
+        self.timeout = timeout
+        self.stats = new_stats()
+        self._loop = asyncio.new_event_loop()
+        self._queue = asyncio.Queue(queue_size)
+        # set once the reader has taken the last item: the loop runs until then
+        self._finished = asyncio.Event()
+        self._task = None
+        # future of a _next() waiting on the queue, cancelled by close()
+        self._waiting = None
+        # current piece from the queue and how far into it read() got
+        self._pending = b""
+        self._offset = 0
+        self._done = False
+        self._started = time.perf_counter()
+        ready = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(ready,), name="epg-fetch", daemon=True)
+        self._thread.start()
+        ready.wait()
+
+    def _run(self, ready):
+        asyncio.set_event_loop(self._loop)
+        self._task = self._loop.create_task(self._produce())
+        ready.set()
+        try:
+            self._loop.run_until_complete(self._task)
+        except asyncio.CancelledError:
+            pass
+        finally:
+            self._loop.run_until_complete(self._loop.shutdown_asyncgens())
+            self._loop.close()
+
+    async def _produce(self):
+        decoder = StreamDecoder()
+        stats = self.stats
+        try:
+            async for data in stream_url(self.url, self.retries, self.timeout, stats):
+                out = decoder.feed(data)
+                stats["format"] = decoder.format
+                if out:
+                    stats["decompressed"] += len(out)
+                    await self._queue.put(out)
+            out = decoder.finish()
+            stats["format"] = decoder.format
+            if out:
+                stats["decompressed"] += len(out)
+                await self._queue.put(out)
+            stats["seconds"] = round(time.perf_counter() - self._started, 4)
+            await self._queue.put(_DONE)
+        except asyncio.CancelledError:
+            raise
+        except BaseException as e:
+            await self._queue.put(_Failure(e))
+        await self._finished.wait()
+
+    def _next(self):
+        self._waiting = asyncio.run_coroutine_threadsafe(self._queue.get(), self._loop)
+        try:
+            item = self._waiting.result()
+        finally:
+            self._waiting = None
+        if item is _DONE or isinstance(item, _Failure):
+            self._done = True
+            self._loop.call_soon_threadsafe(self._finished.set)
+        if item is _DONE:
+            return b""
+        if isinstance(item, _Failure):
+            if isinstance(item.error, FetchError):
+                raise item.error
+            raise FetchError(f"{self.url}: {item.error}") from item.error
+        return item
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            parts = [self._pending[self._offset:]]
+            while not self._done:
+                parts.append(self._next())
+            self._pending = b""
+            self._offset = 0
+            return b"".join(parts)
+        while self._offset >= len(self._pending) and not self._done:
+            self._pending = self._next()
+            self._offset = 0
+        start = self._offset
+        if not start and size >= len(self._pending):
+            # the whole piece: no copy
+            data = self._pending
+        else:
+            data = self._pending[start:start + size]
+        self._offset = start + len(data)
+        return data
+
+    # Stop the download; a read blocked in another thread fails
+    def close(self):
+        waiting = self._waiting
+        if waiting is not None:
+            waiting.cancel()
+        if self._thread.is_alive():
+            try:
+                self._loop.call_soon_threadsafe(self._task.cancel)
+            except RuntimeError:  # loop already closed: the download just ended
+                pass
+            self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+# Open a guide URL for reading: decompressed bytes, downloaded as they are read
+def open_url(url, retries=DEFAULT_RETRIES, timeout=DEFAULT_TIMEOUT, queue_size=DEFAULT_QUEUE_SIZE):
+    return FetchedGuide(url, retries, timeout, queue_size)
+
+# -------------------------------
+# Command line: download + decompress to a file
+# -------------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Download a guide and decompress it on the fly.")
+    parser.add_argument("url", help="guide URL (gzip, zlib, xz or plain XML)")
+    parser.add_argument("-o", "--output", default="epg.xml", help="decompressed output file (default: epg.xml)")
+    parser.add_argument("--retries", type=int, default=DEFAULT_RETRIES,
+                        help=f"retries without progress before giving up (default: {DEFAULT_RETRIES})")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT,
+                        help=f"seconds to wait on the server at any point (default: {DEFAULT_TIMEOUT:g})")
+    args = parser.parse_args(argv)
+
+    tmp = args.output + ".tmp"
+    try:
+        with open_url(args.url, args.retries, args.timeout) as source, open(tmp, "wb") as out:
+            while True:
+                data = source.read(READ_SIZE)
+                if not data:
+                    break
+                out.write(data)
+        if os.path.getsize(tmp) == 0:
+            raise FetchError("the download is empty")
+        os.replace(tmp, args.output)
+    except (FetchError, OSError) as e:
+        print(f"ERROR: {e}")
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise SystemExit(1)
+    stats = source.stats
+    print(f"Saved '{args.output}': {stats['decompressed']:,} bytes from {stats['downloaded']:,} downloaded "
+          f"({stats['format']}), {stats['retries']} retries, in {stats['seconds']:.1f}s.")
+
+if __name__ == "__main__":
+    main()
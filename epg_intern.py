@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+epg_intern.py
+String intern table for programme records held until the output is written.
+
+A 14-day guide repeats itself: every programme carries its channel id, each
+stop time is the next programme's start, and reruns / marathons repeat the
+same titles and descriptions. The parser hands out a fresh string for every
+occurrence, so kept records (epg_record.ProgrammeRecord) are run through one
+table that maps each distinct value to a single shared copy.
+
+- Per field counts (strings seen, distinct values stored for that field,
+  bytes saved) feed the run report's dedup ratios; one copy still serves
+  every field, but only repeats within a field count toward its ratio
+- The table only holds what the sorter holds: clear() it when the sorter
+  spills, and it stops growing past `max_size` entries
+"""
+
+import sys
+
+DEFAULT_INTERN_SIZE = 1 << 20
+# record fields that go through the table
+INTERNED_FIELDS = ("channel", "start", "stop", "title", "desc")
+
+class InternTable:
+    def __init__(self, max_size: int = DEFAULT_INTERN_SIZE):
+        self.max_size = max_size
+        self.strings = {}
+        # value -> bit mask of the fields it was stored for, so a copy shared
+        # across fields (a stop that is the next start) counts once per field
+        self.owners = {}
+        # field -> [seen, stored, bytes saved]
+        self.fields = {name: [0, 0, 0] for name in INTERNED_FIELDS}
+        self.bits = {name: 1 << i for i, name in enumerate(INTERNED_FIELDS)}
+
+    def intern(self, value: str, field: str) -> str:
+        stats = self.fields[field]
+        stats[0] += 1
+        shared = self.strings.get(value)
+        if shared is None:
+            stats[1] += 1
+            if len(self.strings) < self.max_size:
+                self.strings[value] = value
+                self.owners[value] = self.bits[field]
+            return value
+        bit = self.bits[field]
+        owners = self.owners[value]
+        if not owners & bit:
+            stats[1] += 1
+            self.owners[value] = owners | bit
+        if shared is not value:
+            stats[2] += sys.getsizeof(value)
+        return shared
+
+    # Swap a record's strings for their shared copies
+    def intern_record(self, record):
+        for field in INTERNED_FIELDS:
+            value = getattr(record, field)
+            if value is not None:
+                setattr(record, field, self.intern(value, field))
+        return record
+
+    def clear(self):
+        self.strings.clear()
+        self.owners.clear()
+
+    # Whether anything went through the table
+    def used(self) -> bool:
+        return any(seen for seen, _, _ in self.fields.values())
+
+    # {field: {"seen", "stored", "dedup_ratio", "saved_mb"}}
+    def stats(self):
+        result = {}
+        for field, (seen, stored, saved) in self.fields.items():
+            result[field] = {"seen": seen, "stored": stored,
+                             "dedup_ratio": round(seen / stored, 2) if stored else None,
+                             "saved_mb": round(saved / (1024 * 1024), 2)}
+        return result
+
+# One-line summary of InternTable.stats()
+def format_intern_stats(stats) -> str:
+    parts = []
+    saved = 0.0
+    for field, st in stats.items():
+        saved += st["saved_mb"]
+        if st["seen"]:
+            parts.append(f"{field} {st['seen']}/{st['stored']} ({st['dedup_ratio']:.1f}x)")
+    return "; ".join(parts) + f"; {saved:.1f} MB saved"
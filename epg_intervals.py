@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+epg_intervals.py
+Interval lookups over one channel's schedule, shared by the service index
+(epg_service.py) and the binary sidecar (epg_sidecar.py).
+
+A schedule is three parallel sequences sorted by start: starts, stops and
+max_stops (the running maximum of stops). Because max_stops never decreases,
+"which programmes may still be running at t" is a binary search like "which
+have started by t", so both lookups below are two bisects plus a short scan.
+The sequences may be slices of larger arrays: lo / hi bound the channel's
+positions, as in bisect, and positions returned are positions in the arrays.
+
+- schedule(): fill in open-ended stops and the running maximum while building
+- airing(): position of the programme airing at a time (latest start wins)
+- upcoming(): position of the first programme starting after a time
+- overlapping(): positions of programmes overlapping [start, stop)
+"""
+
+from bisect import bisect_left, bisect_right
+
+# Entries sorted by start -> (entry, start, stop, max_stop); an entry's stop
+# (entry[stop], None when missing) runs until the next programme starts
+def schedule(entries, start=0, stop=1):
+    running = None
+    for n, entry in enumerate(entries):
+        begins = entry[start]
+        ends = entry[stop]
+        if ends is None:
+            # open-ended: runs until the next programme starts
+            ends = entries[n + 1][start] if n + 1 < len(entries) else begins
+        running = ends if running is None or ends > running else running
+        yield entry, begins, ends, running
+
+# Position of the programme airing at `at` (latest start wins), or None
+def airing(starts, stops, max_stops, at, lo=0, hi=None):
+    i = bisect_right(starts, at, lo, hi) - 1
+    first = bisect_right(max_stops, at, lo, hi)
+    while i >= first:
+        if stops[i] > at:
+            return i
+        i -= 1
+    return None
+
+# Position of the first programme starting after `at` (hi / len when none)
+def upcoming(starts, at, lo=0, hi=None):
+    return bisect_right(starts, at, lo, hi)
+
+# Positions of programmes overlapping [start, stop), in schedule order
+def overlapping(starts, stops, max_stops, start, stop, lo=0, hi=None):
+    first = bisect_right(max_stops, start, lo, hi)
+    last = bisect_left(starts, stop, lo, hi)
+    return [i for i in range(first, last) if stops[i] > start]
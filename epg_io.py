@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+epg_io.py
+Shared input helpers for clean_epg.py and filter_keep_channels.py:
+- Open an XMLTV guide for reading, decompressing gzip / xz on the fly
+  (detected from the file's magic bytes, not its name)
+- Fall back from `epg.xml` to `epg.xml.gz` / `epg.xml.xz` when only the
+  compressed download is present, so no separate unzip step is needed
+- Guide URLs (http / https) are streamed: downloaded, decompressed and read
+  as they arrive (see epg_fetch)
+- Safety check that an output path never points at the input file
+"""
+
+import gzip
+import lzma
+import os
+from urllib.parse import urlsplit
+
+GZIP_MAGIC = b"\x1f\x8b"
+XZ_MAGIC = b"\xfd7zXZ\x00"
+COMPRESSED_SUFFIXES = (".gz", ".xz")
+URL_SCHEMES = ("http", "https")
+
+def is_url(name: str) -> bool:
+    return urlsplit(name).scheme in URL_SCHEMES
+
+# Open a guide for binary reading; compressed files are decompressed as they are read
+def open_guide(path: str):
+    if is_url(path):
+        from epg_fetch import open_url
+        return open_url(path)
+    with open(path, "rb") as f:
+        magic = f.read(len(XZ_MAGIC))
+    if magic.startswith(GZIP_MAGIC):
+        return gzip.open(path, "rb")
+    if magic.startswith(XZ_MAGIC):
+        return lzma.open(path, "rb")
+    return open(path, "rb")
+
+# Resolve the input file: the name itself, else its .gz / .xz sibling (None if none exist)
+def find_input(name: str):
+    if os.path.exists(name):
+        return name
+    for suffix in COMPRESSED_SUFFIXES:
+        if os.path.exists(name + suffix):
+            return name + suffix
+    return None
+
+# True if both paths refer to the same file on disk (follows symlinks)
+def same_file(path_a: str, path_b: str) -> bool:
+    if os.path.realpath(path_a) == os.path.realpath(path_b):
+        return True
+    try:
+        return os.path.samefile(path_a, path_b)
+    except OSError:
+        return False
@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+epg_merge.py
+Merge several XMLTV feeds into one stream of top-level elements.
+
+Each feed is read, decompressed and parsed on its own thread into a small
+bounded queue; the merge takes elements from the queues in priority order
+(every feed's channels first, then each feed's programmes in turn), so the
+result never depends on thread timing. Nothing is concatenated or parsed twice.
+
+- Channel ids are resolved to our ids through epg_channels.channel_display_map:
+  a feed channel whose id or display-name is one of our display names (and
+  only one channel has that name) becomes that channel, and so do its programmes
+- Each channel is kept once; the first feed listing it wins
+- A programme is dropped as a duplicate when an earlier feed already had one
+  with the same (channel, start, title); start compares as epoch seconds, so
+  the same time with another UTC offset still matches. A feed's own listing
+  is never thinned out. With `programme_ids` given, programmes of other
+  channels are dropped first, so only wanted ones are remembered. The last
+  feed's are never remembered: no feed after it is checked against them
+- Other top-level elements come from the first feed only, under its root
+
+Usage:
+    python3 epg_merge.py epg.xml guide2/epg_source.xml.gz       # -> merged_epg.xml
+    python3 epg_merge.py a.xml.gz b.xml.gz c.xml -o merged.xml.gz
+"""
+
+import argparse
+import itertools
+import os
+import queue
+import threading
+from collections import Counter
+
+from epg_channels import channel_display_map
+from epg_dates import xmltv_epoch
+from epg_engine import iter_guide
+from epg_io import open_guide, is_url, same_file
+from epg_writer import GuideWriter
+
+# elements handed over per queue item, and queue items buffered per feed
+BATCH_SIZE = 64
+QUEUE_SIZE = 16
+
+_DONE = object()
+
+class _Failure:
+    def __init__(self, error):
+        self.error = error
+
+# Our display names (case-insensitive) -> channel id, for names only one channel uses
+def alias_map(display_map=channel_display_map):
+    owners = {}
+    for cid, name in display_map.items():
+        owners.setdefault(name.casefold(), set()).add(cid)
+    return {name: ids.pop() for name, ids in owners.items() if len(ids) == 1}
+
+# -------------------------------
+# One thread per feed
+# -------------------------------
+class FeedReader:
+    def __init__(self, source, name: str):
+        self.source = source   # binary file object, read only by this reader's thread
+        self.name = name
+        self.queue = queue.Queue(QUEUE_SIZE)
+        self._stop = threading.Event()
+        self.thread = threading.Thread(target=self._run, name=f"feed-{name}", daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def _run(self):
+        batch = []
+        try:
+            for elem in iter_guide(self.source):
+                if self._stop.is_set():
+                    return
+                batch.append(elem)
+                if len(batch) >= BATCH_SIZE:
+                    self.queue.put(batch)
+                    batch = []
+            if batch:
+                self.queue.put(batch)
+        except BaseException as e:
+            self.queue.put(_Failure(e))
+        finally:
+            self.queue.put(_DONE)
+
+    # Root first, then the feed's top-level elements, in order
+    def __iter__(self):
+        while True:
+            item = self.queue.get()
+            if item is _DONE:
+                return
+            if isinstance(item, _Failure):
+                raise RuntimeError(f"{self.name}: {item.error}") from item.error
+            yield from item
+
+    def close(self):
+        self._stop.set()
+        # a read blocked on the source (e.g. a download) fails now instead of
+        # keeping the thread alive
+        self.source.close()
+        while self.thread.is_alive():
+            # unblock a pending put
+            try:
+                self.queue.get_nowait()
+            except queue.Empty:
+                pass
+            self.thread.join(0.01)
+
+# -------------------------------
+# Merge
+# -------------------------------
+class GuideMerger:
+    # `sources`: (binary file object, name) per feed, in priority order;
+    # `programme_ids`: our channel ids whose programmes are wanted (None: all)
+    def __init__(self, sources, display_map=channel_display_map, programme_ids=None):
+        self.readers = [FeedReader(source, name) for source, name in sources]
+        self.known = set(display_map)
+        self.aliases = alias_map(display_map)
+        self.feed_ids = [{} for _ in self.readers]   # per feed: feed channel id -> our id
+        self.channels = set()
+        self.programme_ids = programme_ids
+        self.programmes = {}   # (channel, start, title) -> feed it came from
+        self.counts = Counter()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        for reader in self.readers:
+            reader.close()
+
+    def _resolve(self, feed: int, cid, names=()):
+        ids = self.feed_ids[feed]
+        resolved = ids.get(cid)
+        if resolved is not None:
+            return resolved
+        resolved = cid
+        if cid not in self.known:
+            for name in (cid, *names):
+                alias = self.aliases.get(name.casefold()) if name else None
+                if alias is not None:
+                    resolved = alias
+                    break
+        if cid is not None:
+            ids[cid] = resolved
+        return resolved
+
+    def _channel(self, feed: int, elem):
+        cid = elem.get("id")
+        resolved = self._resolve(feed, cid, [dn.text for dn in elem.findall("display-name")])
+        if resolved in self.channels:
+            self.counts["merge_channels_duplicate"] += 1
+            return None
+        self.channels.add(resolved)
+        if resolved != cid:
+            elem.set("id", resolved)
+            self.counts["merge_channels_aliased"] += 1
+        return elem
+
+    def _programme(self, feed: int, elem):
+        cid = elem.get("channel")
+        resolved = self._resolve(feed, cid)
+        if self.programme_ids is not None and resolved not in self.programme_ids:
+            self.counts["merge_programmes_unwanted"] += 1
+            return None
+        if resolved != cid:
+            elem.set("channel", resolved)
+        start = elem.get("start") or ""
+        key = (resolved, xmltv_epoch(start) or start, (elem.findtext("title") or "").strip())
+        if feed == len(self.readers) - 1:
+            owner = self.programmes.get(key, feed)
+        else:
+            owner = self.programmes.setdefault(key, feed)
+        if owner != feed:
+            self.counts["merge_programmes_duplicate"] += 1
+            return None
+        return elem
+
+    def _element(self, feed: int, elem):
+        if elem.tag == "programme":
+            return self._programme(feed, elem)
+        if elem.tag == "channel":
+            return self._channel(feed, elem)
+        return elem if feed == 0 else None
+
+    # Like iter_guide: the first feed's root, then merged top-level elements
+    def __iter__(self):
+        for reader in self.readers:
+            reader.start()
+        feeds = [iter(reader) for reader in self.readers]
+        roots = [next(it, None) for it in feeds]
+        for reader, root in zip(self.readers, roots):
+            if root is None:
+                raise RuntimeError(f"{reader.name}: no XML document")
+        yield roots[0]
+        self.counts["merge_feeds"] = len(feeds)
+
+        # channels of every feed first, so the output still lists them ahead of
+        # programmes; feed by feed, so an earlier feed's copy always wins. The
+        # other feeds' threads wait on their full queues meanwhile.
+        pending = [None] * len(feeds)
+        for feed, it in enumerate(feeds):
+            for elem in it:
+                if elem.tag != "channel":
+                    pending[feed] = elem
+                    break
+                elem = self._channel(feed, elem)
+                if elem is not None:
+                    yield elem
+
+        for feed, it in enumerate(feeds):
+            if pending[feed] is None:
+                continue
+            for elem in itertools.chain((pending[feed],), it):
+                elem = self._element(feed, elem)
+                if elem is not None:
+                    yield elem
+
+# Open every path (decompressing as needed) and merge them
+def open_merged(paths, display_map=channel_display_map):
+    return GuideMerger([(open_guide(path), path) for path in paths], display_map)
+
+# -------------------------------
+# Main: write the merged guide
+# -------------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Merge several XMLTV feeds into one guide.")
+    parser.add_argument("inputs", nargs="+", help="feeds in priority order, plain or gzip/xz compressed, or http(s) URLs")
+    parser.add_argument("-o", "--output", default="merged_epg.xml",
+                        help="output file (default: merged_epg.xml); a .gz name writes gzip")
+    args = parser.parse_args(argv)
+
+    for path in args.inputs:
+        if not is_url(path) and not os.path.exists(path):
+            print(f"ERROR: Input file '{path}' not found.")
+            return
+        if same_file(path, args.output):
+            print("ERROR: Output filename would overwrite input. Aborting for safety.")
+            return
+
+    tmp = args.output + ".tmp"
+    try:
+        with open_merged(args.inputs) as merger, GuideWriter(tmp, "gzip" if args.output.endswith(".gz") else None) as writer:
+            root = None
+            started = False
+            for elem in merger:
+                if root is None:
+                    root = elem
+                    continue
+                # root text is only final once its first child is in
+                if not started:
+                    writer.start(root.tag, root.attrib, root.text)
+                    started = True
+                writer.write_element(elem)
+            if not started:
+                writer.start(root.tag, root.attrib, root.text)
+        os.replace(tmp, args.output)
+    except Exception as e:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        print(f"ERROR: Failed to merge: {e}")
+        return
+    counts = merger.counts
+    print(f"Merged {len(args.inputs)} feeds into '{args.output}': "
+          f"{counts['merge_channels_duplicate']} duplicate channel(s), "
+          f"{counts['merge_channels_aliased']} aliased, "
+          f"{counts['merge_programmes_duplicate']} duplicate programme(s) dropped.")
+
+if __name__ == "__main__":
+    main()
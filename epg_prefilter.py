@@ -0,0 +1,398 @@
+#!/usr/bin/env python3
+"""
+epg_prefilter.py
+Byte-level channel prefilter for XMLTV guides.
+
+Most of a full upstream guide belongs to channels we throw away. Instead of
+letting the XML parser tokenize all of it, this scans the raw bytes for
+top-level <channel>/<programme> blocks, reads the `id="..."` / `channel="..."`
+attribute straight out of the start tag, and only passes the blocks we want
+(plus the document header and footer) on to the parser.
+
+- Plain files are scanned through a read-only mmap; gzip/xz inputs and URLs
+  are scanned chunk by chunk as they are decompressed / downloaded
+- A block runs from its start tag up to the next tag after its end tag, so it
+  carries its own tail whitespace and the parser sees exactly what it would
+  have seen for that element in the full document
+- Start tags are read with their quoted attribute values (which may hold ">"),
+  and a block's end tag is looked for outside comments / PIs / CDATA
+- Anything the scanner can't classify with confidence is passed through, so
+  the parser still has the final word on what is kept
+- Block offsets in the (decompressed) input are known exactly, so a scan can
+  also start over from a block boundary (clean_epg.py --checkpoint)
+"""
+
+import codecs
+import mmap
+import re
+from collections import deque
+from xml.sax.saxutils import unescape
+
+from epg_io import open_guide, is_url, GZIP_MAGIC, XZ_MAGIC
+
+CHUNK_SIZE = 4 * 1024 * 1024
+READ_TARGET = 256 * 1024
+
+# Start of a top-level block we filter on; comments / PIs / CDATA are matched
+# first so a "<programme" inside one of them is never taken for a real tag
+START_RE = re.compile(rb"<!--.*?-->|<\?.*?\?>|<!\[CDATA\[.*?\]\]>|<(programme|channel)[\s>/]", re.DOTALL)
+ENCODING_RE = re.compile(rb"""<\?xml[^>]*?encoding\s*=\s*["']([A-Za-z0-9._\-]+)["']""")
+OPEN_MARKUP = ((b"<!--", b"-->"), (b"<?", b"?>"), (b"<![CDATA[", b"]]>"))
+# A whole start tag; quoted attribute values may hold ">" and "/>"
+START_TAG_RE = re.compile(rb"""<[^\s>/]+(?:[^>"']|"[^"]*"|'[^']*')*>""")
+# One attribute of a start tag, with the whitespace before it
+ATTR_RE = re.compile(rb"""\s+([^\s=/>]+)\s*=\s*(?:"([^"]*)"|'([^']*)')""")
+ATTR_NAMES = {b"programme": b"channel", b"channel": b"id"}
+ATTR_RES = {
+    b"programme": re.compile(rb'\schannel\s*=\s*"([^"]*)"'),
+    b"channel": re.compile(rb'\sid\s*=\s*"([^"]*)"'),
+}
+# Comment / PI / CDATA / doctype opener
+MARKUP_RE = re.compile(rb"<[!?]")
+# The end tag of a block, skipping comments / PIs / CDATA in its content; a
+# bare opener is one that isn't closed within the buffer yet
+END_RES = {kind: re.compile(rb"<!--.*?-->|<\?.*?\?>|<!\[CDATA\[.*?\]\]>|(<!--|<\?|<!\[CDATA\[)|</" + kind + rb"\s*>",
+                            re.DOTALL)
+           for kind in ATTR_NAMES}
+
+# Scan one buffer of guide bytes, yielding (kind, value, start, stop) for each
+# complete piece: kind is "header", "channel", "programme", "other" or "footer",
+# value the raw attribute bytes (channel/programme only). Stops early when a
+# block runs past the end of a non-final buffer; `pos` is then where to resume.
+class BlockScanner:
+    def __init__(self):
+        self.state = "header"
+        self.encoding = "utf-8"
+        self.pos = 0
+
+    def scan(self, buf, final):
+        size = len(buf)
+        pos = self.pos
+        if self.state == "header":
+            m = self._next_start(buf, pos, final)
+            if m is None:
+                if final:
+                    self.state = "done"
+                    self.pos = size
+                    yield ("header", None, pos, size)
+                return
+            self._detect_encoding(buf[pos:m.start()])
+            yield ("header", None, pos, m.start())
+            pos = self.pos = m.start()
+            self.state = "body"
+
+        if self.state == "done":
+            if pos < size:
+                self.pos = size
+                yield ("other", None, pos, size)
+            return
+
+        while True:
+            m = START_RE.match(buf, pos)
+            if m is not None and m.group(1) is not None:
+                block = self._scan_block(buf, pos, m.group(1))
+                if block is None:
+                    break
+                value, stop = block
+                yield (m.group(1).decode("ascii"), value, pos, stop)
+            elif buf[pos:pos + 2] == b"</":
+                # root end tag: everything from here on is the footer
+                self.state = "done"
+                self.pos = size
+                yield ("footer", None, pos, size)
+                return
+            else:
+                # some other top-level element: pass it through up to the next block
+                nxt = self._next_start(buf, pos + 1, final)
+                if nxt is None:
+                    break
+                stop = nxt.start()
+                yield ("other", None, pos, stop)
+            pos = self.pos = stop
+
+        if final and pos < size:
+            # truncated or unusual input: hand the rest over and let the parser judge
+            self.state = "done"
+            self.pos = size
+            yield ("other", None, pos, size)
+
+    # Next channel/programme start tag at or after `pos`. In a partial buffer a
+    # comment / PI / CDATA section may not be closed yet, and a match inside it
+    # would be bogus, so that case also reports "need more data" (None).
+    @staticmethod
+    def _next_start(buf, pos, final):
+        m = START_RE.search(buf, pos)
+        while m is not None and m.group(1) is None:
+            m = START_RE.search(buf, m.end())
+        if m is None or final:
+            return m
+        for opener, closer in OPEN_MARKUP:
+            i = buf.rfind(opener, pos, m.start())
+            if i >= 0 and buf.find(closer, i + len(opener), m.start()) < 0:
+                return None
+        return m
+
+    # Find the end of the block starting at `pos` (element + tail), or None if
+    # more data is needed. In a final buffer None hands the rest to the parser
+    # unsplit, so anything the scan can't follow is never cut in two.
+    def _scan_block(self, buf, pos, kind):
+        tag_end = buf.find(b">", pos)
+        if tag_end < 0:
+            return None
+        start_tag = buf[pos:tag_end]
+        # usual case: double quotes only, all closed, so that ">" ends the tag
+        simple = b"'" not in start_tag and not start_tag.count(b'"') % 2
+        if not simple:
+            tag = START_TAG_RE.match(buf, pos)
+            if tag is None:
+                return None
+            tag_end = tag.end() - 1
+            start_tag = buf[pos:tag_end]
+        if start_tag.endswith(b"/"):
+            elem_end = tag_end + 1
+        else:
+            # usual case: no markup in the content before the first end tag
+            close = buf.find(b"</" + kind, tag_end)
+            if close >= 0 and MARKUP_RE.search(buf, tag_end, close) is None:
+                elem_end = buf.find(b">", close) + 1
+                if not elem_end:
+                    return None
+            else:
+                end_re = END_RES[kind]
+                close = end_re.search(buf, tag_end)
+                while close is not None and close.lastindex is None and close.group(0)[1] in b"!?":
+                    close = end_re.search(buf, close.end())
+                if close is None or close.lastindex is not None:
+                    return None
+                elem_end = close.end()
+        # tail text runs to the next real tag (comments and PIs belong to the tail)
+        nxt = elem_end
+        while True:
+            lt = buf.find(b"<", nxt)
+            if lt < 0:
+                return None
+            head = buf[lt:lt + 4]
+            if head == b"<!--":
+                end = buf.find(b"-->", lt + 4)
+                if end < 0:
+                    return None
+                nxt = end + 3
+            elif head[:2] == b"<?":
+                end = buf.find(b"?>", lt + 2)
+                if end < 0:
+                    return None
+                nxt = end + 2
+            elif len(head) < 4 and head[:2] != b"</":
+                # not enough bytes to tell what the next tag is
+                return None
+            else:
+                break
+        m = ATTR_RES[kind].search(start_tag)
+        if simple and m is not None and not start_tag.count(b'"', 0, m.start()) % 2:
+            return m.group(1), lt
+        return _attribute(start_tag, 1 + len(kind), ATTR_NAMES[kind]), lt
+
+    def _detect_encoding(self, header):
+        m = ENCODING_RE.search(header)
+        if m is None:
+            return
+        try:
+            self.encoding = codecs.lookup(m.group(1).decode("ascii")).name
+        except LookupError:
+            pass
+
+# Raw value of attribute `name` in a start tag (without its ">"), reading the
+# attributes one after the other from `pos` so text inside another value is
+# never taken for it; None if absent or the tag doesn't read cleanly
+def _attribute(start_tag, pos, name):
+    for m in ATTR_RE.finditer(start_tag, pos):
+        if m.start() != pos:
+            return None
+        if m.group(1) == name:
+            return m.group(2) if m.group(2) is not None else m.group(3)
+        pos = m.end()
+    return None
+
+# Decode a raw id/channel attribute value; None when it can't be told byte-wise
+def decode_id(value, encoding):
+    if value is None:
+        return None
+    try:
+        text = value.decode(encoding)
+    except (UnicodeDecodeError, LookupError):
+        return None
+    if "&" in text:
+        if "&#" in text:
+            return None
+        text = unescape(text, {"&quot;": '"', "&apos;": "'"})
+    if "\t" in text or "\n" in text or "\r" in text:
+        # attribute value normalization would change it; not worth second-guessing
+        return None
+    return text
+
+# Decide whether an attribute value (raw bytes) is one of the wanted ids;
+# anything undecidable is kept and left to the parser
+def _wanted(value, wanted, encoding):
+    text = decode_id(value, encoding)
+    return text is None or text in wanted
+
+# Scan a guide file (plain through mmap, compressed chunk by chunk) and yield
+# (kind, value, encoding, buf, start, stop, base) for every piece; buf[start:stop]
+# is the piece's bytes, found at byte base + start of the decompressed input.
+# Inputs in multi-byte encodings can't be matched byte-wise, so they come
+# through as "other" pieces only. `opener` replaces epg_io.open_guide for the
+# non-mmap reads.
+#
+# `resume`: (header bytes, offset) to scan `header` followed by the input from
+# `offset` on, a block boundary found by an earlier scan of the same input
+def iter_blocks(path, chunk_size=None, opener=None, resume=None):
+    chunk_size = chunk_size or CHUNK_SIZE
+    opener = opener or open_guide
+    if is_url(path):
+        # a download: already decompressed, only readable front to back
+        magic = b""
+        compressed = True
+    else:
+        with open(path, "rb") as f:
+            magic = f.read(len(XZ_MAGIC))
+        compressed = magic.startswith(GZIP_MAGIC) or magic.startswith(XZ_MAGIC)
+
+    if magic.startswith((b"\xff\xfe", b"\xfe\xff", b"\x00")):
+        with opener(path) as raw:
+            base = 0
+            while True:
+                data = raw.read(chunk_size)
+                if not data:
+                    return
+                yield ("other", None, None, data, 0, len(data), base)
+                base += len(data)
+
+    scanner = BlockScanner()
+    if not compressed and magic and resume is None:
+        # plain file: scan the whole thing in place through a read-only mmap
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for kind, value, start, stop in scanner.scan(mm, True):
+                yield _classify(kind, value, scanner.encoding, mm, start, stop, 0)
+        return
+
+    with opener(path) as raw:
+        carry = b""
+        base = 0
+        if resume is not None:
+            header, offset = resume
+            _skip(raw, offset)
+            # the header stands in for everything before `offset`
+            carry = header
+            base = offset - len(header)
+        while True:
+            data = raw.read(chunk_size)
+            final = not data
+            buf = carry + data if carry else data
+            scanner.pos = 0
+            for kind, value, start, stop in scanner.scan(buf, final):
+                yield _classify(kind, value, scanner.encoding, buf, start, stop, base)
+            carry = buf[scanner.pos:]
+            base += scanner.pos
+            if final:
+                return
+
+def _classify(kind, value, encoding, buf, start, stop, base):
+    if encoding.startswith(("utf-16", "utf-32")):
+        return ("other", None, encoding, buf, start, stop, base)
+    return (kind, value, encoding, buf, start, stop, base)
+
+# Move a reader `offset` bytes forward (compressed readers decompress their way there)
+def _skip(raw, offset):
+    seek = getattr(raw, "seek", None)
+    if seek is not None:
+        seek(offset)
+        return
+    while offset > 0:
+        data = raw.read(min(offset, CHUNK_SIZE))
+        if not data:
+            raise ValueError("input is shorter than the resume offset")
+        offset -= len(data)
+
+# -------------------------------
+# File-like reader handed to the XML parser
+# -------------------------------
+# `track_offsets`: remember where each kept channel / programme block ends in
+# the input and how many blocks were dropped up to there (`block_ends`, in
+# parse order), and the header bytes, for checkpoints;
+# `resume`: see iter_blocks
+class PrefilteredGuide:
+    def __init__(self, path, programme_ids, channel_ids=None, opener=None, resume=None, track_offsets=False):
+        self.path = path
+        self.programme_ids = set(programme_ids)
+        self.channel_ids = set(channel_ids) if channel_ids is not None else None
+        self.opener = opener
+        self.resume = resume
+        self.blocks_seen = 0
+        self.blocks_kept = 0
+        self.dropped = {"channel": 0, "programme": 0}
+        self.header = None
+        # (kind, end offset, channels dropped, programmes dropped)
+        self.block_ends = deque() if track_offsets else None
+        # False once a piece went through that isn't exactly one channel /
+        # programme (other top-level markup, input not scanned byte-wise):
+        # block ends then no longer match the parser's elements
+        self.offsets_exact = track_offsets
+        self._pieces = self._iter_pieces()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._pieces.close()
+
+    # Pieces are returned whole; the XML parser accepts reads larger than asked for
+    def read(self, size=-1):
+        if size is None or size < 0:
+            return b"".join(self._pieces)
+        return next(self._pieces, b"")
+
+    def _keep(self, kind, value, encoding):
+        if kind == "programme":
+            self.blocks_seen += 1
+            keep = _wanted(value, self.programme_ids, encoding)
+        elif kind == "channel":
+            self.blocks_seen += 1
+            keep = self.channel_ids is None or _wanted(value, self.channel_ids, encoding)
+        else:
+            return True
+        if keep:
+            self.blocks_kept += 1
+        else:
+            self.dropped[kind] += 1
+        return keep
+
+    # Yield the kept bytes, gathered into pieces of about READ_TARGET
+    def _iter_pieces(self):
+        parts = []
+        size = 0
+        for kind, value, encoding, buf, start, stop, base in iter_blocks(self.path, opener=self.opener,
+                                                                         resume=self.resume):
+            if not self._keep(kind, value, encoding):
+                continue
+            if self.block_ends is not None:
+                if kind == "channel" or kind == "programme":
+                    self.block_ends.append((kind, base + stop, self.dropped["channel"], self.dropped["programme"]))
+                elif kind == "header":
+                    self.header = bytes(buf[start:stop])
+                elif kind == "other":
+                    self.offsets_exact = False
+            parts.append(buf[start:stop])
+            size += stop - start
+            if size >= READ_TARGET:
+                yield b"".join(parts)
+                parts = []
+                size = 0
+        if parts:
+            yield b"".join(parts)
+
+# Open a guide for parsing with only the wanted channel / programme blocks left in
+def open_prefiltered(path, programme_ids, channel_ids=None, opener=None, resume=None, track_offsets=False):
+    return PrefilteredGuide(path, programme_ids, channel_ids, opener, resume, track_offsets)
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+epg_record.py
+Compact programme records for clean_epg.py.
+
+A parsed <programme> Element carries an attrib dict, a child list and a full
+Element per child, yet a cleaned programme is little more than channel, start,
+stop, title and desc. Kept programmes become a ProgrammeRecord as soon as they
+pass the channel filter; cleaning works on records, the sorter holds them and
+the writer serializes them, so no Element outlives its parse step.
+
+- The values that differ per programme sit in __slots__; everything else that
+  decides the output bytes (attribute order, whitespace, child tags, their
+  attributes and tails) is one "layout" tuple. Feeds are regular, so cleaned
+  programmes share a handful of layouts through a small table
+- Children are packed as (tag, attrib items, text, tail, children) tuples; in
+  a cleaned layout the title / desc text positions hold TITLE_TEXT / DESC_TEXT
+  and the record supplies the strings
+- Serialization matches the Element the record came from byte for byte
+  (see epg_writer.serialize_element)
+"""
+
+import xml.etree.ElementTree as ET
+
+from epg_writer import escape_cdata, start_tag_items
+
+TAG, ATTRIB, TEXT, TAIL, CHILDREN = range(5)
+PROGRAMME_TAG = "programme"
+# attributes held on the record; the layout keeps their position with a None value
+FIELDS = ("channel", "start", "stop")
+# placeholders in a cleaned layout's child text for the record's title / desc
+TITLE_TEXT, DESC_TEXT = 0, 1
+# distinct cleaned layouts kept for sharing (unusual ones are simply not shared)
+MAX_LAYOUTS = 4096
+# rough size of a record object and its string headers, for memory accounting
+RECORD_OVERHEAD = 280
+
+_layouts = {}
+
+def share_layout(layout):
+    shared = _layouts.get(layout)
+    if shared is not None:
+        return shared
+    if len(_layouts) < MAX_LAYOUTS:
+        _layouts[layout] = layout
+    return layout
+
+def pack_element(elem: ET.Element):
+    return (elem.tag, tuple(elem.attrib.items()), elem.text, elem.tail,
+            tuple(map(pack_element, elem)) if len(elem) else ())
+
+def unpack_element(packed) -> ET.Element:
+    tag, attrib, text, tail, children = packed
+    elem = ET.Element(tag, dict(attrib))
+    elem.text = text
+    elem.tail = tail
+    for child in children:
+        elem.append(unpack_element(child))
+    return elem
+
+# Serialize a packed element the way serialize_element does the Element
+def serialize_packed(packed, write):
+    tag, attrib, text, tail, children = packed
+    if tag[:1] == "{":
+        # namespaced tags need ElementTree's prefix bookkeeping; XMLTV doesn't use them
+        write(ET.tostring(unpack_element(packed), encoding="unicode"))
+        return
+    write(start_tag_items(tag, attrib))
+    if text or children:
+        write(">")
+        if text:
+            write(escape_cdata(text))
+        for child in children:
+            serialize_packed(child, write)
+        write("</" + tag + ">")
+    else:
+        write(" />")
+    if tail:
+        write(escape_cdata(tail))
+
+class ProgrammeRecord:
+    __slots__ = ("channel", "start", "stop", "title", "desc", "layout")
+
+    def __init__(self, channel=None, start=None, stop=None, title=None, desc=None, layout=((), None, None, ())):
+        self.channel = channel
+        self.start = start
+        self.stop = stop
+        self.title = title     # cleaned title / desc (None until cleaned)
+        self.desc = desc
+        self.layout = layout   # (attrib items, text, tail, packed children)
+
+    @classmethod
+    def from_element(cls, elem: ET.Element):
+        attrib = elem.attrib
+        layout = (tuple([(k, None if k in FIELDS else v) for k, v in attrib.items()]), elem.text, elem.tail,
+                  tuple(map(pack_element, elem)))
+        return cls(attrib.get("channel"), attrib.get("start"), attrib.get("stop"), None, None, layout)
+
+    # pickled as plain values when sent to worker processes and back
+    def __reduce__(self):
+        return _restore_record, (self.channel, self.start, self.stop, self.title, self.desc, self.layout)
+
+    @property
+    def children(self):
+        return self.layout[-1]
+
+    # First child with this tag (packed), or None
+    def find(self, tag: str):
+        for child in self.layout[-1]:
+            if child[TAG] == tag:
+                return child
+        return None
+
+    def findall(self, tag: str):
+        return [child for child in self.layout[-1] if child[TAG] == tag]
+
+    # Text of the first child with this tag as it is written out ("" if it has
+    # none, `default` if there is no such child), like Element.findtext
+    def findtext(self, tag: str, default=None):
+        child = self.find(tag)
+        if child is None:
+            return default
+        text = child[TEXT]
+        if text.__class__ is int:
+            text = (self.title, self.desc)[text]
+        return text or ""
+
+    def get(self, name: str, default=None):
+        for key, value in self.layout[0]:
+            if key == name:
+                return getattr(self, key) if value is None else value
+        return default
+
+    # Children with title / desc text replaced by TITLE_TEXT / DESC_TEXT
+    def set_cleaned(self, title: str, desc: str, children):
+        attrib, text, tail, _ = self.layout
+        self.title = title
+        self.desc = desc
+        self.layout = share_layout((attrib, text, tail, tuple(children)))
+
+    def size(self) -> int:
+        return RECORD_OVERHEAD + sum(len(value) for value in
+                                     (self.channel, self.start, self.stop, self.title, self.desc) if value)
+
+    def serialize(self, write):
+        attrib, text, tail, children = self.layout
+        write(start_tag_items(PROGRAMME_TAG, [(k, getattr(self, k) if v is None else v) for k, v in attrib]))
+        if text or children:
+            write(">")
+            if text:
+                write(escape_cdata(text))
+            values = (self.title, self.desc)
+            for child in children:
+                if child[TEXT].__class__ is int:
+                    child = child[:TEXT] + (values[child[TEXT]],) + child[TEXT + 1:]
+                serialize_packed(child, write)
+            write("</" + PROGRAMME_TAG + ">")
+        else:
+            write(" />")
+        if tail:
+            write(escape_cdata(tail))
+
+    def to_string(self) -> str:
+        parts = []
+        self.serialize(parts.append)
+        return "".join(parts)
+
+def _restore_record(channel, start, stop, title, desc, layout):
+    if title is not None:
+        layout = share_layout(layout)
+    return ProgrammeRecord(channel, start, stop, title, desc, layout)
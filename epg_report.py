@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+epg_report.py
+Run instrumentation for clean_epg.py: where the time went and what was done.
+
+- Wall time per stage (decompress, filter, parse, clean, sort, write,
+  ...). The stages of the streaming pipeline interleave, so time is
+  charged to the innermost running stage only: the parser's time excludes the
+  reads that feed it, which exclude the decompression underneath them
+- Counters (channels / programmes kept and dropped, sports detections, ...)
+- Peak RSS of this process and of worker processes
+- Written as a JSON report next to the output; optional cProfile /
+  tracemalloc data for deep dives
+"""
+
+import json
+import os
+import sys
+import time
+import tracemalloc
+from collections import Counter
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+REPORT_VERSION = 1
+# distinct exception messages kept in the report
+MAX_EXCEPTIONS = 20
+
+# -------------------------------
+# Memory
+# -------------------------------
+def _maxrss_mb(usage):
+    return usage.ru_maxrss / (1024 * 1024) if sys.platform == "darwin" else usage.ru_maxrss / 1024
+
+# Peak RSS in MB. On Linux this is the kernel's high-water mark, which
+# reset_peak_rss() can reset; elsewhere it is the process-lifetime peak.
+def peak_rss_mb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    return _maxrss_mb(resource.getrusage(resource.RUSAGE_SELF))
+
+def reset_peak_rss():
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+# Largest peak RSS among terminated child processes (e.g. pool workers)
+def children_peak_rss_mb():
+    if resource is None:
+        return None
+    return _maxrss_mb(resource.getrusage(resource.RUSAGE_CHILDREN))
+
+# -------------------------------
+# Report
+# -------------------------------
+class RunReport:
+    def __init__(self):
+        self.started = time.time()
+        self.stages = Counter()
+        self.counters = Counter()
+        self.exceptions = Counter()
+        self.info = {}
+        self.status = "ok"
+        self.error = None
+        self._stack = []
+        self._start = self._mark = time.perf_counter()
+
+    # Charge the time since the last switch to the stage currently running
+    def _switch(self):
+        now = time.perf_counter()
+        if self._stack:
+            self.stages[self._stack[-1]] += now - self._mark
+        self._mark = now
+
+    def enter(self, name: str):
+        self._switch()
+        self._stack.append(name)
+
+    def exit(self):
+        self._switch()
+        self._stack.pop()
+
+    def stage(self, name: str):
+        return _Stage(self, name)
+
+    # Iterate, charging the time spent producing each item to `name`
+    def timed_iter(self, iterable, name: str):
+        it = iter(iterable)
+        while True:
+            self.enter(name)
+            try:
+                item = next(it)
+            except StopIteration:
+                return
+            finally:
+                self.exit()
+            yield item
+
+    # Wrap a binary file so time spent in its read() is charged to `name`
+    def timed_reader(self, f, name: str):
+        return TimedReader(f, self, name)
+
+    def count(self, name: str, n: int = 1):
+        self.counters[name] += n
+
+    def exception(self, message: str):
+        self.counters["exceptions"] += 1
+        if message in self.exceptions or len(self.exceptions) < MAX_EXCEPTIONS:
+            self.exceptions[message] += 1
+
+    def fail(self, message: str):
+        self.status = "error"
+        self.error = message
+
+    def to_dict(self):
+        total = time.perf_counter() - self._start
+        stages = {name: round(seconds, 4) for name, seconds in self.stages.items()}
+        stages["other"] = round(max(0.0, total - sum(self.stages.values())), 4)
+        peak = peak_rss_mb()
+        report = {
+            "version": REPORT_VERSION,
+            "started": time.strftime("%Y-%m-%dT%H:%M:%S%z", time.localtime(self.started)),
+            "status": self.status,
+            "error": self.error,
+            "wall_s": round(total, 4),
+            "stages_s": stages,
+            "counters": dict(sorted(self.counters.items())),
+            "exceptions": dict(self.exceptions.most_common()),
+            "peak_rss_mb": round(peak, 1) if peak is not None else None,
+        }
+        report.update(self.info)
+        return report
+
+    def write(self, path: str):
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=1)
+            f.write("\n")
+        os.replace(tmp, path)
+
+class _Stage:
+    __slots__ = ("report", "name")
+
+    def __init__(self, report, name):
+        self.report = report
+        self.name = name
+
+    def __enter__(self):
+        self.report.enter(self.name)
+
+    def __exit__(self, *exc):
+        self.report.exit()
+
+class TimedReader:
+    def __init__(self, f, report: RunReport, name: str):
+        self.f = f
+        self.report = report
+        self.name = name
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def read(self, size=-1):
+        self.report.enter(self.name)
+        try:
+            return self.f.read(size)
+        finally:
+            self.report.exit()
+
+    def seek(self, offset, whence=0):
+        self.report.enter(self.name)
+        try:
+            return self.f.seek(offset, whence)
+        finally:
+            self.report.exit()
+
+    def close(self):
+        self.f.close()
+
+# Report path for an output file: clean_epg.xml(.gz) -> clean_epg.report.json
+def default_report_path(output: str) -> str:
+    base = output
+    for suffix in (".gz", ".xml"):
+        if base.endswith(suffix):
+            base = base[: -len(suffix)]
+    return base + ".report.json"
+
+# -------------------------------
+# Deep dives
+# -------------------------------
+# Top allocation sites (by size) of a running tracemalloc session
+def tracemalloc_summary(limit: int = 15):
+    current, peak = tracemalloc.get_traced_memory()
+    top = tracemalloc.take_snapshot().statistics("lineno")[:limit]
+    return {
+        "current_mb": round(current / (1024 * 1024), 1),
+        "peak_mb": round(peak / (1024 * 1024), 1),
+        "top": [{"where": f"{st.traceback[0].filename}:{st.traceback[0].lineno}",
+                 "size_kb": round(st.size / 1024, 1), "count": st.count} for st in top],
+    }
@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""
+epg_service.py
+Long-running guide service: answers "what's on" questions from clean_epg.xml
+over a small local HTTP/JSON API, without re-parsing anything per request.
+
+The cleaned guide is loaded once into a per-channel interval index: start and
+stop times as sorted epoch-second arrays plus offsets into one shared record
+table. Lookups are binary searches over those arrays. A watcher thread notices
+when a new clean_epg.xml is written, builds a fresh index beside the live one
+and swaps it in with a single reference assignment, so requests never see a
+half-built index. A file that doesn't parse (e.g. still being written) is
+retried on the next poll while the old index keeps serving.
+
+Endpoints (times are epoch seconds or XMLTV times, default now):
+    GET /status                                   loaded file, counts, load time
+    GET /channels                                 channel ids, names, programme counts
+    GET /now[?channel=ID][&at=TIME][&next=N]      current + next N programmes
+    GET /range?start=TIME&stop=TIME[&channel=ID]  programmes overlapping [start, stop)
+    GET /channel/ID[?start=TIME][&stop=TIME]      one channel's schedule
+
+Usage:
+    python3 epg_service.py                        # serves clean_epg.xml on 127.0.0.1:8765
+    python3 epg_service.py clean_epg.xml.gz --port 9000 --poll 10
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+from array import array
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from epg_dates import xmltv_epoch
+from epg_engine import iter_guide
+from epg_intervals import airing, overlapping, schedule, upcoming
+from epg_io import open_guide, find_input
+
+DEFAULT_PORT = 8765
+DEFAULT_POLL = 30.0
+MAX_NEXT = 50
+
+# -------------------------------
+# Interval index
+# -------------------------------
+class ChannelIndex:
+    __slots__ = ("cid", "name", "starts", "stops", "max_stops", "offsets")
+
+    def __init__(self, cid, name):
+        self.cid = cid
+        self.name = name
+        self.starts = array("q")     # programme start, epoch seconds, ascending
+        self.stops = array("q")      # programme stop (start of the next one if missing)
+        self.max_stops = array("q")  # running maximum of stops, so overlaps can be bisected too
+        self.offsets = array("l")    # positions in GuideIndex.records
+
+    # Positions (into this channel's arrays) of programmes overlapping [start, stop)
+    def overlapping(self, start, stop):
+        return overlapping(self.starts, self.stops, self.max_stops, start, stop)
+
+    # Position of the programme airing at `at` (latest start wins), or None
+    def airing(self, at):
+        return airing(self.starts, self.stops, self.max_stops, at)
+
+class GuideIndex:
+    def __init__(self, path):
+        self.path = path
+        self.records = []    # (channel id, start text, stop text, title, desc)
+        self.channels = {}   # channel id -> ChannelIndex, in guide order
+        self.stat = None
+        self.loaded_at = None
+        self.load_seconds = None
+
+    def record(self, channel, i):
+        cid, start, stop, title, desc = self.records[channel.offsets[i]]
+        return {"channel": cid, "start": start, "stop": stop,
+                "start_epoch": channel.starts[i], "stop_epoch": channel.stops[i],
+                "title": title, "desc": desc}
+
+    def now(self, channel, at, following=1):
+        current = channel.airing(at)
+        if current is None:
+            after = upcoming(channel.starts, at)
+        else:
+            after = current + 1
+        nxt = [self.record(channel, i) for i in range(after, min(after + following, len(channel.starts)))]
+        return {"channel": channel.cid, "name": channel.name,
+                "now": self.record(channel, current) if current is not None else None, "next": nxt}
+
+    def range(self, channel, start, stop):
+        return [self.record(channel, i) for i in channel.overlapping(start, stop)]
+
+# Build an index from a cleaned guide (plain or compressed)
+def load_index(path):
+    started = time.perf_counter()
+    stat = os.stat(path)
+    index = GuideIndex(path)
+    pending = {}  # channel id -> [(start epoch, stop epoch or None, record offset)]
+    with open_guide(path) as source:
+        root = None
+        for elem in iter_guide(source):
+            if root is None:
+                root = elem
+                continue
+            if elem.tag == "channel":
+                cid = elem.get("id")
+                if cid is not None and cid not in index.channels:
+                    index.channels[cid] = ChannelIndex(cid, elem.findtext("display-name"))
+            elif elem.tag == "programme":
+                cid = elem.get("channel")
+                start_text = elem.get("start")
+                begins = xmltv_epoch(start_text) if start_text else None
+                if cid is None or begins is None:
+                    continue
+                stop_text = elem.get("stop")
+                ends = xmltv_epoch(stop_text) if stop_text else None
+                pending.setdefault(cid, []).append((begins, ends, len(index.records)))
+                index.records.append((cid, start_text, stop_text, elem.findtext("title"), elem.findtext("desc")))
+
+    for cid, entries in pending.items():
+        channel = index.channels.get(cid)
+        if channel is None:
+            channel = index.channels[cid] = ChannelIndex(cid, None)
+        # by epoch start: the file's order ignores UTC offsets
+        entries.sort(key=lambda entry: (entry[0], entry[2]))
+        for (_, _, offset), begins, ends, running in schedule(entries):
+            channel.starts.append(begins)
+            channel.stops.append(ends)
+            channel.max_stops.append(running)
+            channel.offsets.append(offset)
+
+    index.stat = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+    index.loaded_at = time.time()
+    index.load_seconds = round(time.perf_counter() - started, 3)
+    return index
+
+# -------------------------------
+# Service: current index + reload watcher
+# -------------------------------
+class GuideService:
+    def __init__(self, path, poll=DEFAULT_POLL):
+        self.path = path
+        self.poll = poll
+        self.index = load_index(path)
+        self.reloads = 0
+        self.last_error = None
+        self._stop = threading.Event()
+
+    def _changed(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return False
+        return (st.st_mtime_ns, st.st_size, st.st_ino) != self.index.stat
+
+    def watch(self):
+        while not self._stop.wait(self.poll):
+            if not self._changed():
+                continue
+            try:
+                index = load_index(self.path)
+            except Exception as e:
+                # probably still being written; the old index keeps serving
+                self.last_error = str(e)
+                continue
+            self.index = index
+            self.reloads += 1
+            self.last_error = None
+            print(f"Reloaded '{self.path}': {len(index.records)} programmes in {index.load_seconds}s")
+
+    def start_watcher(self):
+        thread = threading.Thread(target=self.watch, name="guide-watcher", daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self):
+        self._stop.set()
+
+# -------------------------------
+# HTTP / JSON
+# -------------------------------
+class BadRequest(Exception):
+    pass
+
+def parse_time(value, default=None):
+    if value is None:
+        if default is None:
+            raise BadRequest("missing time")
+        return default
+    if value.lstrip("-").isdigit() and len(value) <= 12:
+        return int(value)
+    epoch = xmltv_epoch(value)
+    if epoch is None:
+        raise BadRequest(f"can't read time {value!r}")
+    return epoch
+
+class GuideRequestHandler(BaseHTTPRequestHandler):
+    server_version = "epg_service/1"
+    service = None  # set by make_server
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        # one index for the whole request, even if a reload swaps it meanwhile
+        index = self.service.index
+        try:
+            status, body = self.route(index, url.path, query)
+        except BadRequest as e:
+            status, body = 400, {"error": str(e)}
+        self.send_json(status, body)
+
+    def route(self, index, path, query):
+        now = int(time.time())
+        if path == "/status":
+            return 200, {"path": index.path, "loaded_at": int(index.loaded_at), "load_seconds": index.load_seconds,
+                         "channels": len(index.channels), "programmes": len(index.records),
+                         "reloads": self.service.reloads, "last_error": self.service.last_error}
+        if path == "/channels":
+            return 200, [{"id": ch.cid, "name": ch.name, "programmes": len(ch.starts)}
+                         for ch in index.channels.values()]
+        if path == "/now":
+            at = parse_time(query.get("at"), now)
+            try:
+                following = min(MAX_NEXT, max(0, int(query.get("next", 1))))
+            except ValueError:
+                raise BadRequest("next must be a number")
+            channels = self.channels(index, query.get("channel"))
+            if channels is None:
+                return 404, {"error": "unknown channel"}
+            return 200, [index.now(ch, at, following) for ch in channels]
+        if path == "/range":
+            start = parse_time(query.get("start"))
+            stop = parse_time(query.get("stop"))
+            channels = self.channels(index, query.get("channel"))
+            if channels is None:
+                return 404, {"error": "unknown channel"}
+            return 200, [rec for ch in channels for rec in index.range(ch, start, stop)]
+        if path.startswith("/channel/"):
+            channel = index.channels.get(unquote(path[len("/channel/"):]))
+            if channel is None:
+                return 404, {"error": "unknown channel"}
+            start = parse_time(query.get("start"), -2 ** 62)
+            stop = parse_time(query.get("stop"), 2 ** 62)
+            return 200, {"channel": channel.cid, "name": channel.name,
+                         "programmes": index.range(channel, start, stop)}
+        return 404, {"error": "not found"}
+
+    @staticmethod
+    def channels(index, cid):
+        if cid is None:
+            return list(index.channels.values())
+        channel = index.channels.get(cid)
+        return [channel] if channel is not None else None
+
+    def send_json(self, status, body):
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+def make_server(service, host="127.0.0.1", port=DEFAULT_PORT):
+    handler = type("BoundGuideRequestHandler", (GuideRequestHandler,), {"service": service})
+    return ThreadingHTTPServer((host, port), handler)
+
+# -------------------------------
+# Main
+# -------------------------------
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Serve now/next and schedule lookups from a cleaned guide.")
+    parser.add_argument("guide", nargs="?", default=None,
+                        help="cleaned guide, plain or gzip/xz compressed (default: clean_epg.xml or clean_epg.xml.gz)")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"port to listen on (default: {DEFAULT_PORT})")
+    parser.add_argument("--poll", type=float, default=DEFAULT_POLL,
+                        help=f"seconds between checks for a new guide file (default: {DEFAULT_POLL:g})")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    path = args.guide or find_input("clean_epg.xml") or "clean_epg.xml"
+    if not os.path.exists(path):
+        print(f"ERROR: Guide file '{path}' not found. Run clean_epg.py first.")
+        return
+    try:
+        service = GuideService(path, args.poll)
+    except Exception as e:
+        print(f"ERROR: Failed to load '{path}': {e}")
+        return
+    index = service.index
+    print(f"Loaded '{path}': {len(index.channels)} channels, {len(index.records)} programmes in {index.load_seconds}s")
+    service.start_watcher()
+    server = make_server(service, args.host, args.port)
+    print(f"Serving on http://{args.host}:{server.server_address[1]}/ (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.stop()
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
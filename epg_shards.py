@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+"""
+epg_shards.py
+Sharded copies of the cleaned guide for clients that only need part of it.
+
+Next to clean_epg.xml, `clean_epg.py --shards DIR` writes:
+    channels/<id>.xml   one channel: its <channel> element and programmes
+    days/YYYY-MM-DD.xml every kept channel, programmes starting that day (UTC)
+    manifest.json       per shard: path, bytes, sha256, programme count
+
+Each shard is a complete XMLTV document laid out like clean_epg.xml (same
+root attributes, same element bytes). A set-top box showing three channels
+fetches three channel shards; a "next 24 hours" view fetches one or two days.
+
+- Programmes come out of the sorter channel by channel; each finished channel
+  is handed to a thread pool that builds, hashes and writes its shard and cuts
+  its programmes into per-day pieces. The pieces are appended to the day
+  shards on the same pool, one channel at a time in channel order, so the
+  result never depends on thread timing
+- A shard whose sha256 and size match the previous manifest is left untouched
+  (same mtime, nothing for a mirror / CDN sync to re-upload); changed shards
+  are written as .tmp files, shards that no longer exist are removed
+- manifest.json is written last, and only rewritten when it changes. The .tmp
+  files only replace the shards once it is in place, so an aborted run leaves
+  the previous shards and manifest as they were; .tmp files a killed run
+  left behind are put in place if the manifest has them, else removed
+"""
+
+import hashlib
+import json
+import os
+import re
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from epg_dates import xmltv_epoch
+from epg_writer import XML_DECLARATION, element_to_string, start_tag
+
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 1
+CHANNELS_DIR = "channels"
+DAYS_DIR = "days"
+DEFAULT_SHARD_WORKERS = 4
+UNSAFE_NAME_RE = re.compile(r"[^A-Za-z0-9._-]")
+
+def _encode(text: str) -> bytes:
+    # same as the GuideWriter text layer
+    return text.encode("utf-8", "xmlcharrefreplace")
+
+# UTC day ("YYYY-MM-DD") of an XMLTV start time, or None if it can't be read
+_days = {}
+def start_day(start):
+    epoch = xmltv_epoch(start) if start else None
+    if epoch is None:
+        return None
+    day = epoch // 86400
+    name = _days.get(day)
+    if name is None:
+        name = _days[day] = time.strftime("%Y-%m-%d", time.gmtime(day * 86400))
+    return name
+
+# File names for channel ids: unsafe characters become "_", clashes get a hash suffix
+def channel_file_names(channel_ids):
+    names = {}
+    taken = set()
+    for cid in channel_ids:
+        name = UNSAFE_NAME_RE.sub("_", cid) or "_"
+        if name in taken or name.startswith("."):
+            name += "-" + hashlib.blake2b(cid.encode("utf-8"), digest_size=4).hexdigest()
+        taken.add(name)
+        names[cid] = name + ".xml"
+    return names
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+class ShardWriter:
+    # `root`: (tag, attrib) of the output root; `channels`: kept <channel>
+    # elements in output order; `channel_ids`: every kept channel id in order
+    def __init__(self, directory: str, root, channels, channel_ids, workers: int = DEFAULT_SHARD_WORKERS):
+        self.directory = directory
+        tag, attrib = root
+        self.head = XML_DECLARATION + start_tag(tag, attrib) + ">"
+        self.tail = "</" + tag + ">"
+        self.channel_text = {c.attrib.get("id"): element_to_string(c) for c in channels}
+        self.channel_ids = list(channel_ids)
+        for cid in self.channel_text:
+            if cid not in self.channel_ids:
+                self.channel_ids.append(cid)
+        self.file_names = channel_file_names(self.channel_ids)
+        self.day_head = _encode(self.head + "".join(self.channel_text.values()))
+        self.previous = self._load_manifest()
+        self.manifest = {"version": MANIFEST_VERSION, "channels": {}, "days": {}}
+        self.counts = {"written": 0, "unchanged": 0, "removed": 0}
+        self.workers = max(1, workers)
+        self.pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="shard")
+        self.in_flight = deque()
+        self.days = {}       # day -> [tmp file, sha256, bytes, programmes]
+        self.day_job = None  # the one append to the day shards in flight
+        self.pending = []    # written shards (relative paths) still under their .tmp name
+        self.current = None
+        self.programmes = []
+        os.makedirs(os.path.join(directory, CHANNELS_DIR), exist_ok=True)
+        os.makedirs(os.path.join(directory, DAYS_DIR), exist_ok=True)
+        self._recover()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def _load_manifest(self):
+        try:
+            with open(os.path.join(self.directory, MANIFEST_NAME), "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if manifest.get("version") != MANIFEST_VERSION:
+            return {}
+        return {entry["path"]: entry for group in ("channels", "days")
+                for entry in manifest.get(group, {}).values()}
+
+    # .tmp shards of a run killed before it was done: the manifest they were
+    # written for is either in place (finish the rename) or not (drop them)
+    def _recover(self):
+        for group in (CHANNELS_DIR, DAYS_DIR):
+            for name in os.listdir(os.path.join(self.directory, group)):
+                if not name.endswith(".xml.tmp"):
+                    continue
+                path = group + "/" + name[:-len(".tmp")]
+                full = os.path.join(self.directory, path)
+                entry = self.previous.get(path)
+                if entry is not None and _file_sha256(full + ".tmp") == entry.get("sha256"):
+                    os.replace(full + ".tmp", full)
+                else:
+                    os.remove(full + ".tmp")
+
+    # Programmes arrive sorted, one channel after the other
+    def add(self, cid: str, start: str, text: str):
+        if cid != self.current:
+            self._flush()
+            self.current = cid
+        self.programmes.append((start, text))
+
+    def _flush(self):
+        if self.current is None:
+            return
+        self.in_flight.append(self.pool.submit(self._channel_job, self.current, self.programmes))
+        self.current = None
+        self.programmes = []
+        while len(self.in_flight) > 2 * self.workers:
+            self._collect(self.in_flight.popleft())
+
+    # Worker thread: write one channel shard, cut its programmes into day pieces
+    def _channel_job(self, cid, programmes):
+        texts = [text for _, text in programmes]
+        data = _encode(self.head + self.channel_text.get(cid, "") + "".join(texts) + self.tail)
+        path = CHANNELS_DIR + "/" + self.file_names[cid]
+        entry, written = self._store(path, data, len(programmes))
+        pieces = {}
+        for start, text in programmes:
+            day = start_day(start)
+            if day is not None:
+                pieces.setdefault(day, []).append(text)
+        return cid, entry, written, {day: (_encode("".join(texts)), len(texts)) for day, texts in pieces.items()}
+
+    # Main thread, in channel order: record the channel shard and hand its day
+    # pieces to the pool once the previous channel's are in
+    def _collect(self, future):
+        cid, entry, written, pieces = future.result()
+        self.manifest["channels"][cid] = entry
+        self.counts["written" if written else "unchanged"] += 1
+        self._wait_days()
+        self.day_job = self.pool.submit(self._append_days, pieces)
+
+    def _wait_days(self):
+        if self.day_job is not None:
+            job, self.day_job = self.day_job, None
+            job.result()
+
+    # Worker thread: extend the day shards with one channel's pieces
+    def _append_days(self, pieces):
+        for day, (data, count) in pieces.items():
+            shard = self.days.get(day)
+            if shard is None:
+                path = os.path.join(self.directory, DAYS_DIR, day + ".xml.tmp")
+                shard = self.days[day] = [open(path, "wb"), hashlib.sha256(), 0, 0]
+                self._append(shard, self.day_head)
+            self._append(shard, data)
+            shard[3] += count
+
+    @staticmethod
+    def _append(shard, data):
+        shard[0].write(data)
+        shard[1].update(data)
+        shard[2] += len(data)
+
+    # Write `data` to `path` (relative) unless the previous run left the same
+    # bytes there; returns the manifest entry and whether the file was written
+    def _store(self, path, data, programmes):
+        entry = {"path": path, "bytes": len(data), "sha256": hashlib.sha256(data).hexdigest(),
+                 "programmes": programmes}
+        if self._unchanged(entry):
+            return entry, False
+        with open(os.path.join(self.directory, path + ".tmp"), "wb") as f:
+            f.write(data)
+        self.pending.append(path)
+        return entry, True
+
+    def _unchanged(self, entry):
+        old = self.previous.get(entry["path"])
+        if old is None or old.get("sha256") != entry["sha256"] or old.get("bytes") != entry["bytes"]:
+            return False
+        try:
+            return os.path.getsize(os.path.join(self.directory, entry["path"])) == entry["bytes"]
+        except OSError:
+            return False
+
+    # Finish every shard, drop stale ones and write the manifest
+    def close(self):
+        self._flush()
+        while self.in_flight:
+            self._collect(self.in_flight.popleft())
+        # channels without programmes still get a shard with their <channel> element
+        done = set(self.manifest["channels"])
+        for cid in self.channel_ids:
+            if cid not in done and cid in self.channel_text:
+                self.in_flight.append(self.pool.submit(self._channel_job, cid, []))
+        while self.in_flight:
+            self._collect(self.in_flight.popleft())
+        self._wait_days()
+        self.pool.shutdown()
+        ordered = {cid: self.manifest["channels"][cid] for cid in self.channel_ids if cid in self.manifest["channels"]}
+        self.manifest["channels"] = ordered
+
+        for day in sorted(self.days):
+            f, digest, size, count = self.days[day]
+            tail = _encode(self.tail)
+            f.write(tail)
+            digest.update(tail)
+            f.close()
+            path = DAYS_DIR + "/" + day + ".xml"
+            entry = {"path": path, "bytes": size + len(tail), "sha256": digest.hexdigest(), "programmes": count}
+            full = os.path.join(self.directory, path)
+            if self._unchanged(entry):
+                os.remove(full + ".tmp")
+                self.counts["unchanged"] += 1
+            else:
+                self.pending.append(path)
+                self.counts["written"] += 1
+            self.manifest["days"][day] = entry
+        self.days = {}
+
+        data = json.dumps(self.manifest, indent=1, ensure_ascii=False).encode("utf-8")
+        manifest_path = os.path.join(self.directory, MANIFEST_NAME)
+        try:
+            with open(manifest_path, "rb") as f:
+                same = f.read() == data
+        except OSError:
+            same = False
+        if not same:
+            with open(manifest_path + ".tmp", "wb") as f:
+                f.write(data)
+            os.replace(manifest_path + ".tmp", manifest_path)
+
+        # the manifest is in place: now the shards it lists
+        for path in self.pending:
+            full = os.path.join(self.directory, path)
+            os.replace(full + ".tmp", full)
+        self.pending = []
+        live = {entry["path"] for group in ("channels", "days") for entry in self.manifest[group].values()}
+        for path in self.previous:
+            if path not in live and os.path.exists(os.path.join(self.directory, path)):
+                os.remove(os.path.join(self.directory, path))
+                self.counts["removed"] += 1
+        return self.counts
+
+    # Stop without touching the previous shards or their manifest; every .tmp
+    # shard written so far is removed
+    def abort(self):
+        self.pool.shutdown(cancel_futures=True)
+        for f, _, _, _ in self.days.values():
+            f.close()
+            if os.path.exists(f.name):
+                os.remove(f.name)
+        self.days = {}
+        for path in self.pending:
+            full = os.path.join(self.directory, path + ".tmp")
+            if os.path.exists(full):
+                os.remove(full)
+        self.pending = []
@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+"""
+epg_sidecar.py
+Binary guide sidecar: the cleaned guide's schedule in a file that is opened
+with mmap instead of parsed.
+
+clean_epg.py --sidecar writes it next to the XML output. Readers (service,
+players, scripts) get random access by channel and time without an XML parser:
+opening it maps the file and decodes the channel table; the programme columns
+are used in place (memoryview casts over the mapping), and titles /
+descriptions are only decoded when a programme is looked at.
+
+Layout (little-endian; every section starts on an 8-byte boundary):
+    header      magic, version, channel / programme / string counts, heap size
+    channels    per channel: id string, name string, first programme, count (u32 x 4)
+    starts      programme start, epoch seconds (i64), ascending within a channel
+    stops       programme stop (i64); open-ended ones run to the next start
+    max_stops   running maximum of stops within a channel (i64), so overlaps bisect
+    channel     channel number of each programme (u32)
+    title, desc string numbers (u32)
+    string_ends end offset of each string in the heap (u64)
+    heap        the distinct strings, UTF-8, each stored once
+
+String number 0 stands for "missing" (no title / desc / display-name).
+A channel's programmes are contiguous and sorted by start epoch.
+
+Usage:
+    python3 epg_sidecar.py clean_epg.bin                      # summary
+    python3 epg_sidecar.py clean_epg.bin --channel ID [--at TIME] [--next N]
+"""
+
+import argparse
+import mmap
+import os
+import struct
+import sys
+import time
+from array import array
+from collections import namedtuple
+
+from epg_intervals import airing, overlapping, schedule, upcoming
+
+MAGIC = b"XMLTVBIN"
+SIDECAR_VERSION = 1
+HEADER = struct.Struct("<8sIIIIQ")
+CHANNEL_FIELDS = 4
+BIG_ENDIAN = sys.byteorder == "big"
+
+Programme = namedtuple("Programme", "channel start stop title desc")
+
+def _aligned(offset):
+    return (offset + 7) & ~7
+
+# Offsets of each section for these counts: {name: (offset, item count, array code)}
+def _layout(channels, programmes, strings):
+    sections = {}
+    offset = HEADER.size
+    for name, count, code in (("channels", channels * CHANNEL_FIELDS, "I"),
+                              ("starts", programmes, "q"), ("stops", programmes, "q"),
+                              ("max_stops", programmes, "q"), ("channel", programmes, "I"),
+                              ("title", programmes, "I"), ("desc", programmes, "I"),
+                              ("string_ends", strings, "Q")):
+        offset = _aligned(offset)
+        sections[name] = (offset, count, code)
+        offset += count * array(code).itemsize
+    return sections, _aligned(offset)
+
+# Sidecar path for an output file: clean_epg.xml(.gz) -> clean_epg.bin
+def default_sidecar_path(output: str) -> str:
+    base = output
+    for suffix in (".gz", ".xml"):
+        if base.endswith(suffix):
+            base = base[: -len(suffix)]
+    return base + ".bin"
+
+# -------------------------------
+# Writing
+# -------------------------------
+class SidecarWriter:
+    def __init__(self, path: str):
+        self.path = path
+        self.channels = []       # [id string, name string, first, count]
+        self._channel_numbers = {}
+        self._strings = {None: 0}
+        self._string_ends = array("Q", [0])
+        self._heap = []
+        self._heap_size = 0
+        self.columns = {name: array(code) for name, code in (("starts", "q"), ("stops", "q"), ("max_stops", "q"),
+                                                             ("channel", "I"), ("title", "I"), ("desc", "I"))}
+        self._current = None
+        self._pending = []
+        self._done = set()       # channels whose programmes have been written
+        self.skipped = 0         # programmes without a readable start
+
+    def _string(self, text):
+        number = self._strings.get(text)
+        if number is None:
+            data = text.encode("utf-8")
+            self._heap.append(data)
+            self._heap_size += len(data)
+            number = self._strings[text] = len(self._string_ends)
+            self._string_ends.append(self._heap_size)
+        return number
+
+    # Declare a channel (table order = declaration order); repeats are ignored
+    def channel(self, cid: str, name=None):
+        number = self._channel_numbers.get(cid)
+        if number is None:
+            number = self._channel_numbers[cid] = len(self.channels)
+            self.channels.append([self._string(cid), self._string(name), 0, 0])
+        return number
+
+    # One programme (epoch seconds; stop may be None). A channel's programmes
+    # have to arrive together, in any order.
+    def programme(self, cid: str, start, stop, title=None, desc=None):
+        number = self.channel(cid)
+        if number != self._current:
+            self._flush()
+            if number in self._done:
+                raise ValueError(f"programmes of channel '{cid}' are not together")
+            self._current = number
+        if start is None:
+            self.skipped += 1
+            return
+        self._pending.append((start, len(self._pending), stop, self._string(title), self._string(desc)))
+
+    def _flush(self):
+        if self._current is None:
+            return
+        entries = self._pending
+        entries.sort()
+        columns = self.columns
+        starts = columns["starts"]
+        entry = self.channels[self._current]
+        entry[2] = len(starts)
+        entry[3] = len(entries)
+        self._done.add(self._current)
+        for (_, _, _, title, desc), start, stop, running in schedule(entries, stop=2):
+            starts.append(start)
+            columns["stops"].append(stop)
+            columns["max_stops"].append(running)
+            columns["channel"].append(self._current)
+            columns["title"].append(title)
+            columns["desc"].append(desc)
+        self._pending = []
+        self._current = None
+
+    # Write the file (atomically); returns counts for the run report
+    def close(self):
+        self._flush()
+        programmes = len(self.columns["starts"])
+        sections, heap_offset = _layout(len(self.channels), programmes, len(self._string_ends))
+        table = array("I")
+        for id_string, name_string, first, count in self.channels:
+            table.extend((id_string, name_string, first, count))
+        data = dict(self.columns, channels=table, string_ends=self._string_ends)
+        tmp = self.path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(HEADER.pack(MAGIC, SIDECAR_VERSION, len(self.channels), programmes,
+                                len(self._string_ends), self._heap_size))
+            for name, (offset, _, _) in sorted(sections.items(), key=lambda item: item[1][0]):
+                f.write(b"\0" * (offset - f.tell()))
+                column = data[name]
+                if BIG_ENDIAN:
+                    column = array(column.typecode, column)
+                    column.byteswap()
+                column.tofile(f)
+            f.write(b"\0" * (heap_offset - f.tell()))
+            for piece in self._heap:
+                f.write(piece)
+            size = f.tell()
+        os.replace(tmp, self.path)
+        return {"channels": len(self.channels), "programmes": programmes, "strings": len(self._string_ends) - 1,
+                "skipped": self.skipped, "bytes": size}
+
+# -------------------------------
+# Reading
+# -------------------------------
+class GuideSidecar:
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # empty file
+            self._file.close()
+            raise ValueError(f"'{path}' is not a guide sidecar")
+        self._views = [memoryview(self._map)]
+        try:
+            self._open()
+        except Exception:
+            self.close()
+            raise
+
+    def _open(self):
+        view = self._views[0]
+        if len(view) < HEADER.size:
+            raise ValueError(f"'{self.path}' is not a guide sidecar")
+        magic, version, channels, programmes, strings, heap_size = HEADER.unpack_from(view)
+        if magic != MAGIC:
+            raise ValueError(f"'{self.path}' is not a guide sidecar")
+        if version != SIDECAR_VERSION:
+            raise ValueError(f"'{self.path}' has sidecar version {version}, expected {SIDECAR_VERSION}")
+        sections, heap_offset = _layout(channels, programmes, strings)
+        if len(view) != heap_offset + heap_size:
+            raise ValueError(f"'{self.path}' is truncated or damaged")
+        for name, (offset, count, code) in sections.items():
+            setattr(self, name, self._column(offset, count, code))
+        self.heap = self._slice(heap_offset, heap_offset + heap_size)
+        # only the channel table is decoded up front
+        table = self.channels
+        self.channel_ids = []
+        self.channel_numbers = {}
+        for number in range(channels):
+            cid = self.string(table[number * CHANNEL_FIELDS])
+            self.channel_ids.append(cid)
+            self.channel_numbers[cid] = number
+
+    def _slice(self, start, stop):
+        piece = self._views[0][start:stop]
+        self._views.append(piece)
+        return piece
+
+    def _column(self, offset, count, code):
+        piece = self._slice(offset, offset + count * array(code).itemsize)
+        if BIG_ENDIAN:
+            column = array(code, piece.cast(code))
+            column.byteswap()
+            return column
+        column = piece.cast(code)
+        self._views.append(column)
+        return column
+
+    def close(self):
+        # views first: the mapping can't close while they are exported
+        for view in reversed(self._views):
+            view.release()
+        self._views = []
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return len(self.starts)
+
+    def string(self, number):
+        if number == 0:
+            return None
+        ends = self.string_ends
+        return str(self.heap[ends[number - 1]:ends[number]], "utf-8")
+
+    def name(self, cid):
+        number = self.channel_numbers[cid]
+        return self.string(self.channels[number * CHANNEL_FIELDS + 1])
+
+    # Programme positions of a channel (a range; empty for unknown channels)
+    def positions(self, cid):
+        number = self.channel_numbers.get(cid)
+        if number is None:
+            return range(0)
+        first = self.channels[number * CHANNEL_FIELDS + 2]
+        return range(first, first + self.channels[number * CHANNEL_FIELDS + 3])
+
+    def programme(self, i):
+        return Programme(self.channel_ids[self.channel[i]], self.starts[i], self.stops[i],
+                         self.string(self.title[i]), self.string(self.desc[i]))
+
+    # Position of the programme airing on `cid` at `at` (latest start wins), or None
+    def airing(self, cid, at):
+        span = self.positions(cid)
+        return airing(self.starts, self.stops, self.max_stops, at, span.start, span.stop)
+
+    # (programme airing at `at` or None, the `following` programmes after it)
+    def now(self, cid, at, following=1):
+        span = self.positions(cid)
+        current = self.airing(cid, at)
+        after = current + 1 if current is not None else upcoming(self.starts, at, span.start, span.stop)
+        nxt = [self.programme(i) for i in range(after, min(after + following, span.stop))]
+        return (self.programme(current) if current is not None else None), nxt
+
+    # Programmes of `cid` overlapping [start, stop)
+    def overlapping(self, cid, start, stop):
+        span = self.positions(cid)
+        return [self.programme(i) for i in overlapping(self.starts, self.stops, self.max_stops,
+                                                       start, stop, span.start, span.stop)]
+
+# -------------------------------
+# Command line
+# -------------------------------
+def _format(programme):
+    when = time.strftime("%Y-%m-%d %H:%M", time.gmtime(programme.start))
+    until = time.strftime("%H:%M", time.gmtime(programme.stop))
+    return f"{when}-{until} UTC  {programme.title or ''}"
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Look up programmes in a binary guide sidecar.")
+    parser.add_argument("sidecar", nargs="?", default="clean_epg.bin", help="sidecar file (default: clean_epg.bin)")
+    parser.add_argument("--channel", metavar="ID", default=None, help="show what's on this channel")
+    parser.add_argument("--at", metavar="TIME", default=None,
+                        help="epoch seconds or XMLTV time (default: now)")
+    parser.add_argument("--next", type=int, default=3, help="programmes after the current one (default: 3)")
+    args = parser.parse_args(argv)
+
+    at = int(time.time())
+    if args.at is not None:
+        from epg_dates import xmltv_epoch
+        at = int(args.at) if args.at.lstrip("-").isdigit() else xmltv_epoch(args.at)
+        if at is None:
+            print(f"ERROR: Can't read time '{args.at}'.")
+            return
+    try:
+        guide = GuideSidecar(args.sidecar)
+    except (OSError, ValueError) as e:
+        print(f"ERROR: {e}")
+        return
+    with guide:
+        if args.channel is None:
+            print(f"{args.sidecar}: {len(guide.channel_ids)} channels, {len(guide):,} programmes, "
+                  f"{len(guide.string_ends) - 1:,} distinct strings")
+            for cid in guide.channel_ids:
+                print(f"  {cid}  {guide.name(cid) or ''}  ({len(guide.positions(cid))} programmes)")
+            return
+        if args.channel not in guide.channel_numbers:
+            print(f"ERROR: Channel '{args.channel}' is not in the sidecar.")
+            return
+        current, nxt = guide.now(args.channel, at, args.next)
+        print(f"Now:  {_format(current) if current is not None else '-'}")
+        for programme in nxt:
+            print(f"Next: {_format(programme)}")
+
+if __name__ == "__main__":
+    main()
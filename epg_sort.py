@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+epg_sort.py
+Bounded-memory ordering of cleaned programmes.
+
+Programmes arrive in source order and must come out in channel order, then
+start time. Instead of one big list sorted with per-item datetime keys, each
+programme goes into the bucket for its channel index with an integer start key
+(the fixed-width XMLTV digits, see clean_epg.start_sort_key). When the buckets
+grow past the memory budget they are sorted and spilled to a temp file as one
+run per channel; at the end every channel's in-memory bucket is merged with
+its spilled runs.
+
+- Ties keep arrival order (same result as a stable sort)
+- Payloads are programme records (epg_record.ProgrammeRecord) or already
+  serialized xml (e.g. cached by --state); records are serialized when spilled
+- Spill files hold (start key, sequence, utf-8 xml) records, read back
+  strictly forward, so the merge needs one small buffer per spill file
+- At most MAX_FAN_IN spill files are open at once: past that, runs are first
+  merged in batches into bigger runs. Budgets under MIN_MEMORY_BUDGET are
+  raised to it, so a tiny --sort-memory doesn't spill a run per programme
+- persist() / restore() carry the sorted-so-far state across processes
+  (clean_epg.py --checkpoint): everything is spilled and the run files moved
+  to a directory that outlives the sorter
+"""
+
+import heapq
+import os
+import shutil
+import struct
+import tempfile
+
+DEFAULT_MEMORY_BUDGET = 256 * 1024 * 1024
+MIN_MEMORY_BUDGET = 1024 * 1024
+# spill files open at once while merging
+MAX_FAN_IN = 64
+RECORD_HEADER = struct.Struct("<qqI")
+# rough per-entry overhead of the (key, seq, payload) tuple held in a bucket
+ENTRY_OVERHEAD = 120
+
+# Memory held by a payload: serialized text, or a record that knows its size
+def payload_size(payload) -> int:
+    return len(payload) if isinstance(payload, str) else payload.size()
+
+def payload_text(payload) -> str:
+    return payload if isinstance(payload, str) else payload.to_string()
+
+class ProgrammeSorter:
+    def __init__(self, channel_count: int, memory_budget: int = DEFAULT_MEMORY_BUDGET, spill_dir: str = None):
+        self.channel_count = channel_count
+        self.memory_budget = max(memory_budget, MIN_MEMORY_BUDGET)
+        self.spill_dir = spill_dir
+        self.buckets = [[] for _ in range(channel_count)]
+        self.in_memory = 0
+        self.count = 0
+        self.spills = []  # list of (path, {channel index: record count})
+        self._tmpdir = None
+        self._seq = 0
+        self._runs = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def add(self, channel_index: int, start_key: int, payload):
+        self.buckets[channel_index].append((start_key, self._seq, payload))
+        self._seq += 1
+        self.count += 1
+        self.in_memory += payload_size(payload) + ENTRY_OVERHEAD
+        if self.in_memory > self.memory_budget:
+            self.spill()
+
+    def _run_path(self):
+        if self._tmpdir is None:
+            self._tmpdir = tempfile.mkdtemp(prefix="epg_sort_", dir=self.spill_dir)
+        path = os.path.join(self._tmpdir, f"run{self._runs:04d}.bin")
+        self._runs += 1
+        return path
+
+    # Sort every bucket and write them to a new run file, in channel order
+    def spill(self):
+        if not self.in_memory:
+            return
+        path = self._run_path()
+        counts = {}
+        with open(path, "wb") as f:
+            for index, bucket in enumerate(self.buckets):
+                if not bucket:
+                    continue
+                bucket.sort()
+                for start_key, seq, payload in bucket:
+                    data = payload_text(payload).encode("utf-8")
+                    f.write(RECORD_HEADER.pack(start_key, seq, len(data)))
+                    f.write(data)
+                counts[index] = len(bucket)
+                self.buckets[index] = []
+        self.spills.append((path, counts))
+        self.in_memory = 0
+
+    # Merge runs MAX_FAN_IN at a time until the final merge can open them all
+    def _merge_runs(self):
+        while len(self.spills) > MAX_FAN_IN:
+            merged = []
+            for first in range(0, len(self.spills), MAX_FAN_IN):
+                batch = self.spills[first:first + MAX_FAN_IN]
+                merged.append(batch[0] if len(batch) == 1 else self._merge_batch(batch))
+            self.spills = merged
+
+    # Write one run holding every record of `batch`; the batch's own temp
+    # files are removed (runs restored from a checkpoint directory stay put)
+    def _merge_batch(self, batch):
+        path = self._run_path()
+        counts = {}
+        readers = [(open(run, "rb"), run_counts) for run, run_counts in batch]
+        try:
+            with open(path, "wb") as out:
+                for index in range(self.channel_count):
+                    sources = [_read_run(f, run_counts[index], raw=True)
+                               for f, run_counts in readers if run_counts.get(index)]
+                    if not sources:
+                        continue
+                    n = 0
+                    for start_key, seq, data in heapq.merge(*sources):
+                        out.write(RECORD_HEADER.pack(start_key, seq, len(data)))
+                        out.write(data)
+                        n += 1
+                    counts[index] = n
+        finally:
+            for f, _ in readers:
+                f.close()
+        for run, _ in batch:
+            if os.path.dirname(run) == self._tmpdir:
+                os.remove(run)
+        return path, counts
+
+    # Yield (channel index, start key, payload) in final order; spilled
+    # payloads come back as serialized xml
+    def items(self):
+        self._merge_runs()
+        readers = [(open(path, "rb"), counts) for path, counts in self.spills]
+        try:
+            for index in range(self.channel_count):
+                bucket = self.buckets[index]
+                bucket.sort()
+                sources = [bucket]
+                for f, counts in readers:
+                    n = counts.get(index)
+                    if n:
+                        sources.append(_read_run(f, n))
+                merged = sources[0] if len(sources) == 1 else heapq.merge(*sources)
+                for start_key, _, payload in merged:
+                    yield index, start_key, payload
+                self.buckets[index] = []
+        finally:
+            for f, _ in readers:
+                f.close()
+
+    def __iter__(self):
+        for _, _, payload in self.items():
+            yield payload
+
+    # Spill what is in memory and move every run file into `directory`; returns
+    # the state restore() takes to pick up from here
+    def persist(self, directory: str):
+        self.spill()
+        spills = []
+        for path, counts in self.spills:
+            if os.path.dirname(path) != directory:
+                target = os.path.join(directory, os.path.basename(path))
+                shutil.move(path, target)
+                path = target
+            spills.append((path, counts))
+        self.spills = spills
+        return {"spills": [(path, dict(counts)) for path, counts in spills], "seq": self._seq, "count": self.count}
+
+    def restore(self, state):
+        self.spills = [(path, dict(counts)) for path, counts in state["spills"]]
+        self._runs = len(self.spills)
+        self._seq = state["seq"]
+        self.count = state["count"]
+
+    def close(self):
+        if self._tmpdir is not None:
+            shutil.rmtree(self._tmpdir, ignore_errors=True)
+            self._tmpdir = None
+        self.spills = []
+
+# Read `n` consecutive records of one run from a spill file; `raw` leaves
+# the xml as utf-8 bytes
+def _read_run(f, n, raw=False):
+    for _ in range(n):
+        start_key, seq, size = RECORD_HEADER.unpack(f.read(RECORD_HEADER.size))
+        data = f.read(size)
+        yield start_key, seq, data if raw else data.decode("utf-8")
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+epg_state.py
+On-disk state for incremental clean_epg.py runs.
+
+Most channels' schedules are the same from one day's download to the next.
+For every kept channel we remember a fingerprint of its raw <programme>
+blocks (exact source bytes, in source order) together with the cleaned,
+sorted output those blocks produced. On the next run a channel whose
+fingerprint is unchanged is copied through from here instead of being
+parsed and cleaned again.
+
+Layout of the state directory:
+    index.json          format version, code fingerprint, per-channel entries
+    <hash>.bin          cleaned programmes of one channel: (start key, xml) records
+
+- The code fingerprint covers the cleaning/serializing modules, so editing
+  them invalidates everything
+- Entry files are named by (code, fingerprint), so unchanged channels aren't
+  rewritten and nothing written by older code is ever picked up
+- Only files named like entries are cleaned up, so the directory can be
+  shared with other files (e.g. --state . next to the outputs)
+"""
+
+import hashlib
+import json
+import os
+import re
+import struct
+
+from epg_prefilter import iter_blocks, decode_id
+
+STATE_VERSION = 1
+INDEX_NAME = "index.json"
+ENTRY_HEADER = struct.Struct("<qI")
+# names _entry_name() gives; nothing else in the directory is ever removed
+ENTRY_NAME = re.compile(r"[0-9a-f]{32}\.bin")
+
+# Fingerprint of the code that turns raw blocks into output (source file paths)
+def code_fingerprint(*paths) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    h.update(str(STATE_VERSION).encode("ascii"))
+    for path in paths:
+        with open(path, "rb") as f:
+            h.update(f.read())
+    return h.hexdigest()
+
+# Hash each wanted channel's raw programme blocks in one byte-level pass.
+# Returns (fingerprints, complete); complete is False when some programme's
+# channel couldn't be read byte-wise, in which case nothing can be trusted.
+def channel_fingerprints(path, channel_ids):
+    hashes = {}
+    complete = True
+    for kind, value, encoding, buf, start, stop, _ in iter_blocks(path):
+        if kind == "other" and (encoding is None or encoding.startswith(("utf-16", "utf-32"))):
+            # passed through unscanned
+            complete = False
+        if kind != "programme":
+            continue
+        cid = decode_id(value, encoding)
+        if cid is None:
+            complete = False
+            continue
+        if cid not in channel_ids:
+            continue
+        h = hashes.get(cid)
+        if h is None:
+            h = hashes[cid] = hashlib.blake2b(digest_size=16)
+        h.update(buf[start:stop])
+    empty = hashlib.blake2b(digest_size=16).hexdigest()
+    fingerprints = {cid: empty for cid in channel_ids}
+    for cid, h in hashes.items():
+        fingerprints[cid] = h.hexdigest()
+    return fingerprints, complete
+
+class GuideState:
+    def __init__(self, directory: str, code: str):
+        self.directory = directory
+        self.code = code
+        self.channels = {}   # cid -> {"fingerprint": ..., "count": ...}
+        self._new = {}
+        os.makedirs(directory, exist_ok=True)
+
+    # Load a previous state; a missing, unreadable or outdated one starts empty
+    def load(self):
+        path = os.path.join(self.directory, INDEX_NAME)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            return self
+        if index.get("version") == STATE_VERSION and index.get("code") == self.code:
+            self.channels = index.get("channels", {})
+        return self
+
+    def _entry_name(self, fingerprint):
+        return hashlib.blake2b((self.code + fingerprint).encode("ascii"), digest_size=16).hexdigest() + ".bin"
+
+    def _entry_path(self, fingerprint):
+        return os.path.join(self.directory, self._entry_name(fingerprint))
+
+    # Cached (start key, xml) list for a channel if its fingerprint still matches
+    def cached(self, cid, fingerprint):
+        entry = self.channels.get(cid)
+        if entry is None or entry["fingerprint"] != fingerprint:
+            return None
+        try:
+            return list(_read_entries(self._entry_path(fingerprint), entry["count"]))
+        except (OSError, struct.error, UnicodeDecodeError):
+            return None
+
+    # Record a channel's cleaned output; its entry file is written now (if new)
+    def update(self, cid, fingerprint, entries):
+        path = self._entry_path(fingerprint)
+        if not os.path.exists(path):
+            tmp = path + ".tmp"
+            with open(tmp, "wb") as f:
+                for start_key, text in entries:
+                    data = text.encode("utf-8")
+                    f.write(ENTRY_HEADER.pack(start_key, len(data)))
+                    f.write(data)
+            os.replace(tmp, path)
+        self._new[cid] = {"fingerprint": fingerprint, "count": len(entries)}
+
+    # Write the new index, then drop entry files nothing refers to. Channels in
+    # `fingerprints` that got no update produced no programmes and are stored empty.
+    def save(self, fingerprints=None):
+        for cid, fingerprint in (fingerprints or {}).items():
+            if cid not in self._new:
+                self.update(cid, fingerprint, [])
+        channels = self._new
+        index = {"version": STATE_VERSION, "code": self.code, "channels": channels}
+        tmp = os.path.join(self.directory, INDEX_NAME + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(index, f, indent=1, sort_keys=True)
+        os.replace(tmp, os.path.join(self.directory, INDEX_NAME))
+        live = {self._entry_name(entry["fingerprint"]) for entry in channels.values()}
+        for name in os.listdir(self.directory):
+            if ENTRY_NAME.fullmatch(name) and name not in live:
+                os.remove(os.path.join(self.directory, name))
+        self.channels = channels
+        self._new = {}
+
+def _read_entries(path, count):
+    with open(path, "rb") as f:
+        for _ in range(count):
+            start_key, size = ENTRY_HEADER.unpack(f.read(ENTRY_HEADER.size))
+            yield start_key, f.read(size).decode("utf-8")
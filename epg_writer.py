@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+epg_writer.py
+Incremental XMLTV writer.
+
+Writes the XML declaration, the root start tag (original attributes) and then
+each channel / programme as it is handed over, instead of building a whole
+output tree and serializing it at the end. Escaping and layout follow
+ElementTree's own serializer, so the bytes match `ElementTree.write(...,
+encoding="utf-8", xml_declaration=True)` for the same elements.
+
+- `path` ending in `.gz` (or compress="gzip") writes gzip directly, compressed
+  on a thread pool as multi-member gzip (see epg_gzip.py); members carry no
+  timestamp, so identical content gives identical files
+"""
+
+import io
+import xml.etree.ElementTree as ET
+
+from epg_gzip import DEFAULT_LEVEL, ParallelGzipWriter
+from epg_xml import to_etree
+
+XML_DECLARATION = "<?xml version='1.0' encoding='utf-8'?>\n"
+
+# -------------------------------
+# Escaping (same rules as ElementTree)
+# -------------------------------
+def escape_cdata(text: str) -> str:
+    if "&" in text:
+        text = text.replace("&", "&amp;")
+    if "<" in text:
+        text = text.replace("<", "&lt;")
+    if ">" in text:
+        text = text.replace(">", "&gt;")
+    return text
+
+def escape_attrib(text: str) -> str:
+    if "&" in text:
+        text = text.replace("&", "&amp;")
+    if "<" in text:
+        text = text.replace("<", "&lt;")
+    if ">" in text:
+        text = text.replace(">", "&gt;")
+    if "\"" in text:
+        text = text.replace("\"", "&quot;")
+    if "\r" in text:
+        text = text.replace("\r", "&#13;")
+    if "\n" in text:
+        text = text.replace("\n", "&#10;")
+    if "\t" in text:
+        text = text.replace("\t", "&#09;")
+    return text
+
+def start_tag(tag: str, attrib) -> str:
+    return start_tag_items(tag, attrib.items())
+
+# Same, from (name, value) pairs
+def start_tag_items(tag: str, items) -> str:
+    parts = ["<", tag]
+    for k, v in items:
+        parts.append(f' {k}="{escape_attrib(v)}"')
+    return "".join(parts)
+
+# Serialize one element (children and tail included) the way ElementTree does
+def serialize_element(elem, write):
+    tag = elem.tag
+    if tag[:1] == "{":
+        # namespaced tags need ElementTree's prefix bookkeeping; XMLTV doesn't use them
+        write(ET.tostring(to_etree(elem), encoding="unicode"))
+        return
+    text = elem.text
+    write(start_tag(tag, elem.attrib))
+    if text or len(elem):
+        write(">")
+        if text:
+            write(escape_cdata(text))
+        for child in elem:
+            serialize_element(child, write)
+        write("</" + tag + ">")
+    else:
+        write(" />")
+    if elem.tail:
+        write(escape_cdata(elem.tail))
+
+def element_to_string(elem) -> str:
+    parts = []
+    serialize_element(elem, parts.append)
+    return "".join(parts)
+
+# -------------------------------
+# Writer
+# -------------------------------
+class GuideWriter:
+    # `level` / `threads`: gzip compression level and compressor threads (default: one per CPU)
+    def __init__(self, path: str, compress: str = None, xml_declaration: bool = True,
+                 level: int = DEFAULT_LEVEL, threads: int = None):
+        self.path = path
+        if compress is None and path.endswith(".gz"):
+            compress = "gzip"
+        self.compress = compress
+        self.level = level
+        self.threads = threads
+        self.xml_declaration = xml_declaration
+        self._out = None
+        self._root = None
+        self._root_open = False
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def open(self):
+        # text layer mirrors ElementTree.write(): utf-8, unencodable chars as refs
+        if self.compress == "gzip":
+            raw = ParallelGzipWriter(self.path, self.level, self.threads)
+            self._out = io.TextIOWrapper(raw, encoding="utf-8", errors="xmlcharrefreplace")
+        elif self.compress is None:
+            self._out = open(self.path, "w", encoding="utf-8", errors="xmlcharrefreplace")
+        else:
+            raise ValueError(f"unsupported compression: {self.compress}")
+        if self.xml_declaration:
+            self._out.write(XML_DECLARATION)
+
+    # Remember the root; its start tag goes out with the first child
+    def start(self, tag: str, attrib=None, text: str = None):
+        self._root = (tag, dict(attrib or {}), text)
+
+    def _open_root(self):
+        tag, attrib, text = self._root
+        self._out.write(start_tag(tag, attrib) + ">")
+        if text:
+            self._out.write(escape_cdata(text))
+        self._root_open = True
+
+    def write_element(self, elem):
+        if not self._root_open:
+            self._open_root()
+        serialize_element(elem, self._out.write)
+
+    # Write an already serialized element (see element_to_string)
+    def write_serialized(self, text: str):
+        if not self._root_open:
+            self._open_root()
+        self._out.write(text)
+
+    # Write a record that serializes itself (see epg_record.ProgrammeRecord)
+    def write_record(self, record):
+        if not self._root_open:
+            self._open_root()
+        record.serialize(self._out.write)
+
+    def close(self):
+        if self._out is None:
+            return
+        if self._root is not None:
+            tag, attrib, text = self._root
+            if self._root_open:
+                self._out.write("</" + tag + ">")
+            elif text:
+                self._open_root()
+                self._out.write("</" + tag + ">")
+            else:
+                self._out.write(start_tag(tag, attrib) + " />")
+        self._close_file()
+
+    # Close the file as is, without finishing the document
+    def abort(self):
+        self._close_file()
+
+    def _close_file(self):
+        if self._out is not None:
+            self._out.close()
+            self._out = None
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+epg_xml.py
+XML parser backend for the streaming pass: lxml when it is installed, the
+standard library's ElementTree otherwise.
+
+lxml's iterparse runs libxml2 in C and builds its elements there, noticeably
+faster than expat + ElementTree's Python-level tree on a large guide. Nothing
+else changes: both backends hand out elements with the same tag / attrib /
+text / tail / children, and the rest of the pipeline (epg_writer, epg_record)
+only uses that common API, so the output bytes are the same either way.
+
+- lxml is parsed with huge_tree (no libxml2 limits on text size / depth) and
+  with comments and processing instructions dropped, as ElementTree does
+- `set_backend("etree")` (clean_epg.py / filter_keep_channels.py --parser)
+  forces the standard library even when lxml is installed
+"""
+
+import xml.etree.ElementTree as ET
+
+try:
+    from lxml import etree as lxml_etree
+except ImportError:  # optional dependency
+    lxml_etree = None
+
+BACKENDS = ("lxml", "etree")
+AUTO = "auto"
+
+_backend = "lxml" if lxml_etree is not None else "etree"
+
+# Pick the parser: "lxml", "etree" or "auto" (lxml if installed)
+def set_backend(name: str = AUTO):
+    global _backend
+    if name == AUTO:
+        name = "lxml" if lxml_etree is not None else "etree"
+    if name not in BACKENDS:
+        raise ValueError(f"unknown parser backend: {name}")
+    if name == "lxml" and lxml_etree is None:
+        raise ValueError("the lxml parser backend needs lxml installed (pip install lxml)")
+    _backend = name
+    return name
+
+# (event, element) pairs for the "start" / "end" events of a binary file object
+def iterparse(source, events=("start", "end")):
+    if _backend == "lxml":
+        return lxml_etree.iterparse(source, events=events, huge_tree=True,
+                                    remove_comments=True, remove_pis=True)
+    return ET.iterparse(source, events=events)
+
+# The same element as a standard library Element (for ElementTree's own serializer)
+def to_etree(elem) -> ET.Element:
+    if isinstance(elem, ET.Element):
+        return elem
+    copy = ET.Element(elem.tag, dict(elem.attrib))
+    copy.text = elem.text
+    copy.tail = elem.tail
+    copy.extend(to_etree(child) for child in elem)
+    return copy
@@ -1,192 +1,26 @@
-import xml.etree.ElementTree as ET
+import argparse
+import os
 import re
 from datetime import datetime
 
-# === Keep channels list ===
-keep_channels = [
-    "Comet(COMET).us : 'Comet'",
-    "Laff(LAFF).us : 'Laff'",
-    "ABC(WMTW).us : 'ABC'",
-    "FOX(WFXT).us : 'FOX'",
-    "FOX(WPFO).us : 'FOX'",
-    "NBC(WBTSCD).us : 'NBC'",
-    "NBC(WCSH).us : 'NBC'",
-    "ABC(WCVB).us : 'ABC'",
-    "ABC(WMTW).us : 'ABC'",
-    "NewEnglandCableNews(NECN).us : 'NewEnglandCableNews'",
-    "PBS(HD01).us : 'PBS'",
-    "CW(WLVI).us : 'CW'",
-    "CBS(WBZ).us : 'CBS'",
-    "WSBK.us : 'WSBK'",
-    "CBS(WGME).us : 'CBS'",
-    "ION.us : 'ION'",
-    "MeTVNetwork(METVN).us : 'MeTVNetwork'",
-    "INSPHD(INSPHD).us : 'INSPHD'",
-    "GameShowNetwork(GSN).us : 'GameShowNetwork'",
-    "FamilyEntertainmentTelevision(FETV).us : 'FamilyEntertainmentTelevision'",
-    "Heroes&IconsNetwork(HEROICN).us : 'Heroes&IconsNetwork'",
-    "TurnerClassicMoviesHD(TCMHD).us : 'TurnerClassicMoviesHD'",
-    "OprahWinfreyNetwork(OWN).us : 'OprahWinfreyNetwork'",
-    "BET.us : 'BET'",
-    "DiscoveryChannel(DSC).us : 'DiscoveryChannel'",
-    "Freeform(FREEFRM).us : 'Freeform'",
-    "USANetwork(USA).us : 'USANetwork'",
-    "NewEnglandSportsNetwork(NESN).us : 'NewEnglandSportsNetwork'",
-    "NewEnglandSportsNetworkPlus(NESNPL).us : 'NewEnglandSportsNetworkPlus'",
-    "NBCSportsBoston(NBCSB).us : 'NBCSportsBoston'",
-    "ESPN.us : 'ESPN'",
-    "ESPN2.us : 'ESPN2'",
-    "ESPNEWS.us : 'ESPNEWS'",
-    "AWealthofEntertainmentHD(AWEHD).us : 'AWealthofEntertainmentHD'",
-    "WEtv(WE).us : 'WEtv'",
-    "OxygenTrueCrime(OXYGEN).us : 'OxygenTrueCrime'",
-    "DisneyChannel(DISN).us : 'DisneyChannel'",
-    "DisneyJunior(DJCH).us : 'DisneyJunior'",
-    "DisneyXD(DXD).us : 'DisneyXD'",
-    "CartoonNetwork(TOONLSH).us : 'CartoonNetwork'",
-    "Nickelodeon(NIK).us : 'Nickelodeon'",
-    "MSNBC.us : 'MSNBC'",
-    "CableNewsNetwork(CNN).us : 'CableNewsNetwork'",
-    "HLN.us : 'HLN'",
-    "CNBC.us : 'CNBC'",
-    "FoxNewsChannel(FNC).us : 'FoxNewsChannel'",
-    "LifetimeRealWomen(LRW).us : 'LifetimeRealWomen'",
-    "TNT.us : 'TNT'",
-    "Lifetime(LIFE).us : 'Lifetime'",
-    "LMN.us : 'LMN'",
-    "TLC.us : 'TLC'",
-    "AMC.us : 'AMC'",
-    "Home&GardenTelevisionHD(HGTVD).us : 'Home&GardenTelevisionHD'",
-    "TheTravelChannel(TRAV).us : 'TheTravelChannel'",
-    "A&E(AETV).us : 'A&E'",
-    "FoodNetwork(FOOD).us : 'FoodNetwork'",
-    "Bravo(BRAVO).us : 'Bravo'",
-    "truTV(TRUTV).us : 'truTV'",
-    "NationalGeographicHD(NGCHD).us : 'NationalGeographicHD'",
-    "HallmarkChannel(HALL).us : 'HallmarkChannel'",
-    "HallmarkFamily(HFM).us : 'HallmarkFamily'",
-    "HallmarkMystery(HMYS).us : 'HallmarkMystery'",
-    "SYFY.us : 'SYFY'",
-    "AnimalPlanet(APL).us : 'AnimalPlanet'",
-    "History(HISTORY).us : 'History'",
-    "TheWeatherChannel(WEATH).us : 'TheWeatherChannel'",
-    "ParamountNetwork(PAR).us : 'ParamountNetwork'",
-    "ComedyCentral(COMEDY).us : 'ComedyCentral'",
-    "FXM.us : 'FXM'",
-    "FXX.us : 'FXX'",
-    "FX.us : 'FX'",
-    "E!EntertainmentTelevisionHD(EHD).us : 'E!EntertainmentTelevisionHD'",
-    "AXSTV(AXSTV).us : 'AXSTV'",
-    "TVLand(TVLAND).us : 'TVLand'",
-    "TBS.us : 'TBS'",
-    "VH1.us : 'VH1'",
-    "MTV-MusicTelevision(MTV).us : 'MTV-MusicTelevision'",
-    "CMT(CMTV).us : 'CMT'",
-    "DestinationAmerica(DEST).us : 'DestinationAmerica'",
-    "MagnoliaNetwork(MAGN).us : 'MagnoliaNetwork'",
-    "MagnoliaNetworkHD(Pacific)(MAGNPHD).us : 'MagnoliaNetworkHD(Pacific)'",
-    "DiscoveryLifeChannel(DLC).us : 'DiscoveryLifeChannel'",
-    "NationalGeographicWild(NGWILD).us : 'NationalGeographicWild'",
-    "SmithsonianChannelHD(SMTSN).us : 'SmithsonianChannelHD'",
-    "BBCAmerica(BBCA).us : 'BBCAmerica'",
-    "POP(POPSD).us : 'POP'",
-    "Crime&InvestigationNetworkHD(CINHD).us : 'Crime&InvestigationNetworkHD'",
-    "Vice(VICE).us : 'Vice'",
-    "InvestigationDiscoveryHD(IDHD).us : 'InvestigationDiscoveryHD'",
-    "ReelzChannel(REELZ).us : 'ReelzChannel'",
-    "DiscoveryFamilyChannel(DFC).us : 'DiscoveryFamilyChannel'",
-    "Science(SCIENCE).us : 'Science'",
-    "AmericanHeroesChannel(AHC).us : 'AmericanHeroesChannel'",
-    "AMC+(AMCPLUS).us : 'AMC+'",
-    "Fuse(FUSE).us : 'Fuse'",
-    "MusicTelevisionHD(MTV2HD).us : 'MusicTelevisionHD'",
-    "IFC.us : 'IFC'",
-    "FYI(FYISD).us : 'FYI'",
-    "CookingChannel(COOK).us : 'CookingChannel'",
-    "Logo(LOGO).us : 'Logo'",
-    "AdultSwim(ADSM).ca : 'AdultSwim'",
-    "ANTENNA(KGBTDT).us : 'ANTENNA'",
-    "CHARGE!(CHARGE).us : 'CHARGE!'",
-    "FS1.us : 'FS1'",
-    "FS2.us : 'FS2'",
-    "NFLNetwork(NFLNET).us : 'NFLNetwork'",
-    "NHLNetwork(NHLNET).us : 'NHLNetwork'",
-    "MLBNetwork(MLBN).us : 'MLBNetwork'",
-    "NBATV(NBATV).us : 'NBATV'",
-    "CBSSportsNetwork(CBSSN).us : 'CBSSportsNetwork'",
-    "Ovation(OVATION).us : 'Ovation'",
-    "UPTV.us : 'UPTV'",
-    "COZITV(COZITV).us : 'COZITV'",
-    "OutdoorChannel(OUTD).us : 'OutdoorChannel'",
-    "ASPiRE(ASPRE).us : 'ASPiRE'",
-    "HBO.us : 'HBO'",
-    "HBO2(HBOHIT).us : 'HBO2'",
-    "HBOComedy(HBOC).us : 'HBOComedy'",
-    "HBOSignature(HBODRAM).us : 'HBOSignature'",
-    "HBOWest(HBOHDP).us : 'HBOWest'",
-    "HBOZone(HBOMOV).us : 'HBOZone'",
-    "CinemaxHD(MAXHD).us : 'CinemaxHD'",
-    "MoreMAX(MAXHIT).us : 'MoreMAX'",
-    "ActionMAX(MAXACT).us : 'ActionMAX'",
-    "5StarMAX(MAXCLAS).us : '5StarMAX'",
-    "Paramount+withShowtimeOnDemand(SHOWDM).us : 'Paramount+withShowtimeOnDemand'",
-    "ShowtimeExtreme(SHOWX).us : 'ShowtimeExtreme'",
-    "ShowtimeNext(NEXT).us : 'ShowtimeNext'",
-    "ShowtimeShowcase(SHOCSE).us : 'ShowtimeShowcase'",
-    "ShowtimeFamilyzone(FAMZ).us : 'ShowtimeFamilyzone'",
-    "ShowtimeWomen(WOMEN).us : 'ShowtimeWomen'",
-    "Starz(STARZ).us : 'Starz'",
-    "StarzEdge(STZE).us : 'StarzEdge'",
-    "StarzCinema(STZCI).us : 'StarzCinema'",
-    "StarzComedy(STZC).us : 'StarzComedy'",
-    "StarzEncore(STZENC).us : 'StarzEncore'",
-    "StarzEncoreBlack(STZENBK).us : 'StarzEncoreBlack'",
-    "StarzEncoreClassic(STZENCL).us : 'StarzEncoreClassic'",
-    "StarzEncoreFamily(STZENFM).us : 'StarzEncoreFamily'",
-    "StarzEncoreWesterns(STZENWS).us : 'StarzEncoreWesterns'",
-    "StarzKids(STZK).us : 'StarzKids'",
-    "StarzEncoreAction(STZENAC).us : 'StarzEncoreAction'",
-    "ScreenPix(SCRNPIX).us : 'ScreenPix'",
-    "ScreenPixAction(SCRNACT).us : 'ScreenPixAction'",
-    "ScreenPixVoices(SCRNVOI).us : 'ScreenPixVoices'",
-    "ScreenPixWesterns(SCRNWST).us : 'ScreenPixWesterns'",
-    "MoviePlex(MPLEX).us : 'MoviePlex'",
-    "MGM+Drive-In(MGMDRV).us : 'MGM+Drive-In'",
-    "MGM+HD(MGMHD).us : 'MGM+HD'",
-    "MGM+Hits(MGMHIT).us : 'MGM+Hits'",
-    "SonyMovieChannel(SONY).us : 'SonyMovieChannel'",
-    "TheMovieChannel(TMC).us : 'TheMovieChannel'"
-]
-
-channel_map = {}
-for ch in keep_channels:
-    match = re.match(r"(.+)\s*:\s*'(.+)'", ch)
-    if match:
-        channel_map[match.group(1).strip()] = match.group(2).strip()
-
-input_file = "epg.xml"
-output_file = "filtered_epg.xml"
-
-tree = ET.parse(input_file)
-root = tree.getroot()
-
-# Clean and filter channels
-for channel in root.findall("channel"):
-    ch_id = channel.get("id")
-    if ch_id in channel_map:
-        display_name_elem = channel.find("display-name")
-        if display_name_elem is not None:
-            display_name_elem.text = channel_map[ch_id]
-    else:
-        root.remove(channel)
-
-# Clean programmes
-for programme in root.findall("programme"):
-    ch_id = programme.get("channel")
-    if ch_id not in channel_map:
-        root.remove(programme)
-        continue
+from epg_io import find_input, is_url, same_file
+from epg_channels import filter_display_map
+from epg_engine import GuideProfile, stream_guide
+from epg_report import RunReport
+from epg_writer import GuideWriter
+from epg_xml import AUTO, BACKENDS, set_backend
 
+# === Keep channels (shared list, see epg_channels.py) ===
+channel_map = filter_display_map
+
+# Rename a kept channel's first display-name
+def rename_channel(channel):
+    display_name_elem = channel.find("display-name")
+    if display_name_elem is not None:
+        display_name_elem.text = channel_map[channel.get("id")]
+
+# Clean a programme's title and description in place
+def clean_programme(programme):
     # Clean title
     title_elem = programme.find("title")
     if title_elem is not None:
@@ -229,6 +63,116 @@ for programme in root.findall("programme"):
     if desc_elem is not None:
         desc_elem.text = desc_text
 
-# Write filtered XML
-tree.write(output_file, encoding="utf-8")
-print(f"Filtered EPG saved to {output_file}")
+# Texts of the given elements, to put back after a temporary change
+def _save_texts(*elems):
+    return [(elem, elem.text) for elem in elems if elem is not None]
+
+def _restore_texts(saved):
+    for elem, text in saved:
+        elem.text = text
+
+# Output profile: kept channels (renamed) and programmes (cleaned) in source
+# order, everything else passed through, written like ElementTree.write().
+# Elements are changed only while being written, so other profiles can share them.
+class FilterProfile(GuideProfile):
+    name = "filter"
+    stage = "filtered_output"
+
+    def __init__(self, output_file):
+        super().__init__()
+        self.output_file = output_file
+        self.channel_ids = set(channel_map)
+        self.programme_ids = set(channel_map)
+        # written under a temp name and moved into place once complete
+        self.writer = GuideWriter(output_file + ".tmp", compress="gzip" if output_file.endswith(".gz") else None,
+                                  xml_declaration=False)
+        self._root = None
+
+    def _write(self, elem):
+        if self._root is not None:
+            # root text is final by now
+            self.writer.start(self._root.tag, self._root.attrib, self._root.text)
+            self._root = None
+        self.writer.write_element(elem)
+
+    def start(self, root):
+        self.writer.open()
+        self._root = root
+
+    def channel(self, elem):
+        if elem.get("id") not in channel_map:
+            return
+        saved = _save_texts(elem.find("display-name"))
+        try:
+            rename_channel(elem)
+            self._write(elem)
+        finally:
+            _restore_texts(saved)
+
+    def programme(self, elem):
+        if elem.get("channel") not in channel_map:
+            return
+        saved = _save_texts(elem.find("title"), elem.find("desc"))
+        try:
+            clean_programme(elem)
+            self._write(elem)
+        finally:
+            _restore_texts(saved)
+
+    def other(self, elem):
+        self._write(elem)
+
+    def finish(self):
+        if self._root is not None:
+            self.writer.start(self._root.tag, self._root.attrib, self._root.text)
+            self._root = None
+        self.writer.close()
+        os.replace(self.output_file + ".tmp", self.output_file)
+
+    def abort(self):
+        self.writer.abort()
+        try:
+            os.remove(self.output_file + ".tmp")
+        except OSError:
+            pass
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Filter an XMLTV guide to the keep list and rename channels.")
+    parser.add_argument("input", nargs="?", default=None,
+                        help="input guide, plain or gzip/xz compressed, or its http(s) URL "
+                             "(default: epg.xml, epg.xml.gz or epg.xml.xz)")
+    parser.add_argument("-o", "--output", default="filtered_epg.xml",
+                        help="output file (default: filtered_epg.xml)")
+    parser.add_argument("--no-prefilter", action="store_true",
+                        help="parse every block of the input instead of prefiltering by channel id")
+    parser.add_argument("--parser", choices=(AUTO,) + BACKENDS, default=AUTO,
+                        help="XML parser: lxml, etree (standard library) or auto, lxml if installed (default)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    input_file = args.input or find_input("epg.xml") or "epg.xml"
+    output_file = args.output
+    try:
+        set_backend(args.parser)
+    except ValueError as e:
+        print(f"ERROR: {e}")
+        return
+
+    if not is_url(input_file) and not os.path.exists(input_file):
+        print(f"ERROR: Input file '{input_file}' not found.")
+        return
+    if same_file(input_file, output_file):
+        print("ERROR: Output filename would overwrite input. Aborting for safety.")
+        return
+
+    # Stream straight from the (possibly compressed) input; unless disabled,
+    # blocks for channels outside channel_map are skipped before the parser sees them
+    profile = FilterProfile(output_file)
+    stream_guide(input_file, [profile], RunReport(), prefilter=not args.no_prefilter)
+    if profile.error is not None:
+        raise profile.error
+    print(f"Filtered EPG saved to {output_file}")
+
+if __name__ == "__main__":
+    main()
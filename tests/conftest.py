@@ -0,0 +1,39 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+def run_script(script, *args, cwd=None, check=True):
+    result = subprocess.run([sys.executable, os.path.join(ROOT, script), *map(str, args)],
+                            cwd=cwd, capture_output=True, text=True)
+    if check:
+        assert result.returncode == 0, result.stdout + result.stderr
+        assert "ERROR" not in result.stdout, result.stdout
+    return result
+
+# Run clean_epg.py on `source` and return the output bytes
+@pytest.fixture
+def run_clean(tmp_path):
+    counter = [0]
+
+    def run(source, *args, output=None, check=True):
+        counter[0] += 1
+        output = output or tmp_path / f"out{counter[0]}.xml"
+        result = run_script("clean_epg.py", source, "-o", output, *args, cwd=tmp_path, check=check)
+        if not check:
+            return result
+        with open(output, "rb") as f:
+            return f.read()
+    return run
+
+# Small synthetic guide (bench_epg's generator): kept and dropped channels mixed
+@pytest.fixture(scope="session")
+def guide(tmp_path_factory):
+    from bench_epg import generate_guide
+    path = tmp_path_factory.mktemp("guide") / "epg.xml"
+    generate_guide(str(path), channels=40, days=2, per_day=24)
+    return path
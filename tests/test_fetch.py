@@ -0,0 +1,123 @@
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import epg_fetch
+from epg_fetch import FetchError, open_url
+
+BODY = b"".join(b'<programme start="2024%04d" channel="c%d"><title>t%d</title></programme>\n' % (n, n % 7, n)
+                for n in range(4000))
+CUT = 100_000
+
+# Serves versions[i] of the file to request i (the last one from then on);
+# `cuts[i]`: byte of the file the i-th response stops at
+class ScriptedHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        n = len(server.seen)
+        server.seen.append(dict(self.headers))
+        version = min(n, len(server.versions) - 1)
+        body = server.versions[version]
+        etag = f'"v{server.versions.index(body)}"' if server.etags else None
+        cut = server.cuts[n] if n < len(server.cuts) else None
+        start = 0
+        m = re.match(r"bytes=(\d+)-$", self.headers.get("Range", ""))
+        if m and self.headers.get("If-Range", etag) == etag:
+            start = int(m.group(1))
+            if start >= len(body):
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{len(body)}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_response(206)
+            shown = 0 if server.wrong_range else start
+            self.send_header("Content-Range", f"bytes {shown}-{len(body) - 1}/{len(body)}")
+        else:
+            self.send_response(200)
+        if etag:
+            self.send_header("ETag", etag)
+        if server.chunked:
+            self.send_header("Transfer-Encoding", "chunked")
+        else:
+            self.send_header("Content-Length", str(len(body) - start))
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        data = body[start:cut]
+        if server.chunked:
+            # a cut leaves the last chunk out
+            data = b"%x\r\n%s\r\n" % (len(data), data) + (b"0\r\n\r\n" if cut is None else b"")
+        self.wfile.write(data)
+
+@pytest.fixture
+def server(monkeypatch):
+    monkeypatch.setattr(epg_fetch, "BACKOFF", 0.01)
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), ScriptedHandler)
+    httpd.daemon_threads = True
+    httpd.seen = []
+    httpd.versions = [BODY]
+    httpd.cuts = []
+    httpd.etags = True
+    httpd.chunked = False
+    httpd.wrong_range = False
+    httpd.url = f"http://127.0.0.1:{httpd.server_address[1]}/epg.xml"
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+def fetch(server):
+    with open_url(server.url, retries=2, timeout=10) as source:
+        return source.read(), source.stats
+
+def test_cut_transfer_resumes_with_range(server):
+    server.cuts = [CUT]
+    data, stats = fetch(server)
+    assert data == BODY
+    assert stats["resumed_at"] == [CUT]
+    assert server.seen[1]["Range"] == f"bytes={CUT}-"
+    assert server.seen[1]["If-Range"] == '"v0"'
+
+def test_file_changed_before_resume_fails(server):
+    server.versions = [BODY, BODY.replace(b"<title>t3999", b"<title>x3999")]
+    server.cuts = [CUT]
+    with pytest.raises(FetchError, match="changed"):
+        fetch(server)
+
+def test_range_not_satisfiable_at_end_is_complete(server):
+    # every byte arrives, but the chunked body is cut before its last chunk
+    server.chunked = True
+    server.cuts = [len(BODY)]
+    data, stats = fetch(server)
+    assert data == BODY
+    assert stats["resumed_at"] == [len(BODY)]
+    assert server.seen[1]["Range"] == f"bytes={len(BODY)}-"
+
+def test_wrong_content_range_fails(server):
+    server.cuts = [CUT]
+    server.wrong_range = True
+    with pytest.raises(FetchError, match="wrong range"):
+        fetch(server)
+
+def test_no_validator_starts_over(server):
+    server.etags = False
+    server.cuts = [CUT]
+    data, stats = fetch(server)
+    assert data == BODY
+    assert "Range" not in server.seen[1]
+
+def test_no_validator_changed_prefix_fails(server):
+    server.etags = False
+    server.versions = [BODY, BODY.replace(b"<title>t3", b"<title>x3", 1)]
+    server.cuts = [CUT]
+    with pytest.raises(FetchError, match="changed"):
+        fetch(server)
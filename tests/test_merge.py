@@ -0,0 +1,54 @@
+from epg_merge import GuideMerger
+
+from conftest import run_script
+
+def channel(cid, name):
+    return f'  <channel id="{cid}"><display-name>{name}</display-name></channel>\n'
+
+def programme(cid, hour, title, desc):
+    return (f'  <programme start="20240101{hour:02d}0000 +0000" stop="20240101{hour + 1:02d}0000 +0000" '
+            f'channel="{cid}"><title>{title}</title><desc>{desc}</desc></programme>\n')
+
+def write_guide(path, channels, programmes):
+    path.write_text('<?xml version="1.0" encoding="UTF-8"?>\n<tv>\n' + "".join(channels)
+                    + "".join(programmes) + "</tv>\n", encoding="utf-8")
+    return path
+
+# The merge feed's copy is parsed first (the input's is behind three other
+# programmes), but the input comes first in priority
+def priority_feeds(tmp_path):
+    first = write_guide(tmp_path / "a.xml",
+                        [channel("CBS(WBZ).us", "WBZ"), channel("ESPN.us", "ESPN A")],
+                        [programme("CBS(WBZ).us", h, f"News {h}", "from A") for h in range(3)]
+                        + [programme("ESPN.us", 5, "Show", "from A")])
+    second = write_guide(tmp_path / "b.xml",
+                         [channel("ESPN.us", "ESPN B")],
+                         [programme("ESPN.us", 5, "Show", "from B"), programme("ESPN.us", 6, "Late", "from B")])
+    return first, second
+
+def test_earlier_feed_wins_duplicates(tmp_path):
+    first, second = priority_feeds(tmp_path)
+    with GuideMerger([(open(first, "rb"), "a"), (open(second, "rb"), "b")]) as merger:
+        elements = list(merger)[1:]
+    names = [e.findtext("display-name") for e in elements if e.tag == "channel"]
+    programmes = [(e.get("channel"), e.findtext("title"), e.findtext("desc")) for e in elements if e.tag == "programme"]
+    assert names == ["WBZ", "ESPN A"]
+    assert ("ESPN.us", "Show", "from A") in programmes
+    assert ("ESPN.us", "Show", "from B") not in programmes
+    assert ("ESPN.us", "Late", "from B") in programmes
+    assert merger.counts["merge_programmes_duplicate"] == 1
+
+def test_clean_merge_keeps_input_copy(tmp_path, run_clean):
+    first, second = priority_feeds(tmp_path)
+    output = run_clean(first, "--merge", second).decode("utf-8")
+    assert output.count("<title>Show</title>") == 1
+    assert "from B" in output   # the programme only the merge feed has
+    show = output[output.index('channel="ESPN.us"'):]
+    assert "from A" in show[:show.index("</programme>")]
+
+def test_merge_script_self_merge_drops_every_copy(tmp_path):
+    first, _ = priority_feeds(tmp_path)
+    output = tmp_path / "merged.xml"
+    result = run_script("epg_merge.py", first, first, "-o", output)
+    assert "2 duplicate channel(s)" in result.stdout and "4 duplicate programme(s)" in result.stdout
+    assert output.read_bytes().count(b"<programme ") == 4
@@ -0,0 +1,115 @@
+import gzip
+import os
+import re
+import subprocess
+import sys
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from conftest import ROOT, run_script
+from epg_dates import _legacy_date, _xmltv_epoch_slow, format_date_text, xmltv_epoch
+
+# Run clean_epg.main() in a child process after `setup` (Python source) ran;
+# returns the process result
+def run_patched(setup, *args, cwd):
+    code = f"import sys\nsys.path.insert(0, {ROOT!r})\n{setup}\nimport clean_epg\nclean_epg.main(sys.argv[1:])\n"
+    return subprocess.run([sys.executable, "-c", code, *map(str, args)], cwd=cwd, capture_output=True, text=True)
+
+@pytest.fixture(scope="module")
+def baseline(guide, tmp_path_factory):
+    output = tmp_path_factory.mktemp("baseline") / "clean.xml"
+    run_script("clean_epg.py", guide, "-o", output, cwd=output.parent)
+    data = output.read_bytes()
+    assert data.count(b"<programme ") > 100 and b"Extra" not in data
+    return data
+
+@pytest.mark.parametrize("args", [
+    ("--no-prefilter",),
+    ("--parser", "etree"),
+    ("--parser", "lxml"),
+    ("-j", "2", "--chunk-size", "50"),
+    ("--cache-size", "0"),
+    ("--merge", "{guide}"),
+], ids=["no-prefilter", "etree", "lxml", "workers", "no-cache", "self-merge"])
+def test_options_keep_output_identical(guide, baseline, run_clean, args):
+    if "lxml" in args:
+        pytest.importorskip("lxml")
+    assert run_clean(guide, *(arg.format(guide=guide) for arg in args)) == baseline
+
+def test_compressed_input_and_output(guide, baseline, run_clean, tmp_path):
+    packed = tmp_path / "epg.xml.gz"
+    packed.write_bytes(gzip.compress(guide.read_bytes()))
+    output = tmp_path / "clean.xml.gz"
+    run_clean(packed, "--gzip-threads", "2", output=output)
+    assert gzip.decompress(output.read_bytes()) == baseline
+
+def test_spills_and_bounded_fan_in(guide, baseline, tmp_path):
+    setup = ("import atexit, epg_sort\nepg_sort.MIN_MEMORY_BUDGET = 16 * 1024\nepg_sort.MAX_FAN_IN = 3\n"
+             "merge_batch = epg_sort.ProgrammeSorter._merge_batch\nmerges = []\n"
+             "def counted(self, batch):\n    merges.append(batch)\n    return merge_batch(self, batch)\n"
+             "epg_sort.ProgrammeSorter._merge_batch = counted\n"
+             "atexit.register(lambda: print('batch merges:', len(merges)))")
+    result = run_patched(setup, guide, "-o", tmp_path / "clean.xml", "--sort-memory", "0", cwd=tmp_path)
+    assert result.returncode == 0, result.stdout + result.stderr
+    assert int(re.search(r"batch merges: (\d+)", result.stdout).group(1)) > 1
+    assert (tmp_path / "clean.xml").read_bytes() == baseline
+
+def test_filtered_output_matches_filter_script(guide, run_clean, tmp_path):
+    run_clean(guide, "--filtered", tmp_path / "together.xml", output=tmp_path / "clean.xml")
+    run_script("filter_keep_channels.py", guide, "-o", tmp_path / "alone.xml", cwd=tmp_path)
+    assert (tmp_path / "together.xml").read_bytes() == (tmp_path / "alone.xml").read_bytes()
+
+def test_checkpoint_resume_after_crash(guide, baseline, tmp_path):
+    checkpoint = tmp_path / "checkpoint"
+    args = (guide, "-o", tmp_path / "clean.xml", "--checkpoint", checkpoint, "--checkpoint-every", "0")
+    crash = ("import os, epg_checkpoint\nsave = epg_checkpoint.Checkpoint.save\nsaves = []\n"
+             "def crash(self):\n    save(self)\n    saves.append(1)\n    if len(saves) == 40:\n        os._exit(3)\n"
+             "epg_checkpoint.Checkpoint.save = crash")
+    assert run_patched(crash, *args, cwd=tmp_path).returncode == 3
+    assert not (tmp_path / "clean.xml").exists() and os.listdir(checkpoint)
+    result = run_script("clean_epg.py", *args, cwd=tmp_path)
+    assert "Resum" in result.stdout
+    assert (tmp_path / "clean.xml").read_bytes() == baseline
+
+def test_state_rerun_and_changed_channel(guide, baseline, run_clean, tmp_path):
+    state = tmp_path / "state"
+    assert run_clean(guide, "--state", state) == baseline
+    assert run_clean(guide, "--state", state) == baseline
+    # one kept channel's programme changes: only that channel is cleaned again
+    text = guide.read_text(encoding="utf-8")
+    match = re.search(r'channel="(?!Extra)[^"]+">\s*<title lang="en">', text)
+    changed = tmp_path / "changed.xml"
+    changed.write_text(text[:match.end()] + "Changed " + text[match.end():], encoding="utf-8")
+    fresh = run_clean(changed)
+    assert fresh != baseline
+    assert run_clean(changed, "--state", state) == fresh
+
+def test_shards_rerun_leaves_files_alone(guide, run_clean, tmp_path):
+    shards = tmp_path / "shards"
+
+    def snapshot():
+        return {path: (path.read_bytes(), path.stat().st_mtime_ns)
+                for path in shards.rglob("*") if path.is_file() and path.name != "manifest.json"}
+    run_clean(guide, "--shards", shards)
+    first = snapshot()
+    assert len(first) > 1
+    run_clean(guide, "--shards", shards)
+    assert snapshot() == first
+
+def test_url_input(guide, baseline, run_clean):
+    from bench_epg import GuideServer
+    with GuideServer({"epg.xml": str(guide)}, drop_at=100_000, drops=1) as server:
+        assert run_clean(server.url("epg.xml")) == baseline
+
+def test_fast_dates_match_slow_path():
+    base = datetime(1999, 12, 31, 22, 30, 15, tzinfo=timezone.utc)
+    for hours in range(0, 24 * 400, 37):
+        when = base + timedelta(hours=hours, seconds=hours % 60)
+        for offset in ("", " +0000", " -0530", " +1245"):
+            value = when.strftime("%Y%m%d%H%M%S") + offset
+            assert xmltv_epoch(value) == _xmltv_epoch_slow(value), value
+        assert xmltv_epoch(when.strftime("%Y%m%d%H%M%S")) == int(when.timestamp())
+    for value in ("20250230", "20240229", "2025-01-31", "20250131235959", "20250131246000", "1999",
+                  "0999", "2025013", "2025-1-31", " 20250131", "x20250131"):
+        assert format_date_text(value) == _legacy_date(value), value
@@ -0,0 +1,69 @@
+import gzip
+
+import pytest
+
+import epg_prefilter
+from epg_prefilter import BlockScanner, iter_blocks
+
+HEAD = b'<?xml version="1.0" encoding="UTF-8"?>\n<tv>\n'
+CHANNELS = (b'  <channel id="Comet(COMET).us"><display-name>Comet</display-name></channel>\n'
+            b'  <channel id="Other(OTH).us"><display-name>Other</display-name></channel>\n')
+
+def programme(channel, hour, body=b"<title>Show</title>", attrs=b"", before=b""):
+    start = b"202401010%d0000 +0000" % hour
+    stop = b"202401010%d0000 +0000" % (hour + 1)
+    return (b'  <programme start="%s" stop="%s"%s channel="%s"%s>\n    %s\n  </programme>\n'
+            % (start, stop, before, channel, attrs, body))
+
+GUIDES = {
+    # ">" and "/>" in a quoted attribute value of a dropped programme
+    "gt_in_attribute": HEAD + CHANNELS
+        + programme(b"Other(OTH).us", 0, attrs=b' note="a/>b"')
+        + programme(b"Comet(COMET).us", 1) + b"</tv>\n",
+    # "channel=" inside another attribute's value
+    "attribute_in_value": HEAD + CHANNELS
+        + programme(b"Comet(COMET).us", 0, before=b""" note='x channel="Other(OTH).us"'""")
+        + programme(b"Other(OTH).us", 1) + b"</tv>\n",
+    # an end tag inside CDATA and a comment of dropped programmes
+    "end_tag_in_cdata": HEAD + CHANNELS
+        + programme(b"Other(OTH).us", 0, b"<title>A</title><desc><![CDATA[see </programme> tag]]></desc>")
+        + programme(b"Other(OTH).us", 1, b"<title>B</title><desc>x<!-- </programme> --></desc>")
+        + programme(b"Comet(COMET).us", 2) + b"</tv>\n",
+}
+
+@pytest.mark.parametrize("name", sorted(GUIDES))
+def test_prefilter_matches_full_parse(name, tmp_path, run_clean):
+    path = tmp_path / "epg.xml"
+    path.write_bytes(GUIDES[name])
+    filtered = run_clean(path)
+    assert filtered == run_clean(path, "--no-prefilter")
+    assert b"Comet(COMET).us" in filtered
+
+@pytest.mark.parametrize("name", sorted(GUIDES))
+def test_blocks_cover_input_and_match_whole_elements(name, tmp_path):
+    data = GUIDES[name]
+    blocks = [(kind, value, bytes(buf[start:stop])) for kind, value, _, buf, start, stop, _ in
+              iter_blocks(_write(tmp_path / "epg.xml", data))]
+    assert b"".join(piece for _, _, piece in blocks) == data
+    programmes = [(value, piece) for kind, value, piece in blocks if kind == "programme"]
+    assert len(programmes) == data.count(b"  <programme ")
+    for value, piece in programmes:
+        assert piece.rstrip().endswith(b"</programme>")
+        assert b'channel="%s"' % value in piece
+
+# Blocks split across buffers come out the same as from one buffer
+@pytest.mark.parametrize("name", sorted(GUIDES))
+def test_chunked_scan_matches_whole_scan(name, tmp_path, monkeypatch):
+    data = GUIDES[name]
+    path = _write(tmp_path / "epg.xml.gz", gzip.compress(data))
+    whole = [(kind, value, data[start:stop]) for kind, value, start, stop in BlockScanner().scan(data, True)
+             if kind in ("channel", "programme")]
+    for size in (1, 7, 64):
+        monkeypatch.setattr(epg_prefilter, "CHUNK_SIZE", size)
+        pieces = [(kind, value, bytes(buf[start:stop])) for kind, value, _, buf, start, stop, _ in iter_blocks(path)]
+        assert [piece for piece in pieces if piece[0] in ("channel", "programme")] == whole
+        assert b"".join(piece for _, _, piece in pieces) == data
+
+def _write(path, data):
+    path.write_bytes(data)
+    return str(path)
@@ -0,0 +1,42 @@
+from epg_intervals import airing, overlapping, schedule, upcoming
+from epg_service import load_index
+from epg_sidecar import GuideSidecar
+
+def _row(record):
+    if record is None:
+        return None
+    return (record["channel"], record["start_epoch"], record["stop_epoch"], record["title"], record["desc"])
+
+def test_schedule_fills_open_ends_and_running_max():
+    entries = [(0, 100), (50, None), (60, 70), (80, None)]
+    assert [row[1:] for row in schedule(entries)] == [(0, 100, 100), (50, 60, 100), (60, 70, 100), (80, 80, 100)]
+
+def test_lookups_see_long_programmes_under_later_starts():
+    # 0-100 still airs under the short ones that start after it
+    starts, stops, max_stops = [0, 10, 20, 200], [100, 15, 25, 300], [100, 100, 100, 300]
+    assert airing(starts, stops, max_stops, 12) == 1
+    assert airing(starts, stops, max_stops, 17) == 0
+    assert airing(starts, stops, max_stops, 150) is None
+    assert upcoming(starts, 150) == 3
+    assert overlapping(starts, stops, max_stops, 16, 30) == [0, 2]
+    # bounded to a slice of larger arrays
+    assert airing([5] + starts, [6] + stops, [6] + max_stops, 17, 1) == 1
+    assert overlapping([5] + starts, [6] + stops, [6] + max_stops, 0, 30, 1) == [1, 2, 3]
+
+def test_sidecar_answers_like_the_service(guide, run_clean, tmp_path):
+    sidecar = tmp_path / "guide.bin"
+    run_clean(guide, "--sidecar", sidecar, output=tmp_path / "clean.xml")
+    index = load_index(str(tmp_path / "clean.xml"))
+    with GuideSidecar(str(sidecar)) as side:
+        assert index.channels and set(side.channel_ids) == set(index.channels)
+        for cid, channel in index.channels.items():
+            assert side.name(cid) == channel.name
+            assert len(side.positions(cid)) == len(channel.starts)
+            for start in channel.starts[:40]:
+                for at in (start - 1, start, start + 1):
+                    current, following = side.now(cid, at, 2)
+                    expected = index.now(channel, at, 2)
+                    assert (tuple(current) if current else None) == _row(expected["now"])
+                    assert [tuple(p) for p in following] == [_row(r) for r in expected["next"]]
+                    assert [tuple(p) for p in side.overlapping(cid, at, at + 7200)] == \
+                        [_row(r) for r in index.range(channel, at, at + 7200)]